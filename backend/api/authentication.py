@@ -0,0 +1,100 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from rest_framework.authentication import TokenAuthentication
+
+from recipes.catalog import get_catalog_revision
+from .stats import CacheStats
+
+AUTH_USER = 'api.auth_user.{}'
+AUTH_CACHE_SIZE = 10000
+AUTH_CACHE_TTL = 300
+
+
+class TokenCache:
+    """
+    LRU токенов с копиями пользователей в памяти процесса.
+
+    Запись действует, пока не истёк AUTH_CACHE_TTL и не сменилась
+    ревизия пользователя: её меняют выход, изменение и удаление
+    пользователя (см. api.signals), поэтому запись устаревает
+    во всех процессах сразу.
+    """
+
+    def __init__(self, max_size=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = CacheStats('api.auth_tokens')
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        """
+        Пара (пользователь, токен) или None и id пользователя токена.
+
+        id известен и для устаревшей записи: по нему ревизия читается
+        до загрузки пользователя из базы.
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None, None
+            self._items.move_to_end(key)
+        user_id, revision, expires, user, token = item
+        if user is None or expires <= time.monotonic() or (
+            revision != user_revision(user_id)
+        ):
+            return None, user_id
+        # Представления изменяют request.user, поэтому каждому запросу
+        # достаётся своя копия.
+        return (copy.copy(user), token), user_id
+
+    def set(self, key, user_id, revision=None, user=None, token=None):
+        """Сохраняет пользователя или только id пользователя токена."""
+        item = (
+            user_id, revision, time.monotonic() + self.ttl,
+            None if user is None else copy.copy(user), token
+        )
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+def user_revision(user_id):
+    return get_catalog_revision(AUTH_USER.format(user_id)).version
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену без запроса к базе для известных токенов.
+
+    Ревизия пользователя читается до загрузки, поэтому изменение,
+    зафиксированное во время загрузки, не останется в кэше. При первом
+    запросе с токеном id пользователя ещё неизвестен: запоминается
+    только он, пользователь кэшируется со следующего запроса.
+    """
+
+    def authenticate_credentials(self, key):
+        cached, user_id = token_cache.get(key)
+        if cached is not None:
+            token_cache.stats.hit()
+            return cached
+        token_cache.stats.miss()
+        revision = None if user_id is None else user_revision(user_id)
+        user, token = super().authenticate_credentials(key)
+        if user.pk == user_id:
+            token_cache.set(key, user.pk, revision, user, token)
+        else:
+            token_cache.set(key, user.pk)
+        return user, token
@@ -0,0 +1,90 @@
+import bisect
+import threading
+from itertools import chain
+
+from recipes.catalog import get_catalog_revision
+from recipes.models import Ingredient
+
+AUTOCOMPLETE_LIMIT = 20
+AUTOCOMPLETE_LIMIT_MAX = 100
+INDEX_MAX_SIZE = 50000
+
+
+class IngredientIndex:
+    """
+    Индекс справочника продуктов в памяти процесса.
+
+    Хранит отсортированный по названию массив продуктов и ищет совпадения
+    в начале названия двоичным поиском, а вхождения в середине названия —
+    проходом по массиву. Справочник загружается из базы один раз и
+    перечитывается только после invalidate(). Если продуктов больше
+    INDEX_MAX_SIZE, индекс не строится и поиск выполняется в базе.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revision = None
+        self._entries = None
+        self._keys = None
+
+    def invalidate(self):
+        with self._lock:
+            self._revision = None
+            self._entries = None
+            self._keys = None
+
+    def _load(self):
+        revision = get_catalog_revision(Ingredient._meta.label_lower)
+        with self._lock:
+            if self._entries is not None and self._revision == revision:
+                return self._entries, self._keys
+            rows = Ingredient.objects.order_by().values_list(
+                'id', 'name', 'measurement_unit'
+            )[:INDEX_MAX_SIZE + 1]
+            entries = sorted(
+                (name.lower(), pk, name, measurement_unit)
+                for pk, name, measurement_unit in rows
+            )
+            if len(entries) > INDEX_MAX_SIZE:
+                entries = ()
+            self._revision = revision
+            self._entries = entries
+            self._keys = [entry[0] for entry in entries]
+            return self._entries, self._keys
+
+    @property
+    def is_available(self):
+        entries, _ = self._load()
+        return bool(entries)
+
+    @staticmethod
+    def _serialize(entry):
+        _, pk, name, measurement_unit = entry
+        return {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+
+    def all(self, limit=AUTOCOMPLETE_LIMIT):
+        """Возвращает продукты в порядке названий."""
+        entries, _ = self._load()
+        return [self._serialize(entry) for entry in entries[:limit]]
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        """
+        Возвращает не более limit продуктов, содержащих query.
+
+        Продукты, название которых начинается с query, идут первыми.
+        """
+        entries, keys = self._load()
+        query = query.strip().lower()
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_left(keys, query + '\uffff', lo=start)
+        found = list(entries[start:min(end, start + limit)])
+        if len(found) < limit:
+            for index in chain(range(start), range(end, len(entries))):
+                if query in keys[index]:
+                    found.append(entries[index])
+                    if len(found) == limit:
+                        break
+        return [self._serialize(entry) for entry in found]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,124 @@
+import hashlib
+
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipes.catalog import get_catalog_revision
+from recipes.models import Recipe, SimilarRecipe
+from users.models import Subscriptions
+from .response_cache import RECIPE_LIST
+
+# Поля пользователя, которые выводятся в карточке рецепта.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name', 'avatar')
+# Всё, от чего зависит карточка рецепта, кроме ингредиентов, тегов
+# и похожих рецептов: их изменения отмечаются в updated_at и ревизиях.
+RECIPE_STATE_FIELDS = (
+    'updated_at',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'is_subscribed',
+    *(f'author__{field}' for field in (*AUTHOR_FIELDS, 'avatar_variants')),
+)
+RECIPE_CATALOGS = (
+    'recipes.tag', 'recipes.ingredient', SimilarRecipe._meta.label_lower
+)
+USER_FLAGS = 'api.user_flags.{}'
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def is_not_modified(request, etag):
+    """
+    Проверяет If-None-Match.
+
+    Сравнение слабое: nginx при сжатии ответа помечает ETag как W/.
+    """
+    etags = {
+        tag[2:] if tag.startswith('W/') else tag
+        for tag in parse_etags(request.headers.get('If-None-Match', ''))
+    }
+    return etag in etags or '*' in etags
+
+
+def not_modified(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED,
+                    headers={'ETag': etag})
+
+
+def user_flags_revision(user):
+    """Ревизия избранного, списка покупок и подписок пользователя."""
+    if not user.is_authenticated:
+        return ''
+    return get_catalog_revision(USER_FLAGS.format(user.pk)).version
+
+
+def recipe_list_etag(request):
+    """ETag списка рецептов: ревизии списка и флагов пользователя."""
+    return make_etag(
+        get_catalog_revision(RECIPE_LIST).version,
+        request.user.pk,
+        user_flags_revision(request.user),
+        request.get_host(),
+        request.get_full_path(),
+    )
+
+
+def recipe_etag(request, state):
+    """ETag карточки рецепта по значениям RECIPE_STATE_FIELDS."""
+    return make_etag(
+        *('' if value is None else str(value) for value in state),
+        *(get_catalog_revision(catalog).version
+          for catalog in RECIPE_CATALOGS),
+        request.get_host(),
+    )
+
+
+def instance_state(recipe, flags=None):
+    """
+    Значения RECIPE_STATE_FIELDS из рецепта, загруженного with_related.
+
+    flags — флаги пользователя из api.user_flags, если рецепт загружен
+    без аннотаций флагов.
+    """
+    author = recipe.author
+    if flags is None:
+        user_flags = (
+            recipe.is_favorited,
+            recipe.is_in_shopping_cart,
+            getattr(author, 'is_subscribed', False),
+        )
+    else:
+        user_flags = (
+            flags.is_favorited(recipe.pk),
+            flags.is_in_shopping_cart(recipe.pk),
+            flags.is_subscribed(recipe.author_id),
+        )
+    return (
+        recipe.updated_at,
+        *user_flags,
+        *(getattr(author, field, None)
+          for field in (*AUTHOR_FIELDS, 'avatar_variants')),
+    )
+
+
+def stored_recipe_etag(request, pk):
+    """
+    ETag рецепта по данным из базы одним запросом без связанных объектов.
+
+    Возвращает None, если рецепта нет.
+    """
+    user = request.user
+    if user.is_authenticated:
+        is_subscribed = Exists(Subscriptions.objects.filter(
+            user=user, author=OuterRef('author')
+        ))
+    else:
+        is_subscribed = Value(False, output_field=BooleanField())
+    state = Recipe.objects.with_user_flags(user).annotate(
+        is_subscribed=is_subscribed
+    ).filter(pk=pk).values_list(*RECIPE_STATE_FIELDS).first()
+    return None if state is None else recipe_etag(request, state)
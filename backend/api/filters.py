@@ -1,11 +1,33 @@
 import django_filters
+from django.db.models import Case, IntegerField, Value, When
+
+from rest_framework.exceptions import ValidationError
 
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search
+from .paginators import PaginatorWithLimit
+
+RECIPE_ORDERINGS = {
+    'popular': ('-popular_score', '-pub_date', '-id'),
+    'trending': ('-trending_score', '-pub_date', '-id'),
+}
 
 
 class RecipeFilter(django_filters.FilterSet):
-    """Фильтры для рецептов."""
+    """
+    Фильтры для рецептов.
+
+    Параметр search — полнотекстовый поиск по названию и описанию,
+    найденные рецепты упорядочиваются по релевантности. Параметр
+    ordering упорядочивает по рейтингу популярности (popular) или
+    по рейтингу за последние дни (trending), см. recipes.popularity.
+    """
 
+    search = django_filters.CharFilter(method='filter_search')
+    ordering = django_filters.ChoiceFilter(
+        choices=tuple((name, name) for name in RECIPE_ORDERINGS),
+        method='filter_ordering'
+    )
     is_favorited = django_filters.NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = django_filters.NumberFilter(
         method='filter_is_in_shopping_cart'
@@ -17,6 +39,34 @@ class RecipeFilter(django_filters.FilterSet):
         conjoined=False
     )
 
+    def filter_search(self, recipes, name, value):
+        """
+        Полнотекстовый поиск с сортировкой по релевантности.
+
+        Курсор хранит только дату публикации, поэтому вместе
+        с параметром cursor поиск недоступен.
+        """
+        if PaginatorWithLimit.cursor_query_param in self.request.query_params:
+            raise ValidationError({
+                name: 'Поиск недоступен с параметром cursor.'
+            })
+        return search(recipes, value).order_by(
+            '-search_rank', '-pub_date', '-id'
+        )
+
+    def filter_ordering(self, recipes, name, value):
+        """
+        Сортировка по рейтингу; использует индекс по рейтингу и дате.
+
+        Курсорная пагинация идёт по дате публикации, поэтому вместе
+        с ней сортировка по рейтингу недоступна.
+        """
+        if PaginatorWithLimit.cursor_query_param in self.request.query_params:
+            raise ValidationError({
+                name: 'Сортировка по рейтингу недоступна с параметром cursor.'
+            })
+        return recipes.order_by(*RECIPE_ORDERINGS[value])
+
     def filter_is_favorited(self, recipe, name, value):
         """Возвращает только рецепты, находящиеся в списке избранного."""
         if value:
@@ -36,15 +86,31 @@ class RecipeFilter(django_filters.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('author', 'is_favorited', 'is_in_shopping_cart', 'tags')
+        fields = (
+            'author', 'is_favorited', 'is_in_shopping_cart', 'search',
+            'ordering', 'tags'
+        )
 
 
 class IngredientFilter(django_filters.FilterSet):
-    """Поиск по частичному вхождению в начале названия ингредиента."""
+    """
+    Поиск по частичному вхождению в начале названия ингредиента.
 
-    name = django_filters.CharFilter(
-        field_name='name', lookup_expr='icontains'
-    )
+    Совпадения в начале названия идут первыми, за ними — вхождения
+    в середине названия. На PostgreSQL поиск использует индексы
+    text_pattern_ops и pg_trgm по UPPER(name).
+    """
+
+    name = django_filters.CharFilter(method='filter_name')
+
+    def filter_name(self, ingredients, name, value):
+        return ingredients.filter(name__icontains=value).annotate(
+            prefix_rank=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('prefix_rank', 'name')
 
     class Meta:
         model = Ingredient
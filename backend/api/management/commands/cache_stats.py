@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.urls import get_resolver
+
+from api.stats import CacheStats
+
+
+class Command(BaseCommand):
+    help = 'Статистика попаданий в кэши API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счётчики после вывода'
+        )
+
+    def handle(self, *args, **options):
+        # Кэши регистрируются при импорте представлений.
+        get_resolver().url_patterns
+        for name, stats in sorted(CacheStats.registry.items()):
+            snapshot = stats.snapshot()
+            self.stdout.write(
+                f'{name}: попаданий {snapshot["hits"]}, '
+                f'промахов {snapshot["misses"]}, '
+                f'доля попаданий {snapshot["hit_rate"]:.1%}'
+            )
+            if options['reset']:
+                stats.reset()
@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+
+from django.utils.cache import quote_etag
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipes.catalog import get_catalog_revision
+from .conditional import is_not_modified
+from .user_flags import user_flags_cache
+
+
+class RevisionCache:
+    """LRU-кэш данных ответов, действующий в пределах одной ревизии."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._revision = None
+        self._items = OrderedDict()
+
+    def get(self, revision, key):
+        with self._lock:
+            if self._revision != revision:
+                return None
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def set(self, revision, key, data):
+        with self._lock:
+            if self._revision != revision:
+                self._revision = revision
+                self._items.clear()
+            self._items[key] = data
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+class CatalogCacheMixin:
+    """
+    Кэширование ответов справочников в памяти процесса.
+
+    Ответы хранятся до смены ревизии справочника и отдаются с заголовками
+    ETag и Last-Modified. На If-None-Match с актуальной ревизией
+    возвращается 304 без обращения к ORM и сериализаторам.
+    """
+
+    catalog_cache_size = 256
+    _catalog_caches = {}
+
+    @classmethod
+    def get_catalog(cls):
+        return cls.queryset.model._meta.label_lower
+
+    def get_catalog_cache(self):
+        return self._catalog_caches.setdefault(
+            self.get_catalog(), RevisionCache(self.catalog_cache_size)
+        )
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        revision = get_catalog_revision(self.get_catalog())
+        headers = {
+            'ETag': quote_etag(f'{self.get_catalog()}-{revision.version}'),
+            'Last-Modified': http_date(revision.modified),
+        }
+        if is_not_modified(request, headers['ETag']):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers=headers)
+        cache = self.get_catalog_cache()
+        key = request.get_full_path()
+        data = cache.get(revision.version, key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(revision.version, key, data)
+        return Response(data, headers=headers)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class UserFlagsMixin:
+    """
+    Флаги текущего пользователя для сериализаторов из кэша флагов.
+
+    В действиях user_flags_actions сериализаторы проверяют избранное,
+    список покупок и подписки по множествам из api.user_flags, поэтому
+    запросы не аннотируются этими флагами.
+    """
+
+    user_flags_actions = ('list', 'retrieve')
+
+    def get_user_flags(self):
+        """Флаги пользователя или None, если их нужно аннотировать."""
+        if self.action not in self.user_flags_actions:
+            return None
+        if not hasattr(self, '_user_flags'):
+            self._user_flags = user_flags_cache.get(self.request.user)
+        return self._user_flags
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['user_flags'] = self.get_user_flags()
+        return context
@@ -1,6 +1,56 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
+MAX_PAGE_SIZE = 100
+
+
+class LimitCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация по Meta.ordering модели с id для одинаковых значений.
+
+    Не выполняет COUNT(*) и не использует OFFSET по всей таблице,
+    поэтому стоимость страницы не зависит от её номера.
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        ordering = tuple(queryset.model._meta.ordering)
+        if 'id' in (field.lstrip('-') for field in ordering):
+            return ordering
+        direction = '-' if ordering and ordering[0].startswith('-') else ''
+        return (*ordering, f'{direction}id')
+
+
+class LimitPageNumberPagination(PageNumberPagination):
+    """Постраничная пагинация с параметром limit."""
 
-class PaginatorWithLimit(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+    max_page_size = MAX_PAGE_SIZE
+
+
+class PaginatorWithLimit(LimitPageNumberPagination):
+    """
+    Постраничная пагинация с параметром limit.
+
+    Если в запросе передан параметр cursor (в том числе пустой),
+    используется курсорная пагинация LimitCursorPagination.
+    """
+
+    cursor_query_param = 'cursor'
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = LimitCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,242 @@
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.utils import timezone
+
+from recipes.bitsets import (
+    bit_slices,
+    bitset,
+    iter_positions,
+    popcount,
+    select_count
+)
+from recipes.catalog import get_catalog_revision
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from .response_cache import RECIPE_LIST
+from .shortlinks import DELETED_RECIPES
+
+# updated_at выставляется до фиксации транзакции, поэтому рецепты,
+# изменённые незадолго до прошлой синхронизации, перечитываются.
+SYNC_OVERLAP = timedelta(minutes=1)
+# Если изменилось больше рецептов, индекс строится заново.
+INCREMENTAL_LIMIT = 500
+
+
+class PantryMatches:
+    """
+    Найденные рецепты в порядке убывания покрытия продуктами.
+
+    Последовательность ленивая: len() считает биты без перебора рецептов,
+    срез перебирает только нужные рецепты, поэтому подходит
+    для стандартной пагинации. Элементы — (id рецепта, число имеющихся
+    продуктов, число продуктов в рецепте).
+    """
+
+    def __init__(self, groups, recipe_ids):
+        self.groups = groups
+        self.recipe_ids = recipe_ids
+
+    def __len__(self):
+        return sum(popcount(bits) for _, _, bits in self.groups)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step not in (None, 1):
+            raise TypeError('Поддерживаются только срезы с шагом 1.')
+        skip = index.start or 0
+        limit = None if index.stop is None else index.stop - skip
+        found = []
+        for matched, total, bits in self.groups:
+            if limit is not None and len(found) >= limit:
+                break
+            count = popcount(bits)
+            if skip >= count:
+                skip -= count
+                continue
+            for position in iter_positions(bits):
+                if skip:
+                    skip -= 1
+                    continue
+                if limit is not None and len(found) >= limit:
+                    break
+                found.append((self.recipe_ids[position], matched, total))
+        return found
+
+
+class PantryIndex:
+    """
+    Инвертированный индекс продуктов рецептов в памяти процесса.
+
+    Для каждого продукта хранится битовое множество рецептов (int Python,
+    операции над которым выполняются сразу над машинными словами),
+    для каждого числа продуктов — множество рецептов с таким числом.
+    Число имеющихся продуктов для всех рецептов сразу считается
+    побитовым сумматором, поэтому запрос не перебирает рецепты.
+
+    Индекс сверяется с ревизией списка рецептов: изменённые рецепты
+    перечитываются по updated_at, после удаления рецептов из индекса
+    убираются рецепты, которых нет в базе. Полностью индекс
+    перестраивается при изменении справочника продуктов и когда
+    удалённые рецепты занимают больше половины позиций.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revisions = None
+        self._watermark = None
+        self._reset()
+
+    def _reset(self):
+        self._positions = {}
+        self._recipe_ids = []
+        self._ingredients = {}
+        self._postings = {}
+        self._totals = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._revisions = None
+
+    def _build(self):
+        watermark = timezone.now()
+        self.load(RecipeIngredient.objects.order_by().values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator())
+        self._watermark = watermark
+
+    def load(self, rows):
+        """Строит индекс по парам (id рецепта, id продукта)."""
+        recipes = defaultdict(list)
+        for recipe_id, ingredient_id in rows:
+            recipes[recipe_id].append(ingredient_id)
+        self._reset()
+        postings = defaultdict(list)
+        totals = defaultdict(list)
+        for position, recipe_id in enumerate(sorted(recipes)):
+            ingredients = frozenset(recipes[recipe_id])
+            self._positions[recipe_id] = position
+            self._recipe_ids.append(recipe_id)
+            self._ingredients[recipe_id] = ingredients
+            for ingredient_id in ingredients:
+                postings[ingredient_id].append(position)
+            totals[len(ingredients)].append(position)
+        self._postings = {
+            ingredient_id: bitset(positions)
+            for ingredient_id, positions in postings.items()
+        }
+        self._totals = {
+            total: bitset(positions) for total, positions in totals.items()
+        }
+
+    def _discard(self, recipe_id):
+        position = self._positions.get(recipe_id)
+        if position is None:
+            return None
+        mask = ~(1 << position)
+        ingredients = self._ingredients.pop(recipe_id)
+        for ingredient_id in ingredients:
+            self._postings[ingredient_id] &= mask
+        self._totals[len(ingredients)] &= mask
+        return position
+
+    def _update(self, recipe_ids):
+        """Перечитывает продукты рецептов и обновляет их биты."""
+        recipes = defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values_list('recipe_id', 'ingredient_id'):
+            recipes[recipe_id].add(ingredient_id)
+        for recipe_id in recipe_ids:
+            position = self._discard(recipe_id)
+            if recipe_id not in recipes:
+                if position is not None:
+                    del self._positions[recipe_id]
+                    self._recipe_ids[position] = None
+                continue
+            if position is None:
+                position = len(self._recipe_ids)
+                self._positions[recipe_id] = position
+                self._recipe_ids.append(recipe_id)
+            bit = 1 << position
+            ingredients = frozenset(recipes[recipe_id])
+            self._ingredients[recipe_id] = ingredients
+            for ingredient_id in ingredients:
+                self._postings[ingredient_id] = (
+                    self._postings.get(ingredient_id, 0) | bit
+                )
+            self._totals[len(ingredients)] = (
+                self._totals.get(len(ingredients), 0) | bit
+            )
+
+    def _removed(self):
+        """Рецепты индекса, которых больше нет в базе."""
+        existing = set(
+            Recipe.objects.order_by().values_list('pk', flat=True).iterator()
+        )
+        return [pk for pk in self._positions if pk not in existing]
+
+    def _sync(self):
+        revisions = tuple(
+            get_catalog_revision(catalog).version for catalog in (
+                RECIPE_LIST,
+                DELETED_RECIPES,
+                Ingredient._meta.label_lower,
+            )
+        )
+        if revisions == self._revisions:
+            return
+        if self._revisions is None or revisions[2] != self._revisions[2]:
+            self._build()
+        else:
+            watermark = timezone.now()
+            changed = list(Recipe.objects.filter(
+                updated_at__gte=self._watermark - SYNC_OVERLAP
+            ).values_list('pk', flat=True)[:INCREMENTAL_LIMIT + 1])
+            if revisions[1] != self._revisions[1]:
+                changed += self._removed()
+            if len(changed) > INCREMENTAL_LIMIT:
+                self._build()
+            else:
+                self._update(changed)
+                self._watermark = watermark
+                if len(self._recipe_ids) > 2 * len(self._positions):
+                    self._build()
+        self._revisions = revisions
+
+    def match(self, include, exclude=()):
+        """
+        Рецепты с продуктами из include и без продуктов из exclude.
+
+        Порядок: по убыванию доли имеющихся продуктов, затем по числу
+        имеющихся продуктов, затем от новых рецептов к старым.
+        """
+        include = set(include)
+        with self._lock:
+            self._sync()
+            postings = [self._postings.get(pk, 0) for pk in include]
+            candidates = 0
+            for bits in postings:
+                candidates |= bits
+            for pk in set(exclude):
+                candidates &= ~self._postings.get(pk, 0)
+            # Бит рецепта в slices[i] — i-й разряд числа имеющихся
+            # продуктов.
+            slices = bit_slices(bits & candidates for bits in postings)
+            groups = []
+            for total, recipes in self._totals.items():
+                recipes &= candidates
+                for matched in range(min(total, len(include)), 0, -1):
+                    if not recipes:
+                        break
+                    bits = select_count(recipes, slices, matched)
+                    if bits:
+                        groups.append((matched, total, bits))
+                        recipes &= ~bits
+            recipe_ids = self._recipe_ids
+        groups.sort(key=lambda group: (
+            -group[0] / group[1], -group[0]
+        ))
+        return PantryMatches(groups, recipe_ids)
+
+
+pantry_index = PantryIndex()
@@ -10,5 +10,5 @@ class ReadOnlyOrAuthor(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return (
             request.method in permissions.SAFE_METHODS
-            or obj.author == request.user
+            or obj.author_id == request.user.id
         )
@@ -0,0 +1,69 @@
+import hashlib
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipes.catalog import get_catalog_revision
+from .stats import CacheStats
+
+RECIPE_LIST = 'api.recipe_list'
+RECIPE_LIST_PARAMS = (
+    'author',
+    'cursor',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'limit',
+    'ordering',
+    'page',
+    'search',
+    'tags',
+)
+RECIPE_LIST_TIMEOUT = 600
+
+
+class ResponseCache:
+    """
+    Кэш данных ответов для анонимных пользователей.
+
+    Ключ строится из ревизии namespace и нормализованных параметров
+    запроса: учитываются только параметры из params, значения
+    сортируются, повторы отбрасываются. Смена ревизии (см.
+    api.signals) делает недоступными все записи namespace.
+    """
+
+    def __init__(self, namespace, params, timeout):
+        self.namespace = namespace
+        self.params = params
+        self.timeout = timeout
+        self.stats = CacheStats(namespace)
+
+    def make_key(self, request, revision):
+        query = sorted(
+            (name, sorted(set(request.query_params.getlist(name))))
+            for name in self.params if name in request.query_params
+        )
+        digest = hashlib.md5(
+            repr((request.get_host(), query)).encode()
+        ).hexdigest()
+        return f'{self.namespace}:{revision}:{digest}'
+
+    def get_response(self, request, build):
+        key = self.make_key(
+            request, get_catalog_revision(self.namespace).version
+        )
+        data = cache.get(key)
+        if data is not None:
+            self.stats.hit()
+            return Response(data, headers={'X-Cache': 'HIT'})
+        self.stats.miss()
+        response = build()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, self.timeout)
+            response['X-Cache'] = 'MISS'
+        return response
+
+
+recipe_list_cache = ResponseCache(
+    RECIPE_LIST, RECIPE_LIST_PARAMS, RECIPE_LIST_TIMEOUT
+)
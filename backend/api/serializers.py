@@ -1,7 +1,10 @@
 import base64
+from collections import Counter
+from datetime import datetime
 
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.db import transaction
 
 from rest_framework import serializers
 from djoser.serializers import (
@@ -17,10 +20,25 @@ from recipes.models import (
     ShoppingCart,
     Tag
 )
+from recipes.images import normalize_image, variant_urls
+from recipes.shopping_list import apply_recipe_deltas
 from users.models import Subscriptions
+from .autocomplete import AUTOCOMPLETE_LIMIT_MAX
+from .paginators import MAX_PAGE_SIZE
 
 User = get_user_model()
 
+RECIPES_LIMIT_MAX = 100
+PANTRY_INGREDIENTS_MAX = 50
+FEED_PAGE_SIZE = 6
+
+
+def get_recipes_limit(request):
+    """Возвращает проверенное значение параметра "recipes_limit"."""
+    serializer = RecipesLimitSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['recipes_limit']
+
 
 class Base64ImageField(serializers.ImageField):
     """Поле для обработки изображений в формате base64."""
@@ -30,7 +48,14 @@ class Base64ImageField(serializers.ImageField):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
             data = ContentFile(base64.b64decode(imgstr), name=f'temp.{ext}')
-        return super().to_internal_value(data)
+        return normalize_image(super().to_internal_value(data))
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """URL миниатюры и вариантов WebP; пусто, пока они не созданы."""
+
+    def to_representation(self, variants):
+        return variant_urls(variants, self.context.get('request'))
 
 
 class AvatarSerializer(serializers.ModelSerializer):
@@ -42,6 +67,11 @@ class AvatarSerializer(serializers.ModelSerializer):
         model = User
         fields = ('avatar',)
 
+    def update(self, user, validated_data):
+        user.avatar = validated_data['avatar']
+        user.save(update_fields=('avatar',))
+        return user
+
 
 class UserCreateSerializer(DjoserUserCreateSerializer):
     """Сериализатор для создания пользователей."""
@@ -56,15 +86,23 @@ class UserSerializer(DjoserUserSerializer):
     """Сериализатор для пользователей."""
 
     is_subscribed = serializers.SerializerMethodField()
+    avatar_variants = ImageVariantsField()
 
     class Meta(DjoserUserSerializer.Meta):
         fields = (
             *DjoserUserSerializer.Meta.fields,
             'is_subscribed',
-            'avatar'
+            'avatar',
+            'avatar_variants',
         )
 
     def get_is_subscribed(self, user):
+        is_subscribed = getattr(user, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
+        flags = self.context.get('user_flags')
+        if flags is not None:
+            return flags.is_subscribed(user.pk)
         request = self.context.get('request')
         if not request.user.is_authenticated:
             return False
@@ -77,9 +115,11 @@ class UserSerializer(DjoserUserSerializer):
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для модели Recipe для списка подписок."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -126,13 +166,22 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         ).data
 
 
+class RecipesLimitSerializer(serializers.Serializer):
+    """Сериализатор для параметра "recipes_limit" в запросе."""
+
+    recipes_limit = serializers.IntegerField(
+        min_value=0, required=False, default=RECIPES_LIMIT_MAX
+    )
+
+    def validate_recipes_limit(self, recipes_limit):
+        return min(recipes_limit, RECIPES_LIMIT_MAX)
+
+
 class SubscriptionsSerializer(UserSerializer):
     """Сериализатор для подписок."""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(
-        source='recipes.count', read_only=True
-    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UserSerializer.Meta):
         model = User
@@ -142,11 +191,12 @@ class SubscriptionsSerializer(UserSerializer):
             'recipes_count',
         )
 
-    def get_recipes(self, recipe):
+    def get_recipes(self, author):
         """Возращает рецепты согласно параметру "recipes_limit" в запросе."""
-        request = self.context.get('request')
-        recipes_limit = int(request.GET.get('recipes_limit', 1000))
-        recipes = recipe.recipes.all()[:recipes_limit]
+        recipes = getattr(author, 'limited_recipes', None)
+        if recipes is None:
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            recipes = author.recipes.all()[:recipes_limit]
         return ShortRecipeSerializer(
             recipes,
             many=True,
@@ -201,17 +251,72 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
-class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
-    """Сериализатор для создания ингредиентов."""
+class IngredientSearchSerializer(serializers.Serializer):
+    """Сериализатор для параметров поиска ингредиентов."""
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
+    name = serializers.CharField(
+        required=False, allow_blank=True, trim_whitespace=False
+    )
+    limit = serializers.IntegerField(
+        min_value=1, max_value=AUTOCOMPLETE_LIMIT_MAX, required=False
+    )
+
+
+class PantrySearchSerializer(serializers.Serializer):
+    """Сериализатор для параметров подбора рецептов по продуктам."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=PANTRY_INGREDIENTS_MAX
+    )
+    exclude = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        max_length=PANTRY_INGREDIENTS_MAX
+    )
+
+
+class FeedCursorField(serializers.CharField):
+    """Курсор ленты: ключ (pub_date, id) последнего рецепта страницы."""
+
+    default_error_messages = {'invalid': 'Неверный курсор.'}
+
+    def to_internal_value(self, data):
+        try:
+            pub_date, pk = base64.urlsafe_b64decode(
+                super().to_internal_value(data).encode()
+            ).decode().split(' ')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except ValueError:
+            self.fail('invalid')
+
+    def to_representation(self, value):
+        pub_date, pk = value
+        return base64.urlsafe_b64encode(
+            f'{pub_date.isoformat()} {pk}'.encode()
+        ).decode()
+
+
+class FeedSerializer(serializers.Serializer):
+    """Сериализатор для параметров ленты подписок."""
+
+    cursor = FeedCursorField(required=False)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=MAX_PAGE_SIZE, default=FEED_PAGE_SIZE
     )
-    amount = serializers.IntegerField(min_value=1)
 
-    class Meta:
-        model = RecipeIngredient
-        fields = ('id', 'amount')
+
+class RecipeIngredientCreateSerializer(serializers.Serializer):
+    """
+    Сериализатор для создания ингредиентов.
+
+    Продукты по id загружаются одним запросом для всего рецепта
+    в RecipeCreateUpdateSerializer.validate_ingredients.
+    """
+
+    id = serializers.IntegerField()
+    amount = serializers.IntegerField(min_value=1)
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
@@ -246,6 +351,7 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -258,6 +364,7 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
@@ -265,6 +372,12 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, recipe):
         """Проверяет, добавлен ли рецепт в избранное."""
+        is_favorited = getattr(recipe, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
+        flags = self.context.get('user_flags')
+        if flags is not None:
+            return flags.is_favorited(recipe.pk)
         user = self.context.get('request').user
         return (
             user.is_authenticated
@@ -273,6 +386,12 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
 
     def get_is_in_shopping_cart(self, recipe):
         """Проверяет, добавлен ли рецепт в список покупок."""
+        is_in_shopping_cart = getattr(recipe, 'is_in_shopping_cart', None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
+        flags = self.context.get('user_flags')
+        if flags is not None:
+            return flags.is_in_shopping_cart(recipe.pk)
         user = self.context.get('request').user
         return (
             user.is_authenticated
@@ -280,13 +399,44 @@ class RecipeRetrieveSerializer(serializers.ModelSerializer):
         )
 
 
+class RecipeDetailSerializer(RecipeRetrieveSerializer):
+    """Рецепт с похожими по составу рецептами."""
+
+    similar = serializers.SerializerMethodField()
+
+    class Meta(RecipeRetrieveSerializer.Meta):
+        fields = (*RecipeRetrieveSerializer.Meta.fields, 'similar')
+        read_only_fields = fields
+
+    def get_similar(self, recipe):
+        """Похожие рецепты, загруженные в similar_list (см. views)."""
+        return ShortRecipeSerializer(
+            (entry.similar for entry in recipe.similar_list),
+            many=True,
+            context=self.context
+        ).data
+
+
+class RecipeMatchSerializer(RecipeRetrieveSerializer):
+    """Рецепт с числом имеющихся и недостающих продуктов."""
+
+    matched_ingredients_count = serializers.IntegerField(read_only=True)
+    missing_ingredients_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeRetrieveSerializer.Meta):
+        fields = (
+            *RecipeRetrieveSerializer.Meta.fields,
+            'matched_ingredients_count',
+            'missing_ingredients_count',
+        )
+        read_only_fields = fields
+
+
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и обновления рецепта."""
 
     ingredients = RecipeIngredientCreateSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     image = Base64ImageField(required=True)
 
     class Meta:
@@ -302,37 +452,55 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         read_only_fields = ('author',)
 
     def to_representation(self, instance):
+        user = self.context.get('request').user
+        instance = Recipe.objects.with_related(user).get(pk=instance.pk)
         return RecipeRetrieveSerializer(instance, context=self.context).data
 
     @staticmethod
-    def validate_items(items, model, field_name):
-        if not items:
+    def get_items(ids, model, field_name):
+        """Загружает объекты model по списку ids одним запросом."""
+        if not ids:
             raise serializers.ValidationError(
-                {field_name: f'Поле {field_name} не может быть пустым.'}
+                f'Поле {field_name} не может быть пустым.'
             )
-        existing_items = model.objects.filter(
-            id__in=items).values_list('id', flat=True)
-        missing_items = set(items) - set(existing_items)
+        non_unique_ids = {
+            item_id for item_id, count in Counter(ids).items() if count > 1
+        }
+        items = model.objects.in_bulk(ids)
+        missing_items = set(ids) - items.keys()
         if missing_items:
             raise serializers.ValidationError(
-                {field_name: f'Элемент(ы) с id {missing_items} не существует.'}
+                f'Элемент(ы) с id {missing_items} не существует.'
             )
-        non_unique_ids = {item for item in items if items.count(item) > 1}
         if non_unique_ids:
             raise serializers.ValidationError(
-                {field_name: f'Элементы с id {non_unique_ids} не уникальны.'}
+                f'Элементы с id {non_unique_ids} не уникальны.'
             )
+        return items
+
+    def validate_ingredients(self, ingredients):
+        items = self.get_items(
+            [ingredient['id'] for ingredient in ingredients],
+            Ingredient, 'ingredients'
+        )
+        return [
+            {'id': items[ingredient['id']], 'amount': ingredient['amount']}
+            for ingredient in ingredients
+        ]
+
+    def validate_tags(self, tags):
+        items = self.get_items(tags, Tag, 'tags')
+        return [items[tag] for tag in tags]
 
     def validate(self, data):
-        tags = self.initial_data.get('tags')
-        ingredients = self.initial_data.get('ingredients')
-        if not ingredients:
+        if 'ingredients' not in data:
             raise serializers.ValidationError(
                 'Поле "ingredients" не может быть пустым.'
             )
-        ingredients_ids = [item['id'] for item in ingredients]
-        self.validate_items(ingredients_ids, Ingredient, 'ingredients')
-        self.validate_items(tags, Tag, 'tags')
+        if 'tags' not in data:
+            raise serializers.ValidationError(
+                {'tags': 'Поле tags не может быть пустым.'}
+            )
         return data
 
     def set_ingredients(self, recipe, ingredients):
@@ -346,6 +514,45 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             for ingredient in ingredients
         )
 
+    def update_ingredients(self, recipe, ingredients):
+        """
+        Изменяет только удалённые, новые и изменившиеся ингредиенты.
+
+        Разница количеств переносится в списки покупок.
+        """
+        existing = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        amounts = {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in ingredients
+        }
+        deltas = Counter(amounts)
+        deltas.subtract({
+            ingredient_id: item.amount
+            for ingredient_id, item in existing.items()
+        })
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            item = existing.get(ingredient_id)
+            if item is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        self.set_ingredients(recipe, (
+            ingredient for ingredient in ingredients
+            if ingredient['id'].pk not in existing
+        ))
+        apply_recipe_deltas(recipe.pk, deltas)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -355,11 +562,8 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         self.set_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop('ingredients')
-        tags_data = validated_data.pop('tags')
-        instance.save()
-        instance.ingredients.clear()
-        self.set_ingredients(instance, ingredients_data)
-        instance.tags.set(tags_data)
+        self.update_ingredients(instance, validated_data.pop('ingredients'))
+        instance.tags.set(validated_data.pop('tags'))
         return super().update(instance, validated_data)
@@ -0,0 +1,64 @@
+import string
+
+from recipes.catalog import get_catalog_revision
+from recipes.models import Recipe
+from .mixins import RevisionCache
+
+ALPHABET = string.digits + string.ascii_lowercase + string.ascii_uppercase
+BASE = len(ALPHABET)
+INDEX = {char: index for index, char in enumerate(ALPHABET)}
+# Наибольшее значение BigAutoField; более длинные коды не разбираются.
+MAX_PK = 2 ** 63 - 1
+MAX_CODE_LENGTH = len(str(MAX_PK))
+# Ревизия меняется при удалении рецептов и сбрасывает кэш id.
+DELETED_RECIPES = 'api.deleted_recipes'
+VALID_IDS_CACHE_SIZE = 100000
+
+valid_ids = RevisionCache(VALID_IDS_CACHE_SIZE)
+
+
+def encode(pk):
+    """
+    Возвращает короткий код рецепта в base62.
+
+    Код, состоящий только из цифр, совпадал бы со старыми ссылками
+    вида /s/<id>/, поэтому для таких id возвращается сам id.
+    """
+    code = ''
+    number = pk
+    while number:
+        number, remainder = divmod(number, BASE)
+        code = ALPHABET[remainder] + code
+    return str(pk) if code.isdigit() or not code else code
+
+
+def decode(code):
+    """Возвращает id рецепта по коду или None для некорректного кода."""
+    if len(code) > MAX_CODE_LENGTH:
+        return None
+    if code.isdigit():
+        pk = int(code)
+    else:
+        pk = 0
+        for char in code:
+            if char not in INDEX:
+                return None
+            pk = pk * BASE + INDEX[char]
+    return pk if pk <= MAX_PK else None
+
+
+def recipe_exists(pk):
+    """
+    Проверяет существование рецепта.
+
+    Существующие id хранятся в LRU-кэше процесса до удаления
+    любого рецепта, поэтому повторные переходы по ссылке
+    не обращаются к базе.
+    """
+    revision = get_catalog_revision(DELETED_RECIPES).version
+    if valid_ids.get(revision, pk):
+        return True
+    if not Recipe.objects.filter(pk=pk).exists():
+        return False
+    valid_ids.set(revision, pk, True)
+    return True
@@ -0,0 +1,153 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.catalog import bump_catalog_revision
+from recipes.images import variants_ready
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    SimilarRecipe,
+    Tag
+)
+from recipes.popularity import scores_updated
+from recipes.signals import catalog_changed
+from users.models import Subscriptions
+from .authentication import AUTH_USER
+from .conditional import AUTHOR_FIELDS, USER_FLAGS
+from .response_cache import RECIPE_LIST
+from .shortlinks import DELETED_RECIPES
+from .user_flags import user_flags_cache
+
+User = get_user_model()
+
+
+def invalidate_recipe_list():
+    """Сбрасывает кэш списка рецептов после фиксации транзакции."""
+    transaction.on_commit(lambda: bump_catalog_revision(RECIPE_LIST))
+
+
+@receiver(catalog_changed, sender=Recipe)
+@receiver(catalog_changed, sender=Tag)
+@receiver(catalog_changed, sender=Ingredient)
+@receiver(variants_ready)
+@receiver(scores_updated)
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def recipe_changed(**kwargs):
+    invalidate_recipe_list()
+
+
+@receiver(variants_ready, sender=Recipe)
+@receiver((post_save, post_delete), sender=Recipe)
+def similar_recipe_changed(**kwargs):
+    """Карточки рецептов выводят название и изображение похожих."""
+    transaction.on_commit(lambda: bump_catalog_revision(
+        SimilarRecipe._meta.label_lower
+    ))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscriptions)
+def user_flags_changed(instance, **kwargs):
+    """
+    Сбрасывает ETag списков рецептов и кэш флагов пользователя.
+
+    Смена ревизии делает устаревшими флаги пользователя в кэшах
+    всех процессов, запись текущего процесса удаляется сразу.
+    """
+    def invalidate():
+        bump_catalog_revision(USER_FLAGS.format(instance.user_id))
+        user_flags_cache.discard(instance.user_id)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(**kwargs):
+    """Сбрасывает кэш существующих id для коротких ссылок."""
+    transaction.on_commit(lambda: bump_catalog_revision(DELETED_RECIPES))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_recipe_list()
+
+
+@receiver(pre_save, sender=User)
+def remember_author_fields(instance, update_fields, **kwargs):
+    """Запоминает выводимые поля автора до сохранения."""
+    if not instance.pk or not instance.recipes_count:
+        return
+    if update_fields is not None and not set(update_fields) & set(
+        AUTHOR_FIELDS
+    ):
+        return
+    instance._author_fields = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*AUTHOR_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def author_changed(instance, **kwargs):
+    old_fields = instance.__dict__.pop('_author_fields', None)
+    if old_fields is None:
+        return
+    new_fields = tuple(
+        str(getattr(instance, field) or '') for field in AUTHOR_FIELDS
+    )
+    if new_fields != tuple(str(value or '') for value in old_fields):
+        invalidate_recipe_list()
+
+
+@receiver(post_delete, sender=User)
+def author_deleted(instance, **kwargs):
+    if instance.recipes_count:
+        invalidate_recipe_list()
+
+
+@receiver((post_save, post_delete), sender=User)
+@receiver(post_delete, sender=Token)
+def auth_user_changed(sender, instance, **kwargs):
+    """
+    Сбрасывает пользователя в кэше токенов.
+
+    Выход удаляет токен; смена пароля, блокировка и изменение профиля
+    сохраняют пользователя.
+    """
+    user_id = instance.pk if sender is User else instance.user_id
+    transaction.on_commit(lambda: bump_catalog_revision(
+        AUTH_USER.format(user_id)
+    ))
+
+
+@receiver(variants_ready, sender=User)
+def auth_user_variants_ready(pk, **kwargs):
+    """Варианты аватара записываются через update() без post_save."""
+    transaction.on_commit(lambda: bump_catalog_revision(AUTH_USER.format(pk)))
+
+
+@receiver((post_save, post_delete), sender=Subscriptions)
+@receiver((post_save, post_delete), sender=Recipe)
+def auth_user_counters_changed(instance, created=True, **kwargs):
+    """Счётчики подписчиков и рецептов автора меняются через update()."""
+    author_id = instance.author_id
+    if created and author_id:
+        transaction.on_commit(lambda: bump_catalog_revision(
+            AUTH_USER.format(author_id)
+        ))
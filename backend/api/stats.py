@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+
+from django.core.cache import cache
+
+STATS_KEY = 'stats:{}:{}'
+STATS_FLUSH_INTERVAL = 10
+KINDS = ('hits', 'misses')
+
+
+class CacheStats:
+    """
+    Счётчики попаданий и промахов кэша.
+
+    Запрос увеличивает только счётчики процесса. Раз в
+    STATS_FLUSH_INTERVAL секунд накопленное прибавляется к записи
+    процесса в общем кэше Django; запись процесса меняет только он сам,
+    поэтому атомарные операции кэша не нужны. Команда cache_stats
+    суммирует записи всех процессов.
+    """
+
+    registry = {}
+
+    def __init__(self, name, flush_interval=STATS_FLUSH_INTERVAL):
+        self.name = name
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = dict.fromkeys(KINDS, 0)
+        self._flush_at = time.monotonic() + flush_interval
+        self.registry[name] = self
+
+    @property
+    def processes_key(self):
+        return STATS_KEY.format(self.name, 'processes')
+
+    def _take(self):
+        pending = self._pending
+        self._pending = dict.fromkeys(KINDS, 0)
+        self._flush_at = time.monotonic() + self.flush_interval
+        return pending
+
+    def _increment(self, kind):
+        with self._lock:
+            self._pending[kind] += 1
+            if time.monotonic() < self._flush_at:
+                return
+            pending = self._take()
+        self._store(pending)
+
+    def _store(self, pending):
+        key = STATS_KEY.format(self.name, os.getpid())
+        stored = cache.get(key) or {}
+        cache.set(key, {
+            kind: stored.get(kind, 0) + pending[kind] for kind in KINDS
+        }, timeout=None)
+        # Список процессов дополняется без блокировки: потерянное при
+        # гонке добавление повторится при следующем сбросе.
+        processes = cache.get(self.processes_key, frozenset())
+        if key not in processes:
+            cache.set(self.processes_key, processes | {key}, timeout=None)
+
+    def flush(self):
+        """Переносит счётчики процесса в общий кэш."""
+        with self._lock:
+            pending = self._take()
+        self._store(pending)
+
+    def hit(self):
+        self._increment('hits')
+
+    def miss(self):
+        self._increment('misses')
+
+    def snapshot(self):
+        with self._lock:
+            totals = dict(self._pending)
+        processes = cache.get(self.processes_key, frozenset())
+        for values in cache.get_many(processes).values():
+            for kind in KINDS:
+                totals[kind] += values.get(kind, 0)
+        hits, misses = totals['hits'], totals['misses']
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._take()
+        processes = cache.get(self.processes_key, frozenset())
+        cache.delete_many([*processes, self.processes_key])
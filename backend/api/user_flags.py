@@ -0,0 +1,104 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscriptions
+from .conditional import user_flags_revision
+from .stats import CacheStats
+
+USER_FLAGS_CACHE_SIZE = 10000
+# Страховка от изменений без сигналов (bulk_create, update).
+USER_FLAGS_TTL = 300
+
+
+def sorted_ids(queryset, field):
+    return array('q', queryset.order_by(field).values_list(field, flat=True))
+
+
+def contains(ids, value):
+    position = bisect_left(ids, value)
+    return position < len(ids) and ids[position] == value
+
+
+class UserFlags:
+    """Избранное, список покупок и подписки пользователя."""
+
+    __slots__ = ('favorites', 'shopping_cart', 'following')
+
+    def __init__(self, favorites, shopping_cart, following):
+        self.favorites = favorites
+        self.shopping_cart = shopping_cart
+        self.following = following
+
+    @classmethod
+    def load(cls, user_id):
+        return cls(
+            sorted_ids(Favorite.objects.filter(user_id=user_id), 'recipe_id'),
+            sorted_ids(
+                ShoppingCart.objects.filter(user_id=user_id), 'recipe_id'
+            ),
+            sorted_ids(
+                Subscriptions.objects.filter(user_id=user_id), 'author_id'
+            ),
+        )
+
+    def is_favorited(self, recipe_id):
+        return contains(self.favorites, recipe_id)
+
+    def is_in_shopping_cart(self, recipe_id):
+        return contains(self.shopping_cart, recipe_id)
+
+    def is_subscribed(self, author_id):
+        return author_id is not None and contains(self.following, author_id)
+
+
+class UserFlagsCache:
+    """
+    Флаги пользователей в памяти процесса.
+
+    Запись действует, пока не сменилась ревизия флагов пользователя
+    (см. api.signals) и не истёк USER_FLAGS_TTL; число пользователей
+    ограничено, вытесняются давно не использованные.
+    """
+
+    def __init__(self, max_size=USER_FLAGS_CACHE_SIZE, ttl=USER_FLAGS_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = CacheStats('api.user_flags')
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, user):
+        """Флаги пользователя; None для анонимного пользователя."""
+        if not user.is_authenticated:
+            return None
+        revision = user_flags_revision(user)
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(user.pk)
+            if item is not None and item[0] == revision and item[1] > now:
+                self._items.move_to_end(user.pk)
+                self.stats.hit()
+                return item[2]
+        self.stats.miss()
+        flags = UserFlags.load(user.pk)
+        with self._lock:
+            self._items[user.pk] = (revision, now + self.ttl, flags)
+            self._items.move_to_end(user.pk)
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return flags
+
+    def discard(self, user_id):
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+user_flags_cache = UserFlagsCache()
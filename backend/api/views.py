@@ -1,6 +1,14 @@
+from itertools import chain
+
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import FileResponse
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Prefetch,
+    Value,
+    prefetch_related_objects
+)
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
 
@@ -11,24 +19,45 @@ from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
+from recipes.feed import read_feed
 from recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
-    RecipeIngredient,
     ShoppingCart,
+    ShoppingCartIngredient,
+    SimilarRecipe,
     Tag,
 )
 from users.models import Subscriptions
+from .autocomplete import AUTOCOMPLETE_LIMIT, ingredient_index
+from .conditional import (
+    instance_state,
+    is_not_modified,
+    not_modified,
+    recipe_etag,
+    recipe_list_etag,
+    stored_recipe_etag
+)
 from .filters import IngredientFilter, RecipeFilter
-from .paginators import PaginatorWithLimit
+from .pantry import pantry_index
+from .mixins import CatalogCacheMixin, UserFlagsMixin
+from .paginators import LimitPageNumberPagination, PaginatorWithLimit
 from .permissions import ReadOnlyOrAuthor
+from .response_cache import recipe_list_cache
 from .serializers import (
     AvatarSerializer,
     FavoriteSerializer,
+    FeedCursorField,
+    FeedSerializer,
+    IngredientSearchSerializer,
     IngredientSerializer,
+    PantrySearchSerializer,
     RecipeCreateUpdateSerializer,
+    RecipeDetailSerializer,
+    RecipeMatchSerializer,
     RecipeRetrieveSerializer,
     ShoppingCartSerializer,
     SubscribeSerializer,
@@ -36,16 +65,37 @@ from .serializers import (
     TagSerializer,
     UserCreateSerializer,
     UserSerializer,
+    get_recipes_limit,
 )
+from .shortlinks import decode, encode, recipe_exists
 from .utils import generate_txt
 
 User = get_user_model()
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(UserFlagsMixin, DjoserUserViewSet):
     """ViewSet для управления пользователями."""
 
     pagination_class = PaginatorWithLimit
+    user_flags_actions = ('list', 'retrieve', 'me')
+    # Действия, сохраняющие текущего пользователя целиком: пользователь
+    # из кэша токенов может содержать устаревшие счётчики и варианты
+    # аватара. Аватар сохраняется только своим полем.
+    self_write_actions = ('me', 'set_password')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            self.action in self.self_write_actions
+            and request.method not in permissions.SAFE_METHODS
+        ):
+            request.user.refresh_from_db()
+
+    def get_queryset(self):
+        users = super().get_queryset()
+        if self.get_user_flags() is not None:
+            return users
+        return users.with_is_subscribed(self.request.user)
 
     def get_serializer_class(self):
         if self.action == 'set_password':
@@ -74,7 +124,7 @@ class UserViewSet(DjoserUserViewSet):
             serializer.save()
             return Response(serializer.data)
         request.user.avatar = None
-        request.user.save()
+        request.user.save(update_fields=('avatar',))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -83,14 +133,27 @@ class UserViewSet(DjoserUserViewSet):
         url_path='subscriptions'
     )
     def subscriptions(self, request):
-        subscriptions = User.objects.filter(authors__user=request.user)
+        recipes_limit = get_recipes_limit(request)
+        subscriptions = User.objects.filter(
+            authors__user=request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        )
         page = self.paginate_queryset(subscriptions)
+        authors = page if page is not None else list(subscriptions)
+        prefetch_related_objects(authors, Prefetch(
+            'recipes',
+            queryset=Recipe.objects.filter(
+                author__in=authors
+            ).limit_per_author(recipes_limit),
+            to_attr='limited_recipes'
+        ))
         serializer = SubscriptionsSerializer(
-            page if page else subscriptions,
+            authors,
             many=True,
             context={'request': request}
         )
-        if page:
+        if page is not None:
             return self.get_paginated_response(serializer.data)
         return Response(serializer.data)
 
@@ -126,7 +189,7 @@ class UserViewSet(DjoserUserViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet для управления тегами."""
 
     queryset = Tag.objects.all()
@@ -134,7 +197,7 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (permissions.AllowAny,)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet для управления ингридиентами."""
 
     queryset = Ingredient.objects.all()
@@ -143,20 +206,114 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (permissions.AllowAny,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, self.search)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    def search(self, request):
+        """
+        Поиск продуктов по названию для автодополнения.
+
+        Без limit возвращается не больше AUTOCOMPLETE_LIMIT продуктов,
+        в том числе без названия. Пока справочник помещается в индекс
+        в памяти процесса, запросы к базе не выполняются.
+        """
+        params = IngredientSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        name = params.validated_data.get('name')
+        limit = params.validated_data.get('limit', AUTOCOMPLETE_LIMIT)
+        if ingredient_index.is_available:
+            if name:
+                return Response(ingredient_index.search(name, limit))
+            return Response(ingredient_index.all(limit))
+        ingredients = self.filter_queryset(self.get_queryset())[:limit]
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
+
+class RecipeViewSet(UserFlagsMixin, viewsets.ModelViewSet):
     """ViewSet для управления рецептами."""
 
-    queryset = Recipe.objects.select_related(
-        'author').prefetch_related('recipe_ingredients', 'tags')
     filter_backends = (DjangoFilterBackend,)
     pagination_class = PaginatorWithLimit
     permission_classes = (ReadOnlyOrAuthor,)
     filterset_class = RecipeFilter
+    user_flags_actions = ('list', 'retrieve', 'feed', 'what_to_cook')
+
+    def get_queryset(self):
+        """
+        Рецепты с флагами текущего пользователя и связанными объектами.
+
+        Изменению и удалению нужен только сам рецепт, поэтому для них
+        связанные объекты не загружаются. Похожие рецепты загружаются
+        одним запросом только для карточки рецепта.
+        """
+        if self.action in ('update', 'partial_update', 'destroy'):
+            return Recipe.objects.all()
+        recipes = self.related_recipes()
+        if self.action == 'retrieve':
+            recipes = recipes.prefetch_related(Prefetch(
+                'similar_entries',
+                queryset=SimilarRecipe.objects.select_related(
+                    'similar'
+                ).order_by('-score', '-similar_id'),
+                to_attr='similar_list'
+            ))
+        return recipes
+
+    def related_recipes(self):
+        """Рецепты для вывода; флаги аннотируются без кэша флагов."""
+        return Recipe.objects.with_related(
+            self.request.user, flags=self.get_user_flags() is None
+        )
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список рецептов; ответы анонимным пользователям кэшируются.
+
+        ETag строится из ревизий без обращения к базе.
+        """
+        etag = recipe_list_etag(request)
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        if request.user.is_authenticated:
+            response = super().list(request, *args, **kwargs)
+        else:
+            response = recipe_list_cache.get_response(
+                request, lambda: super(RecipeViewSet, self).list(
+                    request, *args, **kwargs
+                )
+            )
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Рецепт с ETag.
+
+        На If-None-Match ETag проверяется одним запросом без загрузки
+        ингредиентов и тегов и без сериализации.
+        """
+        pk = str(kwargs['pk'])
+        if request.headers.get('If-None-Match') and pk.isdigit():
+            etag = stored_recipe_etag(request, pk)
+            if etag is not None and is_not_modified(request, etag):
+                return not_modified(etag)
+        recipe = self.get_object()
+        serializer = self.get_serializer(recipe)
+        return Response(serializer.data, headers={
+            'ETag': recipe_etag(
+                request, instance_state(recipe, self.get_user_flags())
+            )
+        })
 
     def get_serializer_class(self):
-        if self.action in ('retrieve', 'get_link'):
+        if self.action == 'retrieve':
+            return RecipeDetailSerializer
+        if self.action in ('list', 'get_link', 'feed'):
             return RecipeRetrieveSerializer
+        if self.action == 'what_to_cook':
+            return RecipeMatchSerializer
         return RecipeCreateUpdateSerializer
 
     @action(
@@ -165,34 +322,108 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path='get-link'
     )
     def get_link(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
+        if not pk.isdigit() or not recipe_exists(int(pk)):
+            raise Http404
         short_link = request.build_absolute_uri(
-            reverse('shortlink', args=[recipe.pk])
+            reverse('shortlink', args=[encode(int(pk))])
         )
         return Response({"short-link": short_link}, status=status.HTTP_200_OK)
 
+    @action(
+        detail=False, methods=('get',),
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def feed(self, request):
+        """
+        Лента рецептов авторов, на которых подписан пользователь.
+
+        Пагинация по ключу (pub_date, id): параметр cursor берётся
+        из ссылки next предыдущей страницы.
+        """
+        params = FeedSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        limit = params.validated_data['limit']
+        keys = read_feed(
+            request.user, limit + 1, params.validated_data.get('cursor')
+        )
+        page = keys[:limit]
+        recipes = self.related_recipes().in_bulk(
+            [pk for _, pk in page]
+        )
+        serializer = self.get_serializer(
+            [recipes[pk] for _, pk in page if pk in recipes], many=True
+        )
+        next_link = None
+        if len(keys) > limit:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'cursor',
+                FeedCursorField().to_representation(page[-1])
+            )
+        return Response({'next': next_link, 'results': serializer.data})
+
+    @action(
+        detail=False, methods=('get',),
+        permission_classes=(permissions.AllowAny,),
+        pagination_class=LimitPageNumberPagination,
+        url_path='what_to_cook'
+    )
+    def what_to_cook(self, request):
+        """
+        Подбор рецептов по имеющимся продуктам.
+
+        Рецепты отбираются и упорядочиваются по доле имеющихся продуктов
+        индексом в памяти процесса, из базы загружается только страница.
+        """
+        params = PantrySearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        page = self.paginate_queryset(pantry_index.match(
+            params.validated_data['ingredients'],
+            params.validated_data.get('exclude', ())
+        ))
+        recipes = self.related_recipes().in_bulk(
+            [pk for pk, _, _ in page if pk is not None]
+        )
+        found = []
+        for pk, matched, total in page:
+            recipe = recipes.get(pk)
+            if recipe is not None:
+                recipe.matched_ingredients_count = matched
+                recipe.missing_ingredients_count = total - matched
+                found.append(recipe)
+        serializer = self.get_serializer(found, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=False, methods=('get',),
         permission_classes=(permissions.IsAuthenticated,),
         url_path='download_shopping_cart'
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        if not user.shopping_cart.exists():
+        """
+        Потоковая выгрузка списка покупок.
+
+        Строки формируются по мере чтения итоговых количеств продуктов
+        из серверного курсора, поэтому память не зависит от размера списка.
+        """
+        ingredients = ShoppingCartIngredient.objects.filter(
+            user=request.user
+        ).values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'amount'
+        ).order_by('ingredient__name').iterator()
+        first = next(ingredients, None)
+        if first is None:
             return Response(
                 'Список покупок пуст.',
                 status=status.HTTP_204_NO_CONTENT
             )
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        response = FileResponse(
-            generate_txt(ingredients),
-            content_type='text/plain',
-            filename='shopping_list.txt'
+        response = StreamingHttpResponse(
+            generate_txt(chain((first,), ingredients)),
+            content_type='text/plain; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="shopping_list.txt"'
         )
         return response
 
@@ -206,7 +437,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 data=data, context={'request': request}
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         subscription = model.objects.filter(user=user, recipe=recipe).first()
         if not subscription:
@@ -239,8 +471,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
 
-def redirect_to_recipe_detail(request, pk):
-    if Recipe.objects.filter(pk=pk).exists():
-        return redirect(f'/recipes/{pk}/')
-    else:
-        raise ValidationError(f'Рецепт с id {pk} отсутствует.')
+def redirect_to_recipe_detail(request, code):
+    pk = decode(code)
+    if pk is None or not recipe_exists(pk):
+        raise Http404(f'Рецепт с кодом {code} отсутствует.')
+    return redirect(f'/recipes/{pk}/')
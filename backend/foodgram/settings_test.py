@@ -0,0 +1,31 @@
+"""Настройки для запуска тестов на SQLite без внешних сервисов."""
+import os
+import tempfile
+
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+os.environ.setdefault('ALLOWED_HOSTS', 'testserver,localhost')
+
+from .settings import *  # noqa: E402,F401,F403
+
+DEBUG = False
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+PASSWORD_HASHERS = (
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+)
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram_media_')
+
+JOBS_EAGER = True
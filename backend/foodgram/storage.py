@@ -0,0 +1,54 @@
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+CONTENT_NAME = re.compile(
+    r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[0-9a-z]+)?$'
+)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, в котором имя файла — SHA-256 его содержимого.
+
+    Файл из recipes_images/temp.png сохраняется как
+    recipes_images/ab/cd/abcd….png: одинаковое содержимое хранится
+    один раз, а файлы распределены по 65536 подкаталогам. Так как
+    один файл могут использовать несколько записей, вызывающий код
+    не должен удалять файлы, полученные из этого хранилища
+    (см. deduplicates).
+    """
+
+    deduplicates = True
+
+    @staticmethod
+    def is_content_name(name):
+        return bool(CONTENT_NAME.search(name or ''))
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя определяется содержимым в _save().
+        return name
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk.encode() if isinstance(chunk, str) else chunk)
+        digest = digest.hexdigest()
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(
+            directory, digest[:2], digest[2:4], f'{digest}{extension}'
+        )
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
@@ -8,7 +8,7 @@ from api.views import redirect_to_recipe_detail
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls', namespace='api')),
-    path('s/<int:pk>/', redirect_to_recipe_detail, name='shortlink'),
+    path('s/<str:code>/', redirect_to_recipe_detail, name='shortlink'),
 ]
 
 
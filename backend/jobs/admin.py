@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'task',
+        'status',
+        'attempts',
+        'run_at',
+        'created_at',
+        'finished_at'
+    )
+    list_filter = ('status', 'task')
+    search_fields = ('task',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from jobs.models import Job
+from jobs.queue import queue_stats
+
+
+class Command(BaseCommand):
+    help = 'Состояние очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--failed',
+            type=int,
+            default=10,
+            help='Сколько последних задач с ошибкой показать'
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Вернуть задачи с ошибкой в очередь'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = Job.objects.filter(status=Job.FAILED).update(
+                status=Job.PENDING, attempts=0, finished_at=None
+            )
+            self.stdout.write(f'Возвращено в очередь: {retried}')
+        stats = queue_stats()
+        statuses = dict(Job.STATUSES)
+        for status, count in stats['counts'].items():
+            self.stdout.write(f'{statuses[status]}: {count}')
+        self.stdout.write(
+            f'Готово к запуску: {stats["ready"]}, '
+            f'ожидание старейшей: {stats["oldest_wait"]:.1f} c\n'
+            f'Средняя задержка запуска: {stats["latency"]:.2f} c, '
+            f'средняя длительность: {stats["duration"]:.2f} c'
+        )
+        for job in Job.objects.filter(status=Job.FAILED).order_by(
+            '-finished_at'
+        )[:options['failed']]:
+            error = job.last_error.strip().splitlines()
+            self.stdout.write(self.style.ERROR(
+                f'#{job.pk} {job.task} {job.args} '
+                f'попыток: {job.attempts}: {error[-1] if error else ""}'
+            ))
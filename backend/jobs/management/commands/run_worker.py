@@ -0,0 +1,138 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait
+)
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from jobs import process
+from jobs.queue import claim, purge, queue_stats
+
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Обработчик фоновых задач из очереди в базе данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help='Количество одновременно выполняемых задач'
+        )
+        parser.add_argument(
+            '--pool',
+            choices=('thread', 'process'),
+            default='thread',
+            help='Выполнять задачи в потоках или в отдельных процессах'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Пауза между проверками пустой очереди, в секундах'
+        )
+        parser.add_argument(
+            '--report-interval',
+            type=float,
+            default=60.0,
+            help='Период вывода статистики очереди, в секундах'
+        )
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=7,
+            help='Сколько дней хранить выполненные задачи'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Завершиться, когда в очереди не останется готовых задач'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency должен быть больше нуля.')
+        self.stopping = False
+        handlers = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            self.work(concurrency, options)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+    def work(self, concurrency, options):
+        if options['pool'] == 'process':
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=process.setup
+            )
+        else:
+            executor = ThreadPoolExecutor(
+                max_workers=concurrency, thread_name_prefix='job'
+            )
+        self.stdout.write(
+            f'Обработчик запущен: {concurrency} ({options["pool"]})'
+        )
+        running = set()
+        totals = {'done': 0, 'failed': 0}
+        last_report = last_purge = time.monotonic()
+        with executor:
+            while not self.stopping:
+                if len(running) < concurrency:
+                    running.update(
+                        executor.submit(process.execute, job.pk)
+                        for job in claim(concurrency - len(running))
+                    )
+                if running:
+                    finished, running = wait(
+                        running, timeout=options['poll_interval'],
+                        return_when=FIRST_COMPLETED
+                    )
+                    for future in finished:
+                        succeeded, _, _ = future.result()
+                        totals['done' if succeeded else 'failed'] += 1
+                elif options['burst']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+                now = time.monotonic()
+                if now - last_report >= options['report_interval']:
+                    self.report(totals)
+                    last_report = now
+                if now - last_purge >= PURGE_INTERVAL:
+                    purge(timezone.now() - timedelta(
+                        days=options['keep_days']
+                    ))
+                    last_purge = now
+        self.report(totals)
+
+    def stop(self, signum, frame):
+        self.stdout.write('Остановка после завершения текущих задач')
+        self.stopping = True
+
+    def report(self, totals):
+        stats = queue_stats()
+        self.stdout.write(
+            f'Выполнено: {totals["done"]}, ошибок: {totals["failed"]}, '
+            f'готово к запуску: {stats["ready"]}, '
+            f'ожидание старейшей: {stats["oldest_wait"]:.1f} c, '
+            f'средняя задержка: {stats["latency"]:.2f} c, '
+            f'средняя длительность: {stats["duration"]:.2f} c'
+        )
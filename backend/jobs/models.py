@@ -0,0 +1,79 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Задача фоновой очереди: путь к функции и её аргументы."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    task = models.CharField(
+        verbose_name='Функция',
+        max_length=256
+    )
+    args = models.JSONField(
+        verbose_name='Аргументы',
+        default=list
+    )
+    kwargs = models.JSONField(
+        verbose_name='Именованные аргументы',
+        default=dict
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток',
+        default=5
+    )
+    run_at = models.DateTimeField(
+        verbose_name='Запланирована на',
+        default=timezone.now
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Создана',
+        auto_now_add=True
+    )
+    started_at = models.DateTimeField(
+        verbose_name='Начата',
+        null=True,
+        blank=True
+    )
+    finished_at = models.DateTimeField(
+        verbose_name='Завершена',
+        null=True,
+        blank=True
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        ordering = ('-created_at',)
+        indexes = (
+            models.Index(
+                fields=('status', 'run_at'), name='job_status_run_at'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.task} ({self.get_status_display()})'
@@ -0,0 +1,20 @@
+"""
+Функции, выполняемые в пуле run_worker.
+
+Модуль не импортирует модели на верхнем уровне: процессы пула
+запускаются заново и загружают Django в setup().
+"""
+import django
+
+
+def setup():
+    """Инициализирует Django в процессе пула."""
+    django.setup()
+
+
+def execute(pk):
+    """Выполняет задачу pk, уже помеченную выполняющейся."""
+    from .models import Job
+    from .queue import execute
+
+    return execute(Job.objects.get(pk=pk))
@@ -0,0 +1,192 @@
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE = 10
+BACKOFF_MAX = 60 * 60
+# Задача, выполняющаяся дольше, считается прерванной вместе с обработчиком.
+JOB_TIMEOUT = timedelta(minutes=30)
+STATS_SAMPLE = 1000
+
+
+def task_path(func):
+    """Путь импорта функции; задачей может быть только функция модуля."""
+    if func.__qualname__ != func.__name__:
+        raise ValueError(
+            f'{func.__qualname__}: задачей может быть только функция модуля.'
+        )
+    return f'{func.__module__}.{func.__name__}'
+
+
+def enqueue(func, *args, max_attempts=None, **kwargs):
+    """
+    Ставит вызов func(*args, **kwargs) в очередь.
+
+    Задача записывается в текущей транзакции и становится видна
+    обработчику только после её фиксации. Аргументы должны
+    сериализоваться в JSON. При JOBS_EAGER задача выполняется сразу
+    после фиксации транзакции в текущем процессе.
+    """
+    job = Job.objects.create(
+        task=task_path(func),
+        args=list(args),
+        kwargs=kwargs,
+        **({'max_attempts': max_attempts} if max_attempts else {})
+    )
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: run_job(claim_job(job.pk)))
+    return job
+
+
+def backoff(attempts):
+    """Задержка перед повторной попыткой, растёт вдвое с каждой попыткой."""
+    return timedelta(
+        seconds=min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    )
+
+
+def start(jobs, now):
+    """Помечает задачи выполняющимися."""
+    Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+        status=Job.RUNNING, started_at=now, attempts=F('attempts') + 1
+    )
+    for job in jobs:
+        job.status, job.started_at = Job.RUNNING, now
+        job.attempts += 1
+    return jobs
+
+
+def claim_job(pk):
+    """Забирает конкретную задачу на выполнение."""
+    return start([Job.objects.get(pk=pk)], timezone.now())[0]
+
+
+def claim(limit):
+    """
+    Забирает на выполнение до limit готовых задач.
+
+    Строки блокируются с SKIP LOCKED, поэтому несколько обработчиков
+    не получат одну задачу. Задачи, зависшие в статусе «выполняется»
+    дольше JOB_TIMEOUT, возвращаются в очередь.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        stale = Job.objects.filter(
+            status=Job.RUNNING, started_at__lt=now - JOB_TIMEOUT
+        )
+        stale.filter(attempts__lt=F('max_attempts')).update(
+            status=Job.PENDING, last_error='Превышено время выполнения'
+        )
+        stale.update(
+            status=Job.FAILED, finished_at=now,
+            last_error='Превышено время выполнения'
+        )
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True).filter(
+                status=Job.PENDING, run_at__lte=now
+            ).order_by('run_at', 'id')[:limit]
+        )
+        return start(jobs, now)
+
+
+def run_job(job):
+    """
+    Выполняет задачу и записывает результат.
+
+    При ошибке задача возвращается в очередь с экспоненциальной
+    задержкой, после max_attempts попыток получает статус «ошибка».
+    Возвращает (успех, задержка запуска, длительность) в секундах.
+    """
+    started = time.monotonic()
+    try:
+        import_string(job.task)(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception('Ошибка задачи %s (%s)', job.pk, job.task)
+        now = timezone.now()
+        fields = {'last_error': traceback.format_exc()}
+        if job.attempts < job.max_attempts:
+            fields.update(status=Job.PENDING, run_at=now + backoff(
+                job.attempts
+            ))
+        else:
+            fields.update(status=Job.FAILED, finished_at=now)
+        Job.objects.filter(pk=job.pk).update(**fields)
+        succeeded = False
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.DONE, finished_at=timezone.now(), last_error=''
+        )
+        succeeded = True
+    latency = (job.started_at - job.run_at).total_seconds()
+    return succeeded, max(latency, 0), time.monotonic() - started
+
+
+def execute(job):
+    """Выполняет задачу в потоке или процессе пула обработчика."""
+    try:
+        return run_job(job)
+    finally:
+        close_old_connections()
+
+
+def purge(older_than):
+    """Удаляет выполненные задачи, завершённые раньше older_than."""
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE, finished_at__lt=older_than
+    ).delete()
+    return deleted
+
+
+def queue_stats():
+    """
+    Глубина очереди и задержки по последним STATS_SAMPLE задачам.
+
+    latency — среднее время от планового запуска до начала выполнения,
+    duration — средняя длительность выполнения, в секундах.
+    """
+    now = timezone.now()
+    counts = dict.fromkeys(dict(Job.STATUSES), 0)
+    counts.update(
+        Job.objects.order_by().values_list('status').annotate(
+            total=Count('pk')
+        )
+    )
+    oldest = Job.objects.filter(
+        status=Job.PENDING, run_at__lte=now
+    ).order_by('run_at').values_list('run_at', flat=True).first()
+    finished = list(
+        Job.objects.filter(status=Job.DONE).order_by(
+            '-finished_at'
+        ).values_list('run_at', 'started_at', 'finished_at')[:STATS_SAMPLE]
+    )
+    return {
+        'counts': counts,
+        'ready': Job.objects.filter(
+            status=Job.PENDING, run_at__lte=now
+        ).count(),
+        'oldest_wait': (now - oldest).total_seconds() if oldest else 0,
+        'latency': average(
+            (started - run_at).total_seconds()
+            for run_at, started, _ in finished
+        ),
+        'duration': average(
+            (finished_at - started).total_seconds()
+            for _, started, finished_at in finished
+        ),
+    }
+
+
+def average(values):
+    values = list(values)
+    return sum(values) / len(values) if values else 0
@@ -1,4 +1,7 @@
+from collections import Counter, defaultdict
+
 from django.contrib import admin
+from django.db import transaction
 from django.utils.html import format_html
 
 from .models import (
@@ -9,6 +12,7 @@ from .models import (
     ShoppingCart,
     Tag
 )
+from .shopping_list import apply_recipe_deltas, track_recipe_ingredients
 
 
 @admin.register(Tag)
@@ -33,7 +37,7 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = ('name', 'author', 'favorite_count', 'image_tag')
     search_fields = ('author', 'name')
     list_filter = ('tags',)
-    readonly_fields = ('favorite_count',)
+    readonly_fields = ('favorite_count', 'shopping_cart_count')
     inlines = [IngredientInline]
 
     def image_tag(self, obj):
@@ -45,13 +49,41 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @admin.display(description='Избранное')
     def favorite_count(self, recipe):
-        return recipe.favorites.count()
+        return recipe.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        with track_recipe_ingredients(form.instance.pk):
+            super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).touch()
 
 
 @admin.register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
 
+    def save_model(self, request, obj, form, change):
+        with track_recipe_ingredients(obj.recipe_id):
+            super().save_model(request, obj, form, change)
+        Recipe.objects.filter(pk=obj.recipe_id).touch()
+
+    def delete_model(self, request, obj):
+        with track_recipe_ingredients(obj.recipe_id):
+            super().delete_model(request, obj)
+        Recipe.objects.filter(pk=obj.recipe_id).touch()
+
+    def delete_queryset(self, request, queryset):
+        """Массовое удаление с вычитанием продуктов из списков покупок."""
+        deltas = defaultdict(Counter)
+        with transaction.atomic():
+            for recipe_id, ingredient_id, amount in queryset.values_list(
+                'recipe_id', 'ingredient_id', 'amount'
+            ):
+                deltas[recipe_id][ingredient_id] -= amount
+            super().delete_queryset(request, queryset)
+            for recipe_id, recipe_deltas in deltas.items():
+                apply_recipe_deltas(recipe_id, recipe_deltas)
+        Recipe.objects.filter(pk__in=deltas).touch()
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
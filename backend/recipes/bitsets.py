@@ -0,0 +1,59 @@
+"""
+Битовые множества на int Python.
+
+Множество номеров позиций хранится одним числом: операции над ним
+выполняются сразу над машинными словами. Счётчики для всех позиций
+хранятся срезами разрядов: бит позиции в slices[i] — i-й разряд её
+счётчика.
+"""
+
+
+def bitset(positions):
+    """Битовое множество из номеров позиций."""
+    if not positions:
+        return 0
+    bits = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+def iter_positions(bits):
+    """Номера установленных битов по убыванию."""
+    while bits:
+        position = bits.bit_length() - 1
+        yield position
+        bits ^= 1 << position
+
+
+def bit_slices(columns):
+    """
+    Срезы разрядов числа множеств columns, содержащих каждую позицию.
+
+    Множества складываются побитовым сумматором, поэтому позиции
+    не перебираются.
+    """
+    slices = []
+    for carry in columns:
+        for index, bit_slice in enumerate(slices):
+            slices[index], carry = bit_slice ^ carry, bit_slice & carry
+            if not carry:
+                break
+        if carry:
+            slices.append(carry)
+    return slices
+
+
+def select_count(bits, slices, count):
+    """Позиции из bits, счётчик которых в slices равен count."""
+    if count >> len(slices):
+        return 0
+    for index, bit_slice in enumerate(slices):
+        bits &= bit_slice if count >> index & 1 else ~bit_slice
+        if not bits:
+            break
+    return bits
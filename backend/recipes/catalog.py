@@ -0,0 +1,36 @@
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+
+CATALOG_REVISION_KEY = 'catalog_revision:{}'
+
+CatalogRevision = namedtuple('CatalogRevision', ('version', 'modified'))
+
+
+def new_revision():
+    modified = time.time()
+    return CatalogRevision(f'{time.time_ns():x}', modified)
+
+
+def get_catalog_revision(catalog):
+    """
+    Возвращает текущую ревизию справочника.
+
+    Ревизия хранится в общем кэше Django, поэтому её изменение
+    из команды управления видят все процессы приложения.
+    """
+    key = CATALOG_REVISION_KEY.format(catalog)
+    revision = cache.get(key)
+    if revision is None:
+        cache.add(key, tuple(new_revision()), timeout=None)
+        revision = cache.get(key)
+    return CatalogRevision(*revision)
+
+
+def bump_catalog_revision(catalog):
+    """Присваивает справочнику новую ревизию."""
+    revision = new_revision()
+    cache.set(CATALOG_REVISION_KEY.format(catalog), tuple(revision),
+              timeout=None)
+    return revision
@@ -0,0 +1,257 @@
+import csv
+import json
+import re
+import time
+from collections import defaultdict, namedtuple
+from functools import partial
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from .signals import catalog_changed
+
+BATCH_SIZE = 500
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+CatalogDiff = namedtuple(
+    'CatalogDiff', ('created', 'updated', 'unchanged', 'stale')
+)
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """
+    Читает массив JSON по одному элементу, не загружая файл целиком.
+
+    В памяти находится только текущий фрагмент файла и
+    недочитанный элемент.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, started = '', 0, False
+    for chunk in iter(partial(file.read, chunk_size), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            if not started:
+                position = WHITESPACE.match(buffer, position).end()
+                if position == len(buffer):
+                    break
+                if buffer[position] != '[':
+                    raise ValueError('Ожидается массив JSON.')
+                started = True
+                position += 1
+            position = JSON_SEPARATORS.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item
+    raise ValueError('Неожиданный конец файла JSON.')
+
+
+def read_rows(path, fields):
+    """
+    Построчно читает записи справочника из CSV, JSON или NDJSON.
+
+    В CSV колонки идут в порядке fields, строка заголовка
+    с названиями полей пропускается.
+    """
+    path = Path(path)
+    with open(path, encoding='utf-8', newline='') as file:
+        suffix = path.suffix.lower()
+        if suffix == '.csv':
+            for number, row in enumerate(csv.reader(file), 1):
+                if number == 1 and tuple(row) == fields:
+                    continue
+                if row:
+                    yield number, dict(zip(fields, row))
+        elif suffix in ('.ndjson', '.jsonl'):
+            for number, line in enumerate(file, 1):
+                if line.strip():
+                    yield number, json.loads(line)
+        elif suffix == '.json':
+            yield from enumerate(iter_json_array(file), 1)
+        else:
+            raise ValueError(f'Неподдерживаемый формат файла: {path.name}')
+
+
+def diff_catalog(model, key_field, fields, rows):
+    """
+    Сравнивает записи файла с содержимым справочника.
+
+    Запись, полностью совпадающая с существующей, не меняется.
+    Для новой записи обновляется строка с тем же key_field, если она
+    есть, чтобы ссылки на неё из рецептов сохранились, иначе строка
+    создаётся. Строки, которых нет в файле, считаются устаревшими.
+    """
+    existing = defaultdict(dict)
+    for pk, *values in model.objects.order_by('pk').values_list(
+        'pk', *fields
+    ).iterator():
+        values = tuple(values)
+        existing[values[fields.index(key_field)]][values] = pk
+    unchanged, pending, seen = [], [], set()
+    for number, row in rows:
+        if not isinstance(row, dict):
+            raise ValueError(f'Запись {number}: ожидается объект.')
+        values = tuple(str(row.get(field) or '').strip() for field in fields)
+        for field, value in zip(fields, values):
+            max_length = model._meta.get_field(field).max_length
+            if not value or len(value) > max_length:
+                raise ValueError(
+                    f'Запись {number}: поле {field} должно содержать '
+                    f'от 1 до {max_length} символов.'
+                )
+        if values in seen:
+            continue
+        seen.add(values)
+        pk = existing[values[fields.index(key_field)]].pop(values, None)
+        if pk is None:
+            pending.append(values)
+        else:
+            unchanged.append(pk)
+    created, updated = [], []
+    for values in pending:
+        candidates = existing[values[fields.index(key_field)]]
+        if candidates:
+            _, pk = candidates.popitem()
+            updated.append(model(pk=pk, **dict(zip(fields, values))))
+        else:
+            created.append(model(**dict(zip(fields, values))))
+    stale = [pk for items in existing.values() for pk in items.values()]
+    return CatalogDiff(created, updated, unchanged, stale)
+
+
+def find_conflicts(model, fields, diff, deleted):
+    """
+    Строки, которые после записи diff нарушат уникальность поля.
+
+    Возвращает {(поле, значение): строки}; учитываются записи файла
+    и оставшиеся в справочнике строки.
+    """
+    written = [*diff.updated, *diff.created]
+    replaced = {row.pk for row in diff.updated} | set(deleted)
+    conflicts = {}
+    for field in fields:
+        if not model._meta.get_field(field).unique:
+            continue
+        owners = defaultdict(list)
+        for row in written:
+            owners[getattr(row, field)].append(row)
+        for row in model.objects.exclude(pk__in=replaced).filter(
+            **{f'{field}__in': list(owners)}
+        ):
+            owners[getattr(row, field)].append(row)
+        for value, rows in owners.items():
+            if len(rows) > 1:
+                conflicts[field, value] = rows
+    return conflicts
+
+
+class CatalogSyncCommand(BaseCommand):
+    """
+    Синхронизация справочника с файлом CSV, JSON или NDJSON.
+
+    Повторный запуск с тем же файлом ничего не меняет.
+    """
+
+    model = None
+    fields = ()
+    key_field = None
+    # Связь, по которой строка справочника используется в рецептах.
+    used_by = None
+    default_path = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=self.default_path,
+            help='Файл CSV, JSON или NDJSON '
+                 f'(по умолчанию {self.default_path})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать изменения, не записывая их'
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            help='Удалить отсутствующие в файле записи, не используемые '
+                 'в рецептах'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Размер пачки при записи в базу'
+        )
+
+    def describe(self, row):
+        state = 'новая запись' if row.pk is None else f'id {row.pk}'
+        values = ', '.join(
+            f'{field}={getattr(row, field)}' for field in self.fields
+        )
+        return f'{values} ({state})'
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        verbose_name = self.model._meta.verbose_name_plural
+        with transaction.atomic():
+            try:
+                diff = diff_catalog(
+                    self.model, self.key_field, self.fields,
+                    read_rows(options['path'], self.fields)
+                )
+            except (OSError, ValueError) as error:
+                raise CommandError(error)
+            stale = self.model.objects.filter(pk__in=diff.stale)
+            if options['delete']:
+                deleted = stale.filter(**{f'{self.used_by}__isnull': True})
+            else:
+                deleted = self.model.objects.none()
+            deleted = list(deleted.values_list('pk', flat=True))
+            conflicts = find_conflicts(
+                self.model, self.fields, diff, deleted
+            )
+            if conflicts:
+                raise CommandError('\n'.join(
+                    f'Значение «{value}» поля {field} повторяется: '
+                    + '; '.join(self.describe(row) for row in rows)
+                    for (field, value), rows in conflicts.items()
+                ))
+            if not options['dry_run']:
+                self.model.objects.filter(pk__in=deleted).delete()
+                try:
+                    self.model.objects.bulk_update(
+                        diff.updated, self.fields,
+                        batch_size=options['batch_size']
+                    )
+                    self.model.objects.bulk_create(
+                        diff.created, batch_size=options['batch_size']
+                    )
+                except IntegrityError as error:
+                    raise CommandError(
+                        f'Записи нарушают ограничения справочника: {error}'
+                    )
+        if not options['dry_run'] and (
+            diff.created or diff.updated or deleted
+        ):
+            catalog_changed.send(sender=self.model)
+        prefix = 'Проверка без изменений. ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}{verbose_name}: '
+            f'добавлено {len(diff.created)}, '
+            f'обновлено {len(diff.updated)}, '
+            f'без изменений {len(diff.unchanged)}, '
+            f'удалено {len(deleted)}, '
+            f'оставлено устаревших {len(diff.stale) - len(deleted)} '
+            f'за {time.monotonic() - start:.2f} c'
+        ))
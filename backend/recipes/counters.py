@@ -0,0 +1,42 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def increment(queryset, field, delta):
+    """
+    Атомарно изменяет счётчик field на delta одним UPDATE.
+
+    Счётчик не опускается ниже нуля: расхождения исправляет
+    команда reconcile_counters.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def count_subquery(model, field):
+    """Подзапрос с числом строк model, ссылающихся на объект через field."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def reconcile(queryset, field, model, related_field):
+    """
+    Пересчитывает счётчик field по фактическому числу строк model.
+
+    Возвращает число исправленных объектов.
+    """
+    actual = count_subquery(model, related_field)
+    drifted = queryset.annotate(actual=actual).exclude(**{field: F('actual')})
+    fixed = drifted.count()
+    if fixed:
+        queryset.update(**{field: actual})
+    return fixed
@@ -0,0 +1,121 @@
+"""
+Ленты рецептов авторов, на которых подписан пользователь.
+
+Новые рецепты рассылаются в ленты подписчиков (таблица TimelineEntry)
+фоновой задачей fan_out. Рецепты авторов, у которых подписчиков больше
+FEED_FANOUT_LIMIT, не рассылаются: лента получает их при чтении
+запросом к рецептам с in_timelines=False. Тот же запрос показывает
+рецепты, задача рассылки которых ещё не выполнена.
+"""
+import heapq
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from users.models import Subscriptions
+from .models import Recipe, TimelineEntry
+
+FAN_OUT_BATCH_SIZE = 1000
+
+
+def fan_out(recipe_ids, limit=None):
+    """
+    Добавляет рецепты в ленты подписчиков их авторов.
+
+    Подписчики читаются пачками по первичному ключу; записи и отметка
+    in_timelines сохраняются в одной транзакции для каждого рецепта.
+    """
+    limit = settings.FEED_FANOUT_LIMIT if limit is None else limit
+    recipes = Recipe.objects.filter(
+        pk__in=recipe_ids,
+        in_timelines=False,
+        author__followers_count__lte=limit
+    ).values_list('pk', 'author_id', 'pub_date')
+    for recipe_id, author_id, pub_date in recipes:
+        with transaction.atomic():
+            last_pk = 0
+            while True:
+                followers = list(Subscriptions.objects.filter(
+                    author_id=author_id, pk__gt=last_pk
+                ).order_by('pk').values_list('pk', 'user_id')[
+                    :FAN_OUT_BATCH_SIZE
+                ])
+                if not followers:
+                    break
+                last_pk = followers[-1][0]
+                TimelineEntry.objects.bulk_create(
+                    (
+                        TimelineEntry(
+                            user_id=user_id,
+                            recipe_id=recipe_id,
+                            author_id=author_id,
+                            pub_date=pub_date,
+                        )
+                        for _, user_id in followers
+                    ),
+                    ignore_conflicts=True
+                )
+            Recipe.objects.filter(pk=recipe_id).update(in_timelines=True)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние рецепты автора."""
+    if not Subscriptions.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).exists():
+        return
+    recipes = Recipe.objects.filter(
+        author_id=author_id, in_timelines=True
+    ).order_by('-pub_date', '-id').values_list('pk', 'pub_date')[
+        :settings.FEED_BACKFILL_SIZE
+    ]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for recipe_id, pub_date in recipes
+        ),
+        ignore_conflicts=True
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты рецепты автора, от которого пользователь отписался."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def read_feed(user, limit, after=None):
+    """
+    Ключи (pub_date, id) не более limit рецептов ленты по убыванию даты.
+
+    after — ключ последнего рецепта предыдущей страницы. Записи ленты
+    и рецепты, не разосланные по лентам, читаются по индексам
+    с пагинацией по ключу и сливаются.
+    """
+    entries = TimelineEntry.objects.filter(user=user)
+    fan_in = Recipe.objects.filter(
+        in_timelines=False,
+        author__in=Subscriptions.objects.filter(user=user).values('author')
+    )
+    if after is not None:
+        pub_date, pk = after
+        entries = entries.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, recipe_id__lt=pk)
+        )
+        fan_in = fan_in.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+        )
+    return list(heapq.merge(
+        entries.order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id'
+        )[:limit],
+        fan_in.order_by('-pub_date', '-id').values_list('pub_date', 'id')[
+            :limit
+        ],
+        reverse=True
+    ))[:limit]
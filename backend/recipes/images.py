@@ -0,0 +1,155 @@
+import logging
+import posixpath
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+from jobs.queue import enqueue
+
+logger = logging.getLogger(__name__)
+
+MAX_IMAGE_SIZE = (1600, 1600)
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+# Форматы, в которых оригинал сохраняется после нормализации;
+# остальные приводятся к PNG.
+KEPT_FORMATS = ('JPEG', 'PNG', 'WEBP')
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+# Поле изображения, поле со ссылками на варианты и размер миниатюры.
+IMAGE_FIELDS = {
+    'recipes.recipe': ('image', 'image_variants', (480, 360)),
+    'users.user': ('avatar', 'avatar_variants', (96, 96)),
+}
+
+# Отправляется с sender=<модель> и pk после сохранения вариантов.
+variants_ready = Signal()
+
+
+def save_image(image, image_format):
+    """Сохраняет изображение без метаданных и возвращает байты."""
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = image.convert('RGBA')
+    image.info = {}
+    buffer = BytesIO()
+    options = {
+        'JPEG': {'quality': JPEG_QUALITY, 'optimize': True},
+        'PNG': {'optimize': True},
+        'WEBP': {'quality': WEBP_QUALITY, 'method': 4},
+    }[image_format]
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def normalize_image(file):
+    """
+    Поворачивает изображение по EXIF, удаляет метаданные и уменьшает
+    его до MAX_IMAGE_SIZE.
+
+    Возвращает ContentFile с расширением, соответствующим формату.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        image_format = (
+            image.format if image.format in KEPT_FORMATS else 'PNG'
+        )
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(MAX_IMAGE_SIZE, Image.LANCZOS)
+        content = save_image(image, image_format)
+    stem = posixpath.splitext(posixpath.basename(file.name or 'image'))[0]
+    return ContentFile(content, name=f'{stem}.{EXTENSIONS[image_format]}')
+
+
+def render_variants(image, thumbnail_size):
+    """Возвращает {вариант: (байты, формат)} для изображения."""
+    image_format = image.format if image.format in KEPT_FORMATS else 'PNG'
+    image = ImageOps.exif_transpose(image)
+    thumbnail = ImageOps.fit(image, thumbnail_size, Image.LANCZOS)
+    return {
+        'thumbnail': (save_image(thumbnail, image_format), image_format),
+        'thumbnail_webp': (save_image(thumbnail, 'WEBP'), 'WEBP'),
+        'webp': (save_image(image, 'WEBP'), 'WEBP'),
+    }
+
+
+def build_variants(label, pk, force=False):
+    """
+    Создаёт миниатюру и варианты WebP для изображения объекта.
+
+    Варианты сохраняются в каталог variants/ внутри каталога загрузки,
+    ссылки на них записываются в поле вариантов, только если
+    изображение не сменилось за время обработки. Варианты прежнего
+    изображения удаляются, если хранилище не объединяет одинаковые
+    файлы. Возвращает True, если варианты обновлены.
+    """
+    model = apps.get_model(label)
+    field, variants_field, thumbnail_size = IMAGE_FIELDS[label]
+    row = model.objects.filter(pk=pk).values(field, variants_field).first()
+    if row is None:
+        return False
+    source, old_variants = row[field] or '', row[variants_field] or {}
+    if old_variants.get('source', '') == source and not force:
+        return False
+    storage = model._meta.get_field(field).storage
+    variants = {'source': source}
+    if source:
+        try:
+            with storage.open(source) as file, Image.open(file) as image:
+                rendered = render_variants(image, thumbnail_size)
+        except (OSError, ValueError) as error:
+            logger.warning('Не удалось обработать %s: %s', source, error)
+            return False
+        directory = posixpath.join(
+            model._meta.get_field(field).upload_to, 'variants'
+        )
+        stem = posixpath.splitext(posixpath.basename(source))[0]
+        for variant, (content, image_format) in rendered.items():
+            variants[variant] = storage.save(
+                posixpath.join(
+                    directory, f'{stem}_{variant}.{EXTENSIONS[image_format]}'
+                ),
+                ContentFile(content)
+            )
+    updated = model.objects.filter(pk=pk, **{field: source}).update(
+        **{variants_field: variants}
+    )
+    if not getattr(storage, 'deduplicates', False):
+        stale = old_variants if updated else variants
+        for variant, name in stale.items():
+            if variant != 'source' and name:
+                storage.delete(name)
+    if updated:
+        variants_ready.send(sender=model, pk=pk)
+    return bool(updated)
+
+
+def schedule_variants(instance):
+    """
+    Ставит создание вариантов изображения объекта в фоновую очередь.
+
+    Задача видна обработчику только после фиксации транзакции
+    и не задерживает ответ.
+    """
+    label = instance._meta.label_lower
+    field, variants_field, _ = IMAGE_FIELDS[label]
+    source = getattr(instance, field).name or ''
+    variants = getattr(instance, variants_field) or {}
+    if variants.get('source', '') != source:
+        enqueue(build_variants, label, instance.pk)
+
+
+def variant_urls(variants, request=None):
+    """Возвращает абсолютные URL вариантов изображения."""
+    urls = {}
+    for variant, name in (variants or {}).items():
+        if variant == 'source':
+            continue
+        url = default_storage.url(name)
+        urls[variant] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,130 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.counters import count_subquery
+from recipes.feed import fan_out, read_feed
+from recipes.models import Recipe, TimelineEntry
+from users.models import Subscriptions
+
+User = get_user_model()
+
+USERNAME_PREFIX = 'feed_benchmark_'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение лент с рассылкой при записи и со сборкой при чтении '
+        'на сгенерированном графе подписок. Данные создаются в транзакции, '
+        'которая откатывается'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument(
+            '--follows', type=int, default=30,
+            help='Подписок у каждого пользователя'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=20,
+            help='Рецептов у каждого автора'
+        )
+        parser.add_argument(
+            '--reads', type=int, default=200,
+            help='Количество читаемых лент'
+        )
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if not 0 < options['follows'] <= options['authors'] <= (
+            options['users']
+        ):
+            raise CommandError(
+                'Нужно 0 < --follows <= --authors <= --users.'
+            )
+        self.rng = random.Random(options['seed'])
+        with transaction.atomic():
+            users, recipe_ids = self.seed(options)
+            readers = self.rng.sample(users, min(options['reads'], len(users)))
+            fan_in = self.read(readers, options['limit'])
+            start = time.perf_counter()
+            fan_out(recipe_ids, limit=len(users))
+            write = time.perf_counter() - start
+            entries = TimelineEntry.objects.filter(user__in=users).count()
+            timeline = self.read(readers, options['limit'])
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f'Пользователей: {len(users)}, авторов: {options["authors"]}, '
+            f'подписок: {len(users) * options["follows"]}, '
+            f'рецептов: {len(recipe_ids)}'
+        )
+        self.stdout.write(
+            f'Сборка при чтении: {self.format(fan_in)}, запись: 0 строк'
+        )
+        self.stdout.write(
+            f'Рассылка при записи: {self.format(timeline)}, '
+            f'запись: {entries} строк за {write:.2f} c '
+            f'({write / len(recipe_ids) * 1000:.2f} мс на рецепт)'
+        )
+
+    def seed(self, options):
+        User.objects.bulk_create(
+            User(
+                username=f'{USERNAME_PREFIX}{number}',
+                email=f'{USERNAME_PREFIX}{number}@example.com',
+            )
+            for number in range(options['users'])
+        )
+        users = list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).values_list('pk', flat=True))
+        authors = users[:options['authors']]
+        Subscriptions.objects.bulk_create(
+            Subscriptions(user_id=user_id, author_id=author_id)
+            for user_id in users
+            for author_id in self.rng.sample(authors, options['follows'])
+            if author_id != user_id
+        )
+        User.objects.filter(pk__in=authors).update(
+            followers_count=count_subquery(Subscriptions, 'author')
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                author_id=author_id,
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=1,
+            )
+            for number in range(options['recipes'])
+            for author_id in authors
+        )
+        recipe_ids = list(Recipe.objects.filter(
+            author_id__in=authors
+        ).values_list('pk', flat=True))
+        return users, recipe_ids
+
+    @staticmethod
+    def read(readers, limit):
+        """Время чтения первых двух страниц лент, мс."""
+        timings = []
+        for user_id in readers:
+            start = time.perf_counter()
+            page = read_feed(user_id, limit)
+            if page:
+                read_feed(user_id, limit, after=page[-1])
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    @staticmethod
+    def format(timings):
+        timings = sorted(timings)
+        return (
+            f'чтение p50 {statistics.median(timings):.2f} мс, '
+            f'p95 {timings[int((len(timings) - 1) * 0.95)]:.2f} мс'
+        )
@@ -0,0 +1,40 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from recipes.images import IMAGE_FIELDS, build_variants
+
+
+class Command(BaseCommand):
+    help = (
+        'Создание миниатюр и вариантов WebP для уже загруженных '
+        'изображений рецептов и аватаров'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать варианты и для уже обработанных изображений'
+        )
+
+    def handle(self, *args, **options):
+        for label, (field, variants_field, _) in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            rows = model.objects.exclude(**{field: ''}).exclude(
+                **{f'{field}__isnull': True}
+            ).order_by('pk').values_list('pk', field, variants_field)
+            built = failed = 0
+            for pk, source, variants in list(rows):
+                if (variants or {}).get('source') == source and not (
+                    options['force']
+                ):
+                    continue
+                if build_variants(label, pk, force=options['force']):
+                    built += 1
+                else:
+                    failed += 1
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: обработано {built}, '
+                f'с ошибками {failed}'
+            )
+        self.stdout.write(self.style.SUCCESS('Варианты изображений созданы'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.feed import fan_out
+from recipes.models import Recipe
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассылка по лентам подписчиков рецептов, которые ещё не разосланы, '
+        'например созданных до появления лент'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество рецептов в одной пачке'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        last_pk = 0
+        while True:
+            batch = list(Recipe.objects.filter(
+                in_timelines=False, pk__gt=last_pk
+            ).order_by('pk').values_list('pk', flat=True)[
+                :options['batch_size']
+            ])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            fan_out(batch)
+        self.stdout.write(self.style.SUCCESS(
+            'Рецепты разосланы по лентам, читаются из рецептов авторов: '
+            f'{Recipe.objects.filter(in_timelines=False).count()}'
+        ))
@@ -1,20 +1,17 @@
-import json
-
 from django.conf import settings
-from django.core.management.base import BaseCommand
 
+from recipes.catalog_sync import CatalogSyncCommand
 from recipes.models import Ingredient
 
 
-class Command(BaseCommand):
-    help = 'Импорт продуктов из data/ingredients.json'
+class Command(CatalogSyncCommand):
+    help = (
+        'Синхронизация продуктов с файлом '
+        '(по умолчанию data/ingredients.json)'
+    )
 
-    def handle(self, *args, **kwargs):
-        file_path = settings.BASE_DIR / 'data' / 'ingredients.json'
-        with open(file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        Ingredient.objects.bulk_create((
-            Ingredient(**item) for item in data),
-            ignore_conflicts=True
-        )
-        self.stdout.write(self.style.SUCCESS('Успешно импортированы продукты'))
+    model = Ingredient
+    fields = ('name', 'measurement_unit')
+    key_field = 'name'
+    used_by = 'recipe_ingredients'
+    default_path = settings.BASE_DIR / 'data' / 'ingredients.json'
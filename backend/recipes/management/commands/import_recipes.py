@@ -0,0 +1,276 @@
+import json
+import time
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from jobs.queue import enqueue
+from recipes.counters import increment
+from recipes.feed import fan_out
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.signals import catalog_changed
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+STRING_FIELDS = ('name', 'text', 'image')
+# Диапазон IntegerField, одинаковый во всех поддерживаемых базах.
+INTEGER_MAX = 2 ** 31 - 1
+
+
+def rate(count, start):
+    """Количество объектов в секунду с момента start."""
+    return count / max(time.monotonic() - start, 1e-6)
+
+
+class InvalidRecipe(ValueError):
+    """Строка файла не описывает корректный рецепт."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт рецептов из файла NDJSON: один рецепт в строке '
+        'с полями author (username), name, text, cooking_time, image '
+        '(путь в MEDIA_ROOT), tags (слаги) и ingredients '
+        '(name, measurement_unit, amount). Рецепты, уже существующие '
+        'у автора, пропускаются, поэтому прерванный импорт можно '
+        'запустить повторно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу NDJSON')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество рецептов в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in
+            Ingredient.objects.order_by().values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator()
+        }
+        self.authors = {}
+        totals = Counter()
+        start = time.monotonic()
+        try:
+            file = open(options['path'], encoding='utf-8')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть файл: {error}')
+        try:
+            with file:
+                lines = enumerate(file, 1)
+                while True:
+                    chunk = list(islice(lines, batch_size))
+                    if not chunk:
+                        break
+                    totals.update(self.import_chunk(chunk))
+                    self.stdout.write(
+                        f'Строк: {chunk[-1][0]}, '
+                        f'импортировано: {totals["created"]}, '
+                        f'{rate(totals["created"], start):.0f} рецептов/с'
+                    )
+        finally:
+            # Пачки фиксируются по отдельности: поисковый индекс и кэши
+            # обновляются и после ошибки в одной из следующих пачек.
+            if totals['created']:
+                catalog_changed.send(sender=Recipe)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано рецептов: {totals["created"]} '
+            f'за {time.monotonic() - start:.1f} c '
+            f'({rate(totals["created"], start):.0f} рецептов/с), '
+            f'уже существовало: {totals["existing"]}, '
+            f'с ошибками: {totals["invalid"]}'
+        ))
+
+    def import_chunk(self, chunk):
+        """Импортирует пачку строк файла в одной транзакции."""
+        totals = Counter()
+        rows = []
+        for number, line in chunk:
+            if not line.strip():
+                continue
+            try:
+                rows.append((number, json.loads(line)))
+            except ValueError as error:
+                self.report_invalid(number, f'некорректный JSON: {error}')
+                totals['invalid'] += 1
+        self.load_authors(
+            row['author'] for _, row in rows
+            if isinstance(row, dict) and isinstance(row.get('author'), str)
+        )
+        recipes = {}
+        for number, row in rows:
+            try:
+                recipe = self.parse_recipe(row)
+            except InvalidRecipe as error:
+                self.report_invalid(number, error)
+                totals['invalid'] += 1
+                continue
+            recipes.setdefault(
+                (recipe['author_id'], recipe['name']), recipe
+            )
+        if not recipes:
+            return totals
+        with transaction.atomic():
+            existing = self.get_recipe_ids(recipes)
+            totals['existing'] += len(existing)
+            new = [
+                recipe for key, recipe in recipes.items()
+                if key not in existing
+            ]
+            if not new:
+                return totals
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author_id=recipe['author_id'],
+                    name=recipe['name'],
+                    text=recipe['text'],
+                    cooking_time=recipe['cooking_time'],
+                    image=recipe['image'],
+                )
+                for recipe in new
+            )
+            ids = self.get_recipe_ids(recipes)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe_id=ids[recipe['author_id'], recipe['name']],
+                    ingredient_id=ingredient_id,
+                    amount=amount,
+                )
+                for recipe in new
+                for ingredient_id, amount in recipe['ingredients'].items()
+            )
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(
+                    recipe_id=ids[recipe['author_id'], recipe['name']],
+                    tag_id=tag_id,
+                )
+                for recipe in new
+                for tag_id in recipe['tags']
+            )
+            enqueue(fan_out, [
+                ids[recipe['author_id'], recipe['name']] for recipe in new
+            ])
+            authors = Counter(recipe['author_id'] for recipe in new)
+            for author_id, count in authors.items():
+                increment(
+                    User.objects.filter(pk=author_id), 'recipes_count', count
+                )
+        totals['created'] += len(new)
+        return totals
+
+    def load_authors(self, usernames):
+        """Дополняет словарь авторов недостающими пользователями."""
+        missing = set(usernames) - self.authors.keys()
+        if not missing:
+            return
+        self.authors.update(dict.fromkeys(missing))
+        self.authors.update(
+            User.objects.filter(username__in=missing).values_list(
+                'username', 'id'
+            )
+        )
+
+    @staticmethod
+    def get_recipe_ids(recipes):
+        """Возвращает id уже сохранённых рецептов по (автор, название)."""
+        return {
+            (author_id, name): pk
+            for pk, author_id, name in Recipe.objects.filter(
+                author_id__in={author_id for author_id, _ in recipes},
+                name__in={name for _, name in recipes},
+            ).values_list('id', 'author_id', 'name')
+            if (author_id, name) in recipes
+        }
+
+    def parse_recipe(self, row):
+        """Проверяет строку файла и заменяет ссылки на id."""
+        if not isinstance(row, dict):
+            raise InvalidRecipe('ожидается объект рецепта.')
+        author = row.get('author')
+        author_id = self.authors.get(author) if isinstance(
+            author, str
+        ) else None
+        if author_id is None:
+            raise InvalidRecipe(f'автор {author!r} не найден.')
+        for field in STRING_FIELDS:
+            value = row.get(field)
+            if not isinstance(value, str) or not value:
+                raise InvalidRecipe(f'поле {field} не может быть пустым.')
+            max_length = Recipe._meta.get_field(field).max_length
+            if len(value) > max_length:
+                raise InvalidRecipe(
+                    f'поле {field} длиннее {max_length} символов.'
+                )
+        cooking_time = self.parse_integer(
+            Recipe, 'cooking_time', row.get('cooking_time')
+        )
+        for field in ('tags', 'ingredients'):
+            if not isinstance(row.get(field), list) or not row[field]:
+                raise InvalidRecipe(f'поле {field} не может быть пустым.')
+        tags = set()
+        for slug in row['tags']:
+            if not isinstance(slug, str) or slug not in self.tags:
+                raise InvalidRecipe(f'тег {slug!r} не найден.')
+            tags.add(self.tags[slug])
+        ingredients = {}
+        for item in row['ingredients']:
+            try:
+                key = (item['name'], item['measurement_unit'])
+                amount = item['amount']
+                hash(key)
+            except (KeyError, TypeError):
+                raise InvalidRecipe(
+                    'у продукта должны быть name, measurement_unit и amount.'
+                )
+            ingredient_id = self.ingredients.get(key)
+            if ingredient_id is None:
+                raise InvalidRecipe(f'продукт {key} не найден.')
+            if ingredient_id in ingredients:
+                raise InvalidRecipe(f'продукт {key} указан дважды.')
+            ingredients[ingredient_id] = self.parse_integer(
+                RecipeIngredient, 'amount', amount,
+                f'количество продукта {key}'
+            )
+        return {
+            'author_id': author_id,
+            'name': row['name'],
+            'text': row['text'],
+            'cooking_time': cooking_time,
+            'image': row['image'],
+            'tags': tags,
+            'ingredients': ingredients,
+        }
+
+    @staticmethod
+    def parse_integer(model, field, value, label=None):
+        """Проверяет целое число валидаторами поля модели."""
+        label = label or field
+        # bool — подкласс int, но true в поле числа — ошибка в файле.
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise InvalidRecipe(f'{label} должно быть целым числом.')
+        if abs(value) > INTEGER_MAX:
+            raise InvalidRecipe(
+                f'{label} должно быть не больше {INTEGER_MAX}.'
+            )
+        try:
+            model._meta.get_field(field).run_validators(value)
+        except ValidationError as error:
+            raise InvalidRecipe(f'{label}: {" ".join(error.messages)}')
+        return value
+
+    def report_invalid(self, number, error):
+        self.stderr.write(f'Строка {number}: {error}')
@@ -1,20 +1,14 @@
-import json
-
 from django.conf import settings
-from django.core.management.base import BaseCommand
 
+from recipes.catalog_sync import CatalogSyncCommand
 from recipes.models import Tag
 
 
-class Command(BaseCommand):
-    help = 'Импорт тегов из data/tags.json'
+class Command(CatalogSyncCommand):
+    help = 'Синхронизация тегов с файлом (по умолчанию data/tags.json)'
 
-    def handle(self, *args, **kwargs):
-        file_path = settings.BASE_DIR / 'data' / 'tags.json'
-        with open(file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        Tag.objects.bulk_create((
-            Tag(**item) for item in data),
-            ignore_conflicts=True
-        )
-        self.stdout.write(self.style.SUCCESS('Успешно импортированы теги'))
+    model = Tag
+    fields = ('name', 'slug')
+    key_field = 'slug'
+    used_by = 'recipes'
+    default_path = settings.BASE_DIR / 'data' / 'tags.json'
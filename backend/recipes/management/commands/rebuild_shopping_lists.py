@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingCartIngredient
+from recipes.shopping_list import aggregate_shopping_lists
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверка или перестроение итоговых списков покупок '
+        'по рецептам в списках покупок пользователей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить таблицу, не изменяя её'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = aggregate_shopping_lists()
+            actual = {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount in
+                ShoppingCartIngredient.objects.select_for_update().values_list(
+                    'user_id', 'ingredient_id', 'amount'
+                ).iterator()
+            }
+            mismatched = {
+                key for key in expected.keys() | actual.keys()
+                if expected.get(key) != actual.get(key)
+            }
+            if not mismatched:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Списки покупок актуальны ({len(actual)} строк)'
+                ))
+                return
+            if options['check']:
+                raise CommandError(
+                    f'Расхождений в списках покупок: {len(mismatched)}'
+                )
+            ShoppingCartIngredient.objects.all().delete()
+            ShoppingCartIngredient.objects.bulk_create(
+                (
+                    ShoppingCartIngredient(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount
+                    )
+                    for (user_id, ingredient_id), amount in expected.items()
+                ),
+                batch_size=BATCH_SIZE
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено расхождений: {len(mismatched)}, '
+            f'строк в списках покупок: {len(expected)}'
+        ))
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import reconcile
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscriptions
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscriptions, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, покупок, рецептов и подписчиков'
+
+    def handle(self, *args, **kwargs):
+        for model, field, related_model, related_field in COUNTERS:
+            with transaction.atomic():
+                fixed = reconcile(
+                    model.objects.select_for_update(),
+                    field, related_model, related_field
+                )
+            self.stdout.write(
+                f'{model._meta.label}.{field}: исправлено {fixed}'
+            )
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
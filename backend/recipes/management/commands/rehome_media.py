@@ -0,0 +1,129 @@
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.images import IMAGE_FIELDS
+from recipes.models import Recipe
+from recipes.signals import catalog_changed
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Перенос загруженных изображений и их вариантов в хранилище '
+        'с именами по содержимому и обновление ссылок в базе пачками'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество записей в одной транзакции'
+        )
+        parser.add_argument(
+            '--delete-originals',
+            action='store_true',
+            help='Удалить перенесённые файлы со старыми именами'
+        )
+
+    def handle(self, *args, **options):
+        self.storage = default_storage
+        if not hasattr(self.storage, 'is_content_name'):
+            raise CommandError(
+                'Хранилище файлов не поддерживает имена по содержимому.'
+            )
+        moved_names = set()
+        total = 0
+        for label, (field, variants_field, _) in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            # bulk_update не обновляет поля auto_now, а по ним, например
+            # по Recipe.updated_at, строится ETag карточки рецепта.
+            auto_now_fields = [
+                model_field.name for model_field in model._meta.concrete_fields
+                if getattr(model_field, 'auto_now', False)
+            ]
+            moved = failed = 0
+            last_pk = 0
+            while True:
+                rows = list(
+                    model.objects.filter(pk__gt=last_pk).exclude(
+                        **{field: ''}
+                    ).exclude(**{f'{field}__isnull': True}).order_by(
+                        'pk'
+                    ).values_list('pk', field, variants_field)[
+                        :options['batch_size']
+                    ]
+                )
+                if not rows:
+                    break
+                last_pk = rows[-1][0]
+                updates = []
+                for pk, name, variants in rows:
+                    try:
+                        new_name, new_variants = self.rehome(
+                            name, variants or {}, moved_names
+                        )
+                    except OSError as error:
+                        self.stderr.write(
+                            f'{label} {pk}: не удалось перенести {name}: '
+                            f'{error}'
+                        )
+                        failed += 1
+                        continue
+                    if new_name != name or new_variants != variants:
+                        updates.append(model(**{
+                            'pk': pk,
+                            field: new_name,
+                            variants_field: new_variants,
+                            **dict.fromkeys(auto_now_fields, timezone.now()),
+                        }))
+                with transaction.atomic():
+                    model.objects.bulk_update(
+                        updates, (field, variants_field, *auto_now_fields)
+                    )
+                moved += len(updates)
+            total += moved
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: перенесено {moved}, '
+                f'с ошибками {failed}'
+            )
+        if total:
+            catalog_changed.send(sender=Recipe)
+        if options['delete_originals']:
+            for name in moved_names:
+                self.storage.delete(name)
+            self.stdout.write(f'Удалено старых файлов: {len(moved_names)}')
+        self.stdout.write(self.style.SUCCESS('Перенос завершён'))
+
+    def move(self, name, moved_names):
+        """Сохраняет файл под именем по содержимому."""
+        if not name or self.storage.is_content_name(name):
+            return name
+        with self.storage.open(name) as file:
+            new_name = self.storage.save(name, file)
+        moved_names.add(name)
+        return new_name
+
+    def rehome(self, name, variants, moved_names):
+        """
+        Переносит изображение и его варианты.
+
+        Если вариант перенести не удалось, варианты сбрасываются
+        и создаются заново командой build_image_variants.
+        """
+        new_name = self.move(name, moved_names)
+        if variants.get('source') != name:
+            return new_name, variants
+        try:
+            new_variants = {
+                variant: self.move(variant_name, moved_names)
+                for variant, variant_name in variants.items()
+                if variant != 'source'
+            }
+        except OSError:
+            return new_name, {}
+        return new_name, {**new_variants, 'source': new_name}
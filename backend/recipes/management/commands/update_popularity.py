@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.popularity import reset_scores, update_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновление рейтингов популярности рецептов по новым добавлениям '
+        'в избранное и списки покупок; запускается периодически'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Пересчитать рейтинги по счётчикам рецептов'
+        )
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            reset_scores()
+            self.stdout.write(self.style.SUCCESS('Рейтинги пересчитаны'))
+            return
+        processed = update_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано событий: {processed}'
+        ))
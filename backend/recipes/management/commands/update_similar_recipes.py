@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similar import update_similar
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновление похожих рецептов для рецептов, состав которых '
+        'изменился; запускается периодически'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать похожие рецепты для всех рецептов'
+        )
+
+    def handle(self, *args, **options):
+        updated = update_similar(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рецептов: {updated}'
+        ))
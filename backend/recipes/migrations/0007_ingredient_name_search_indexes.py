@@ -0,0 +1,41 @@
+from django.db import migrations
+
+POSTGRES_INDEXES = (
+    (
+        'recipes_ingredient_name_prefix_idx',
+        'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_prefix_idx '
+        'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)',
+    ),
+    (
+        'recipes_ingredient_name_trgm_idx',
+        'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm_idx '
+        'ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)',
+    ),
+)
+
+
+def create_indexes(apps, schema_editor):
+    """Индексы для istartswith/icontains по названию продукта."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for _, sql in POSTGRES_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_alter_tag_slug'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:28
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes', 'Recipe', 'favorites_count', 'recipes', 'Favorite', 'recipe'),
+    ('recipes', 'Recipe', 'shopping_cart_count',
+     'recipes', 'ShoppingCart', 'recipe'),
+    ('users', 'User', 'recipes_count', 'recipes', 'Recipe', 'author'),
+    ('users', 'User', 'followers_count',
+     'users', 'Subscriptions', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for (app_label, model_name, field,
+         related_app_label, related_model_name, related_field) in COUNTERS:
+        model = apps.get_model(app_label, model_name)
+        related_model = apps.get_model(related_app_label, related_model_name)
+        model.objects.update(**{field: Coalesce(
+            models.Subquery(
+                related_model.objects.filter(
+                    **{related_field: models.OuterRef('pk')}
+                ).order_by().values(related_field).annotate(
+                    total=models.Count('pk')
+                ).values('total')
+            ),
+            0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_shoppingcartingredient'),
+        ('users', '0007_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations
+
+POSTGRES_SQL = (
+    'ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector '
+    'tsvector',
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector() RETURNS trigger
+    AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger '
+    'ON recipes_recipe',
+    'CREATE TRIGGER recipes_recipe_search_vector_trigger '
+    'BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe '
+    'FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector()',
+    'UPDATE recipes_recipe SET name = name',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_idx '
+    'ON recipes_recipe USING gin (search_vector)',
+)
+POSTGRES_REVERSE_SQL = (
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger '
+    'ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector()',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+# Таблица FTS5 хранит копию name и text, а не ссылается на recipes_recipe:
+# при изменении схемы SQLite пересоздаёт таблицу и удаляет её триггеры,
+# поэтому индекс обновляется из сигналов (см. recipes.search).
+SQLITE_SQL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING '
+    "fts5(name, text, tokenize='unicode61 remove_diacritics 2')",
+    'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+    'SELECT id, name, text FROM recipes_recipe',
+)
+SQLITE_REVERSE_SQL = (
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_SQL, 'sqlite': SQLITE_SQL}),
+            run({
+                'postgresql': POSTGRES_REVERSE_SQL,
+                'sqlite': SQLITE_REVERSE_SQL,
+            }),
+        ),
+    ]
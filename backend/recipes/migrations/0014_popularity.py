@@ -0,0 +1,49 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'Событие рейтинга',
+                'verbose_name_plural': 'События рейтинга',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='popular_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Рейтинг популярности'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Рейтинг за последние дни'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-popular_score', '-pub_date', '-id'], name='recipe_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-pub_date', '-id'], name='recipe_trending_idx'),
+        ),
+        migrations.AddField(
+            model_name='popularityevent',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+    ]
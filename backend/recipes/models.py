@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import BooleanField, Exists, F, OuterRef, Value, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -54,6 +58,79 @@ class Ingredient(models.Model):
         return f'{self.name} {self.measurement_unit} '
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов рецептов с флагами текущего пользователя."""
+
+    def with_user_flags(self, user):
+        """Аннотирует флаги избранного и списка покупок одним запросом."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        )
+
+    def touch(self):
+        """
+        Отмечает рецепты изменёнными.
+
+        Нужен при изменении ингредиентов, тегов и вариантов изображения
+        без сохранения самого рецепта: дата изменения входит в ETag.
+        """
+        return self.update(updated_at=timezone.now())
+
+    def with_related(self, user, flags=True):
+        """
+        Рецепты для вывода: флаги пользователя, автор и ингредиенты.
+
+        Количество запросов не зависит от числа рецептов
+        и ингредиентов в них. flags=False — флаги не аннотируются,
+        сериализаторы берут их из кэша флагов пользователя.
+        """
+        recipes = self.with_user_flags(user) if flags else self
+        authors = User.objects.all()
+        if flags:
+            authors = authors.with_is_subscribed(user)
+        return recipes.prefetch_related(
+            models.Prefetch('author', queryset=authors),
+            models.Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            ),
+            'tags',
+        )
+
+    def limit_per_author(self, limit):
+        """
+        Оставляет не более limit последних рецептов каждого автора.
+
+        Рецепты нумеруются оконной функцией ROW_NUMBER в разрезе автора,
+        поэтому выборка для любого числа авторов выполняется одним запросом.
+        """
+        ranked = self.annotate(
+            author_rank=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )
+        ).order_by().values('pk', 'author_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.model.objects.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            'WHERE ranked.author_rank <= %s',
+            (*params, limit)
+        ))
+
+
 class Recipe(models.Model):
     """Модель рецепта."""
 
@@ -84,14 +161,55 @@ class Recipe(models.Model):
         verbose_name='Изображение',
         upload_to='recipes_images/'
     )
+    image_variants = models.JSONField(
+        verbose_name='Варианты изображения',
+        default=dict,
+        editable=False
+    )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
     cooking_time = models.IntegerField(
         verbose_name='Время приготовления',
         validators=(MinValueValidator(1),)
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False
+    )
+    in_timelines = models.BooleanField(
+        verbose_name='Разослан по лентам подписчиков',
+        default=False,
+        editable=False
+    )
+    popular_score = models.FloatField(
+        verbose_name='Рейтинг популярности',
+        default=0,
+        editable=False
+    )
+    trending_score = models.FloatField(
+        verbose_name='Рейтинг за последние дни',
+        default=0,
+        editable=False
+    )
+    ingredients_digest = models.BigIntegerField(
+        verbose_name='Отпечаток продуктов для похожих рецептов',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         default_related_name = 'recipes'
@@ -104,6 +222,21 @@ class Recipe(models.Model):
                 name='unique_recipe_author',
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                condition=models.Q(in_timelines=False),
+                name='recipe_fan_in_idx',
+            ),
+            models.Index(
+                fields=('-popular_score', '-pub_date', '-id'),
+                name='recipe_popular_idx',
+            ),
+            models.Index(
+                fields=('-trending_score', '-pub_date', '-id'),
+                name='recipe_trending_idx',
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -200,3 +333,157 @@ class ShoppingCart(models.Model):
             f'{self.user.username} добавил '
             f'в список покупок {self.recipe.name}'
         )
+
+
+class ShoppingCartIngredient(models.Model):
+    """
+    Итоговое количество продукта в списке покупок пользователя.
+
+    Таблица поддерживается инкрементально при изменении списка покупок
+    и ингредиентов рецептов (см. recipes.shopping_list), поэтому выгрузка
+    списка покупок не требует агрегации по рецептам.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Продукт',
+        on_delete=models.CASCADE
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        verbose_name = 'Продукт списка покупок'
+        verbose_name_plural = 'Продукты списков покупок'
+        default_related_name = 'shopping_cart_ingredients'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_cart_ingredient'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient.name} для {self.user.username}'
+
+
+class TimelineEntry(models.Model):
+    """Рецепт в ленте подписчика автора."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_entry',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class PopularityEvent(models.Model):
+    """
+    Добавление рецепта в избранное или список покупок.
+
+    События переносятся в рейтинги рецептов и удаляются командой
+    update_popularity (см. recipes.popularity).
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата',
+        default=timezone.now
+    )
+
+    class Meta:
+        verbose_name = 'Событие рейтинга'
+        verbose_name_plural = 'События рейтинга'
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.created}'
+
+
+class SimilarRecipe(models.Model):
+    """
+    Похожий рецепт по составу продуктов.
+
+    Таблицу заполняет команда update_similar_recipes
+    (см. recipes.similar).
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='similar_entries'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        verbose_name='Похожий рецепт',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField(verbose_name='Коэффициент Жаккара')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.similar_id} похож на {self.recipe_id}'
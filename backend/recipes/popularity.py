@@ -0,0 +1,119 @@
+"""
+Рейтинги популярности рецептов с затуханием во времени.
+
+Каждое добавление в избранное или список покупок записывается
+в PopularityEvent; команда update_popularity периодически переносит
+новые события в столбцы рецептов и удаляет их. Вклад события
+уменьшается вдвое за период полураспада, поэтому в столбце хранится
+log2 суммы 2 ** ((t - EPOCH) / период) по событиям: порядок по нему
+совпадает с порядком по текущей сумме с затуханием, а новые события
+добавляются без пересчёта старых. Рецепты без событий имеют рейтинг 0.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import PopularityEvent, Recipe
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+HALF_LIVES = {
+    'popular_score': timedelta(days=30),
+    'trending_score': timedelta(days=1),
+}
+BATCH_SIZE = 5000
+
+# Отправляется после изменения рейтингов.
+scores_updated = Signal()
+
+
+def log_add(first, second):
+    """log2(2 ** first + 2 ** second); 0 означает отсутствие событий."""
+    if not first:
+        return second
+    if not second:
+        return first
+    high, low = max(first, second), min(first, second)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def event_score(created, half_life):
+    return (created - EPOCH) / half_life
+
+
+def apply_events(limit=BATCH_SIZE):
+    """
+    Переносит в рейтинги не более limit событий и удаляет их.
+
+    Возвращает число обработанных событий.
+    """
+    with transaction.atomic():
+        events = list(PopularityEvent.objects.select_for_update(
+            skip_locked=True
+        ).order_by('pk').values_list('pk', 'recipe_id', 'created')[:limit])
+        if not events:
+            return 0
+        increments = defaultdict(dict)
+        for _, recipe_id, created in events:
+            scores = increments[recipe_id]
+            for field, half_life in HALF_LIVES.items():
+                scores[field] = log_add(
+                    scores.get(field, 0), event_score(created, half_life)
+                )
+        recipes = Recipe.objects.select_for_update().filter(
+            pk__in=increments
+        ).only('pk', *HALF_LIVES)
+        for recipe in recipes:
+            for field, score in increments[recipe.pk].items():
+                setattr(recipe, field, log_add(getattr(recipe, field), score))
+        Recipe.objects.bulk_update(recipes, HALF_LIVES)
+        PopularityEvent.objects.filter(
+            pk__in=[pk for pk, _, _ in events]
+        ).delete()
+    return len(events)
+
+
+def update_scores():
+    """Обрабатывает все накопившиеся события; возвращает их число."""
+    total = 0
+    while True:
+        processed = apply_events()
+        if not processed:
+            break
+        total += processed
+    if total:
+        scores_updated.send(sender=Recipe)
+    return total
+
+
+def reset_scores(now=None):
+    """
+    Пересчитывает рейтинги по счётчикам избранного и списков покупок.
+
+    Все учтённые в счётчиках добавления считаются сделанными сейчас,
+    необработанные события удаляются. Нужен при первом запуске
+    и после изменения периодов полураспада.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        PopularityEvent.objects.all().delete()
+        recipes = Recipe.objects.select_for_update().only(
+            'pk', 'favorites_count', 'shopping_cart_count', *HALF_LIVES
+        )
+        batch = []
+        for recipe in recipes.iterator():
+            count = recipe.favorites_count + recipe.shopping_cart_count
+            for field, half_life in HALF_LIVES.items():
+                setattr(recipe, field, (
+                    event_score(now, half_life) + math.log2(count)
+                    if count else 0
+                ))
+            batch.append(recipe)
+            if len(batch) == BATCH_SIZE:
+                Recipe.objects.bulk_update(batch, HALF_LIVES)
+                batch = []
+        Recipe.objects.bulk_update(batch, HALF_LIVES)
+    scores_updated.send(sender=Recipe)
@@ -0,0 +1,90 @@
+"""
+Полнотекстовый поиск рецептов по названию и описанию.
+
+На PostgreSQL поиск идёт по столбцу search_vector с GIN-индексом,
+который поддерживает триггер из миграции 0012. На SQLite используется
+таблица FTS5, она обновляется из сигналов рецептов. Название весит
+больше описания на обеих СУБД.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+# Веса bm25 для столбцов name и text таблицы FTS5.
+FTS_WEIGHTS = (10.0, 1.0)
+WORD = re.compile(r'\w+')
+
+
+def fts_query(value):
+    """
+    Строка запроса FTS5: все слова как префиксы.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 во вводе
+    пользователя не приводят к ошибкам синтаксиса.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD.findall(value))
+
+
+def search(recipes, value):
+    """Отбирает рецепты по запросу и аннотирует релевантность search_rank."""
+    if connection.vendor == 'postgresql':
+        query = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        return recipes.filter(RawSQL(
+            f'recipes_recipe.search_vector @@ {query}', (value,),
+            output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f'ts_rank(recipes_recipe.search_vector, {query})', (value,),
+            output_field=FloatField()
+        ))
+    query = fts_query(value)
+    if not query:
+        return recipes.none().annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+    return recipes.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (query,)
+    )).annotate(search_rank=RawSQL(
+        f'SELECT -bm25({FTS_TABLE}, %s, %s) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND rowid = recipes_recipe.id',
+        (*FTS_WEIGHTS, query), output_field=FloatField()
+    ))
+
+
+def uses_fts_table():
+    return connection.vendor == 'sqlite'
+
+
+def index_recipe(recipe):
+    """Обновляет строку рецепта в таблице FTS5."""
+    if not uses_fts_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE}(rowid, name, text) '
+            'VALUES (%s, %s, %s)',
+            (recipe.pk, recipe.name, recipe.text)
+        )
+
+
+def unindex_recipe(pk):
+    if not uses_fts_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (pk,))
+
+
+def rebuild_index():
+    """Заполняет таблицу FTS5 заново после массовых изменений."""
+    if not uses_fts_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+            'SELECT id, name, text FROM recipes_recipe'
+        )
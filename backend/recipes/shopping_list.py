@@ -0,0 +1,158 @@
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingCartIngredient
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def get_recipe_amounts(recipe_id):
+    """Возвращает словарь {id продукта: количество} для рецепта."""
+    return dict(
+        RecipeIngredient.objects.filter(recipe_id=recipe_id).values_list(
+            'ingredient_id', 'amount'
+        )
+    )
+
+
+def nonzero(deltas):
+    return {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+
+
+def changed_amount(deltas, ingredient_ids):
+    """Количество после изменения на deltas одним выражением UPDATE."""
+    return F('amount') + Case(
+        *(
+            When(ingredient_id=ingredient_id,
+                 then=Value(deltas[ingredient_id]))
+            for ingredient_id in ingredient_ids
+        ),
+        default=Value(0)
+    )
+
+
+def apply_deltas(user_id, deltas):
+    """
+    Изменяет итоговые количества продуктов в списке покупок пользователя.
+
+    Существующие строки обновляются одним UPDATE с F-выражением,
+    недостающие создаются bulk_create, обнулившиеся удаляются.
+    """
+    deltas = nonzero(deltas)
+    if not deltas:
+        return
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(pk=user_id).values_list(
+            'pk', flat=True
+        ))
+        items = ShoppingCartIngredient.objects.filter(
+            user_id=user_id, ingredient_id__in=deltas
+        )
+        existing = set(items.values_list('ingredient_id', flat=True))
+        if existing:
+            items.filter(ingredient_id__in=existing).update(
+                amount=changed_amount(deltas, existing)
+            )
+            items.filter(amount__lte=0).delete()
+        ShoppingCartIngredient.objects.bulk_create(
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=delta
+            )
+            for ingredient_id, delta in deltas.items()
+            if ingredient_id not in existing and delta > 0
+        )
+
+
+def add_recipe(user_id, recipe_id):
+    """Учитывает рецепт, добавленный в список покупок."""
+    apply_deltas(user_id, get_recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_id, recipe_id):
+    """Учитывает рецепт, удалённый из списка покупок."""
+    apply_deltas(user_id, {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_recipe_amounts(recipe_id).items()
+    })
+
+
+def apply_recipe_deltas(recipe_id, deltas):
+    """
+    Переносит изменение ингредиентов рецепта в списки покупок.
+
+    deltas применяются сразу ко всем пользователям, у которых рецепт
+    в списке покупок: одним UPDATE, одним DELETE и bulk_create, поэтому
+    число запросов не зависит от числа списков.
+    """
+    deltas = nonzero(deltas)
+    if not deltas:
+        return
+    carts = ShoppingCart.objects.filter(recipe_id=recipe_id).values('user_id')
+    # Вызывается внутри транзакции изменения рецепта, точка сохранения
+    # не нужна.
+    with transaction.atomic(savepoint=False):
+        # Пользователи блокируются одним запросом в порядке id, как
+        # в apply_deltas, чтобы строки списков не создавались дважды.
+        user_ids = list(User.objects.select_for_update().filter(
+            pk__in=carts
+        ).order_by('pk').values_list('pk', flat=True))
+        if not user_ids:
+            return
+        items = ShoppingCartIngredient.objects.filter(
+            user_id__in=carts, ingredient_id__in=deltas
+        )
+        existing = set(items.values_list('user_id', 'ingredient_id'))
+        if existing:
+            items.update(amount=changed_amount(deltas, deltas))
+            items.filter(amount__lte=0).delete()
+        ShoppingCartIngredient.objects.bulk_create(
+            (
+                ShoppingCartIngredient(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    amount=delta
+                )
+                for user_id in user_ids
+                for ingredient_id, delta in deltas.items()
+                if delta > 0 and (user_id, ingredient_id) not in existing
+            ),
+            batch_size=BATCH_SIZE
+        )
+
+
+@contextmanager
+def track_recipe_ingredients(recipe_id):
+    """
+    Переносит изменения ингредиентов рецепта в списки покупок.
+
+    Сравнивает ингредиенты рецепта до и после выполнения блока и
+    применяет разницу через apply_recipe_deltas. Блок выполняется
+    в той же транзакции.
+    """
+    with transaction.atomic():
+        before = get_recipe_amounts(recipe_id)
+        yield
+        deltas = Counter(get_recipe_amounts(recipe_id))
+        deltas.subtract(before)
+        apply_recipe_deltas(recipe_id, deltas)
+
+
+def aggregate_shopping_lists():
+    """Считает списки покупок по рецептам: {(user, продукт): количество}."""
+    return {
+        (item['recipe__shopping_cart__user'], item['ingredient']):
+            item['amount']
+        for item in RecipeIngredient.objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values(
+            'recipe__shopping_cart__user', 'ingredient'
+        ).annotate(amount=Sum('amount')).order_by().iterator()
+    }
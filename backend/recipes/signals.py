@@ -0,0 +1,144 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from jobs.queue import enqueue
+from users.models import Subscriptions
+from . import shopping_list
+from .catalog import bump_catalog_revision
+from .counters import increment
+from .feed import backfill, fan_out, prune
+from .images import schedule_variants, variants_ready
+from .models import (
+    Favorite,
+    Ingredient,
+    PopularityEvent,
+    Recipe,
+    ShoppingCart,
+    Tag
+)
+from .search import index_recipe, rebuild_index, unindex_recipe
+
+User = get_user_model()
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
+
+# Отправляется с sender=<модель справочника> после массовых изменений,
+# при которых post_save не вызывается (bulk_create, update).
+catalog_changed = Signal()
+
+
+@receiver(catalog_changed)
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def bump_revision(sender, **kwargs):
+    """Обновляет ревизию справочника после фиксации транзакции."""
+    name = sender._meta.label_lower
+    transaction.on_commit(lambda: bump_catalog_revision(name))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    """Добавляет продукты рецепта в итоговый список покупок."""
+    if created:
+        shopping_list.add_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    """
+    Вычитает продукты рецепта из итогового списка покупок.
+
+    Используется pre_delete: при каскадном удалении рецепта его
+    ингредиенты к моменту post_delete могут быть уже удалены.
+    """
+    shopping_list.remove_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        increment(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            RECIPE_COUNTERS[sender], 1
+        )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def record_popularity_event(instance, created, **kwargs):
+    if created:
+        PopularityEvent.objects.create(recipe_id=instance.recipe_id)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    increment(
+        Recipe.objects.filter(pk=instance.recipe_id),
+        RECIPE_COUNTERS[sender], -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created and instance.author_id:
+        increment(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    if instance.author_id:
+        increment(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(instance, **kwargs):
+    schedule_variants(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_fan_out(instance, created, **kwargs):
+    if created:
+        enqueue(fan_out, [instance.pk])
+
+
+@receiver(post_save, sender=Subscriptions)
+def schedule_backfill(instance, created, **kwargs):
+    if created:
+        enqueue(backfill, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscriptions)
+def prune_timeline(instance, **kwargs):
+    prune(instance.user_id, instance.author_id)
+
+
+@receiver(variants_ready, sender=Recipe)
+def touch_recipe(pk, **kwargs):
+    """Отмечает рецепт изменённым после создания вариантов изображения."""
+    Recipe.objects.filter(pk=pk).touch()
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_index(instance, **kwargs):
+    index_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search_index(instance, **kwargs):
+    unindex_recipe(instance.pk)
+
+
+@receiver(catalog_changed, sender=Recipe)
+def rebuild_search_index(**kwargs):
+    rebuild_index()
@@ -0,0 +1,208 @@
+"""
+Похожие рецепты по коэффициенту Жаккара множеств продуктов.
+
+Попарное сравнение рецептов квадратично, поэтому сходство с одним
+рецептом считается сразу для всех: для каждого продукта хранится
+битовое множество рецептов (столбец разреженной матрицы «рецепт —
+продукт»), число общих продуктов для всех рецептов складывается
+побитовым сумматором по столбцам продуктов рецепта. Рецепты
+группируются по числу общих продуктов и размеру, группы перебираются
+по убыванию коэффициента до набора SIMILAR_COUNT рецептов.
+Результат хранится в SimilarRecipe.
+
+Отпечаток состава хранится в Recipe.ingredients_digest. При обновлении
+пересчитываются рецепты с изменившимся составом, рецепты, в списках
+которых они были, и рецепты, в списки которых они могут войти.
+"""
+import hashlib
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Min
+
+from .bitsets import bit_slices, bitset, iter_positions, select_count
+from .catalog import bump_catalog_revision
+from .models import Recipe, RecipeIngredient, SimilarRecipe
+
+SIMILAR_COUNT = 10
+# Точность, с которой учитывается худший коэффициент в списке рецепта
+# при поиске рецептов, в списки которых может войти изменённый.
+THRESHOLD_LEVELS = 20
+WRITE_BATCH_SIZE = 1000
+
+
+def digest(ingredients):
+    """Отпечаток множества продуктов, помещающийся в BigIntegerField."""
+    value = hashlib.blake2b(
+        repr(sorted(ingredients)).encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(value, 'big') >> 1
+
+
+class SimilarityIndex:
+    """Битовые множества рецептов по продуктам и по числу продуктов."""
+
+    def __init__(self, recipes):
+        self.recipes = recipes
+        self.recipe_ids = sorted(recipes)
+        self.positions = {
+            recipe_id: position
+            for position, recipe_id in enumerate(self.recipe_ids)
+        }
+        postings = defaultdict(list)
+        totals = defaultdict(list)
+        for recipe_id, position in self.positions.items():
+            ingredients = recipes[recipe_id]
+            for ingredient_id in ingredients:
+                postings[ingredient_id].append(position)
+            totals[len(ingredients)].append(position)
+        self.postings = {
+            ingredient_id: bitset(positions)
+            for ingredient_id, positions in postings.items()
+        }
+        self.totals = {
+            total: bitset(positions) for total, positions in totals.items()
+        }
+
+    def groups(self, recipe_id):
+        """
+        Пары (коэффициент, битовое множество рецептов) по убыванию
+        коэффициента; сам рецепт не входит.
+        """
+        ingredients = self.recipes[recipe_id]
+        # Бит рецепта в slices[i] — i-й разряд числа общих продуктов.
+        slices = bit_slices(
+            self.postings[ingredient_id] for ingredient_id in ingredients
+        )
+        size = len(ingredients)
+        combinations = sorted(
+            (
+                (common / (size + total - common), common, total)
+                for total in self.totals
+                for common in range(1, min(size, total) + 1)
+                if not common >> len(slices)
+            ),
+            reverse=True
+        )
+        own = ~(1 << self.positions[recipe_id])
+        for score, common, total in combinations:
+            bits = select_count(self.totals[total] & own, slices, common)
+            if bits:
+                yield score, bits
+
+    def neighbours(self, recipe_id, limit=SIMILAR_COUNT):
+        """
+        Не более limit пар (коэффициент, id) по убыванию сходства.
+
+        При равном коэффициенте первыми идут новые рецепты.
+        """
+        found = []
+        for score, bits in self.groups(recipe_id):
+            for position in iter_positions(bits):
+                found.append((score, self.recipe_ids[position]))
+                if len(found) == limit:
+                    return found
+        return found
+
+    def reachable(self, recipe_id, weak):
+        """
+        Рецепты, в списки которых может войти recipe_id.
+
+        weak[level] — битовое множество рецептов, у которых неполный
+        список или худший коэффициент в нём меньше
+        level / THRESHOLD_LEVELS с округлением вниз.
+        """
+        found = 0
+        for score, bits in self.groups(recipe_id):
+            found |= bits & weak[math.ceil(score * THRESHOLD_LEVELS)]
+        return {self.recipe_ids[position] for position in iter_positions(
+            found
+        )}
+
+    def weak_sets(self):
+        """Множества weak для reachable по текущим спискам."""
+        lists = SimilarRecipe.objects.order_by().values('recipe').annotate(
+            count=Count('pk'), worst=Min('score')
+        ).values_list('recipe', 'count', 'worst')
+        levels = dict.fromkeys(self.recipe_ids, 0)
+        for recipe_id, count, worst in lists:
+            if count >= SIMILAR_COUNT and recipe_id in levels:
+                levels[recipe_id] = math.floor(worst * THRESHOLD_LEVELS)
+        by_level = defaultdict(list)
+        for recipe_id, level in levels.items():
+            by_level[level].append(self.positions[recipe_id])
+        weak = [0] * (THRESHOLD_LEVELS + 1)
+        bits = 0
+        for level in range(THRESHOLD_LEVELS + 1):
+            weak[level] = bits
+            bits |= bitset(by_level[level])
+        return weak
+
+
+def load_ingredients():
+    recipes = defaultdict(set)
+    for recipe_id, ingredient_id in RecipeIngredient.objects.order_by(
+    ).values_list('recipe_id', 'ingredient_id').iterator():
+        recipes[recipe_id].add(ingredient_id)
+    return {
+        recipe_id: frozenset(ingredients)
+        for recipe_id, ingredients in recipes.items()
+    }
+
+
+def update_similar(full=False):
+    """
+    Обновляет похожие рецепты; возвращает число пересчитанных рецептов.
+
+    full пересчитывает все рецепты, иначе только затронутые
+    изменениями состава с прошлого запуска.
+    """
+    recipes = load_ingredients()
+    digests = {
+        recipe_id: digest(ingredients)
+        for recipe_id, ingredients in recipes.items()
+    }
+    stored = dict(Recipe.objects.filter(
+        ingredients_digest__isnull=False
+    ).values_list('pk', 'ingredients_digest'))
+    changed = {
+        recipe_id for recipe_id, value in digests.items()
+        if stored.get(recipe_id) != value
+    } | (set(stored) - set(digests))
+    if not full and not changed:
+        return 0
+    index = SimilarityIndex(recipes)
+    if full:
+        affected = set(recipes) | set(stored)
+    else:
+        affected = set(changed)
+        affected.update(SimilarRecipe.objects.filter(
+            similar__in=changed
+        ).values_list('recipe_id', flat=True))
+        weak = index.weak_sets()
+        for recipe_id in changed & set(recipes):
+            affected |= index.reachable(recipe_id, weak)
+    affected = sorted(affected)
+    for start in range(0, len(affected), WRITE_BATCH_SIZE):
+        batch = affected[start:start + WRITE_BATCH_SIZE]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe__in=batch).delete()
+            SimilarRecipe.objects.bulk_create(
+                SimilarRecipe(
+                    recipe_id=recipe_id, similar_id=similar_id, score=score
+                )
+                for recipe_id in batch if recipe_id in recipes
+                for score, similar_id in index.neighbours(recipe_id)
+            )
+            Recipe.objects.bulk_update(
+                [
+                    Recipe(pk=recipe_id, ingredients_digest=digests.get(
+                        recipe_id
+                    ))
+                    for recipe_id in batch if recipe_id in changed
+                ],
+                ('ingredients_digest',)
+            )
+    bump_catalog_revision(SimilarRecipe._meta.label_lower)
+    return len(affected)
@@ -0,0 +1,161 @@
+import csv
+import random
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.user_flags import user_flags_cache
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag
+)
+from users.models import Subscriptions
+
+User = get_user_model()
+
+USERS_COUNT = 12
+RECIPES_COUNT = 60
+MIN_RECIPE_INGREDIENTS = 10
+MAX_RECIPE_INGREDIENTS = 20
+FAVORITES_COUNT = 25
+SHOPPING_CART_COUNT = 15
+IMAGE_PATH = 'recipes_images/test.png'
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def tags(db):
+    Tag.objects.bulk_create(
+        Tag(name=name, slug=slug) for name, slug in (
+            ('Завтрак', 'breakfast'),
+            ('Обед', 'lunch'),
+            ('Ужин', 'dinner'),
+        )
+    )
+    return list(Tag.objects.order_by('pk'))
+
+
+@pytest.fixture
+def ingredients(db):
+    """Полный справочник продуктов из data/ingredients.csv."""
+    file_path = settings.BASE_DIR / 'data' / 'ingredients.csv'
+    with open(file_path, encoding='utf-8') as file:
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in csv.reader(file)
+        )
+    return list(Ingredient.objects.all())
+
+
+@pytest.fixture
+def users(db):
+    User.objects.bulk_create(
+        User(
+            email=f'user{number}@foodgram.ru',
+            username=f'user{number}',
+            first_name=f'Имя{number}',
+            last_name=f'Фамилия{number}',
+        )
+        for number in range(USERS_COUNT)
+    )
+    return list(User.objects.order_by('pk'))
+
+
+@pytest.fixture
+def user(users):
+    """Пользователь, от имени которого выполняются запросы."""
+    user = users[0]
+    user.set_password('Foodgram-pass-1')
+    user.save()
+    return user
+
+
+@pytest.fixture
+def recipes(users, tags, ingredients):
+    """Рецепты от всех пользователей, в каждом 10–20 продуктов."""
+    rng = random.Random(RECIPES_COUNT)
+    Recipe.objects.bulk_create(
+        Recipe(
+            name=f'Рецепт {number}',
+            author=users[number % len(users)],
+            text='Описание рецепта ' * 20,
+            image=IMAGE_PATH,
+            cooking_time=rng.randint(5, 120),
+        )
+        for number in range(RECIPES_COUNT)
+    )
+    recipes = list(Recipe.objects.order_by('pk'))
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                         amount=rng.randint(1, 500))
+        for recipe in recipes
+        for ingredient in rng.sample(
+            ingredients,
+            rng.randint(MIN_RECIPE_INGREDIENTS, MAX_RECIPE_INGREDIENTS)
+        )
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes
+        for tag in rng.sample(tags, rng.randint(1, len(tags)))
+    )
+    call_command('reconcile_counters', stdout=StringIO())
+    return recipes
+
+
+@pytest.fixture
+def dataset(user, users, recipes):
+    """Избранное, список покупок и подписки текущего пользователя."""
+    foreign_recipes = [
+        recipe for recipe in recipes if recipe.author_id != user.pk
+    ]
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe)
+        for recipe in foreign_recipes[:FAVORITES_COUNT]
+    )
+    for recipe in foreign_recipes[-SHOPPING_CART_COUNT:]:
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    Subscriptions.objects.bulk_create(
+        Subscriptions(user=user, author=author) for author in users[1:]
+    )
+    Subscriptions.objects.bulk_create(
+        Subscriptions(user=follower, author=user) for follower in users[1:]
+    )
+    call_command('reconcile_counters', stdout=StringIO())
+    # Флаги загружаются первым запросом пользователя; бюджеты запросов
+    # проверяются для последующих.
+    user_flags_cache.get(user)
+    return recipes
+
+
+@pytest.fixture
+def token(user):
+    return Token.objects.create(user=user)
+
+
+@pytest.fixture
+def anon_client():
+    return APIClient()
+
+
+@pytest.fixture
+def auth_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
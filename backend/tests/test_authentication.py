@@ -0,0 +1,113 @@
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from users.models import Subscriptions
+
+from tests.test_images import data_uri, make_image
+
+ME = '/api/users/me/'
+
+
+def get_me(client):
+    """Ответ /api/users/me/ и признак загрузки токена из базы."""
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(ME)
+    return response, any(
+        Token._meta.db_table in query['sql']
+        for query in queries.captured_queries
+    )
+
+
+def warm_up(client):
+    get_me(client)
+    assert get_me(client)[0].status_code == HTTPStatus.OK
+    assert not get_me(client)[1]
+
+
+def test_cached_user(auth_client, user):
+    assert get_me(auth_client)[1]
+    assert get_me(auth_client)[1]
+    for _ in range(3):
+        response, loaded = get_me(auth_client)
+        assert not loaded
+        assert response.data['email'] == user.email
+    stdout = StringIO()
+    call_command('cache_stats', stdout=stdout)
+    assert 'api.auth_tokens: попаданий 3, промахов 2' in stdout.getvalue()
+
+
+def test_logout(auth_client, django_capture_on_commit_callbacks):
+    warm_up(auth_client)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = auth_client.post('/api/auth/token/logout/')
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    assert get_me(auth_client)[0].status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_set_password(auth_client, user, django_capture_on_commit_callbacks):
+    warm_up(auth_client)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = auth_client.post('/api/users/set_password/', {
+            'current_password': 'Foodgram-pass-1',
+            'new_password': 'Foodgram-pass-2',
+        })
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    # Проверка текущего пароля использует хеш пользователя из кэша.
+    with django_capture_on_commit_callbacks(execute=True):
+        response = auth_client.post('/api/users/set_password/', {
+            'current_password': 'Foodgram-pass-2',
+            'new_password': 'Foodgram-pass-3',
+        })
+    assert response.status_code == HTTPStatus.NO_CONTENT
+
+
+def test_deactivation(auth_client, user, django_capture_on_commit_callbacks):
+    warm_up(auth_client)
+    user.is_active = False
+    with django_capture_on_commit_callbacks(execute=True):
+        user.save()
+    assert get_me(auth_client)[0].status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_profile_updates(auth_client, user,
+                         django_capture_on_commit_callbacks):
+    warm_up(auth_client)
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.put('/api/users/me/avatar/', {
+            'avatar': data_uri(make_image((20, 20), 'PNG'), 'png')
+        }, format='json')
+    response, loaded = get_me(auth_client)
+    assert loaded
+    assert response.data['avatar']
+    user.first_name = 'Новое имя'
+    with django_capture_on_commit_callbacks(execute=True):
+        user.save()
+    assert get_me(auth_client)[0].data['first_name'] == 'Новое имя'
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.delete('/api/users/me/avatar/')
+    assert get_me(auth_client)[0].data['avatar'] is None
+
+
+def test_stale_snapshot_is_not_saved(auth_client, user, users):
+    warm_up(auth_client)
+    # Сигналы увеличивают счётчик через update(); ревизия пользователя
+    # меняется только после фиксации, поэтому в кэше старая копия.
+    for follower in users[1:3]:
+        Subscriptions.objects.create(user=follower, author=user)
+    response = auth_client.delete('/api/users/me/avatar/')
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    user.refresh_from_db()
+    assert user.followers_count == 2
+
+
+def test_counters_refresh_snapshot(auth_client, user, users,
+                                   django_capture_on_commit_callbacks):
+    warm_up(auth_client)
+    with django_capture_on_commit_callbacks(execute=True):
+        Subscriptions.objects.create(user=users[1], author=user)
+    assert get_me(auth_client)[1]
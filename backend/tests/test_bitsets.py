@@ -0,0 +1,24 @@
+from recipes.bitsets import (
+    bit_slices,
+    bitset,
+    iter_positions,
+    popcount,
+    select_count
+)
+
+
+def test_bitset_positions():
+    bits = bitset([0, 3, 9, 64])
+    assert popcount(bits) == 4
+    assert list(iter_positions(bits)) == [64, 9, 3, 0]
+    assert bitset([]) == 0
+
+
+def test_select_count():
+    columns = [bitset([0, 1, 2]), bitset([1, 2]), bitset([2, 5])]
+    slices = bit_slices(columns)
+    everything = bitset(range(8))
+    assert select_count(everything, slices, 3) == bitset([2])
+    assert select_count(everything, slices, 2) == bitset([1])
+    assert select_count(everything, slices, 1) == bitset([0, 5])
+    assert select_count(everything, slices, 4) == 0
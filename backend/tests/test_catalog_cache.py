@@ -0,0 +1,86 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Ingredient, Tag
+
+
+@pytest.mark.parametrize('url', ('/api/tags/', '/api/ingredients/?name=сыр'))
+def test_not_modified(anon_client, tags, ingredients, url,
+                      django_assert_num_queries):
+    response = anon_client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    assert response['Last-Modified']
+    with django_assert_num_queries(0):
+        cached = anon_client.get(url)
+        not_modified = anon_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+    assert cached.data == response.data
+    assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+    assert not not_modified.content
+
+
+def test_weak_etag_not_modified(anon_client, tags):
+    etag = anon_client.get('/api/tags/')['ETag']
+    response = anon_client.get('/api/tags/', HTTP_IF_NONE_MATCH=f'W/{etag}')
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_tag_detail_cached(anon_client, tags, django_assert_num_queries):
+    url = f'/api/tags/{tags[0].pk}/'
+    anon_client.get(url)
+    with django_assert_num_queries(0):
+        response = anon_client.get(url)
+    assert response.data['slug'] == tags[0].slug
+
+
+def test_admin_save_changes_etag(
+    anon_client, tags, django_capture_on_commit_callbacks
+):
+    etag = anon_client.get('/api/tags/')['ETag']
+    tag = Tag.objects.get(slug='lunch')
+    tag.name = 'Полдник'
+    with django_capture_on_commit_callbacks(execute=True):
+        tag.save()
+    response = anon_client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert response['ETag'] != etag
+    assert 'Полдник' in {item['name'] for item in response.data}
+
+
+def test_import_command_changes_etag(
+    anon_client, db, django_capture_on_commit_callbacks
+):
+    etag = anon_client.get('/api/tags/')['ETag']
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command('import_tags', stdout=StringIO())
+    response = anon_client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.data) == Tag.objects.count() > 0
+
+
+def test_ingredient_change_changes_etag(
+    anon_client, ingredients, django_capture_on_commit_callbacks
+):
+    etag = anon_client.get('/api/ingredients/?name=зз')['ETag']
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.objects.create(name='ззз', measurement_unit='г')
+    response = anon_client.get(
+        '/api/ingredients/?name=зз', HTTP_IF_NONE_MATCH=etag
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert [item['name'] for item in response.data] == ['ззз']
+
+
+def test_uncommitted_change_keeps_etag(
+    anon_client, tags, django_capture_on_commit_callbacks
+):
+    etag = anon_client.get('/api/tags/')['ETag']
+    with django_capture_on_commit_callbacks() as callbacks:
+        Tag.objects.filter(slug='lunch').get().save()
+        response = anon_client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert callbacks
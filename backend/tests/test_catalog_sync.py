@@ -0,0 +1,120 @@
+import csv
+import json
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import CommandError, call_command
+
+from recipes.catalog_sync import iter_json_array
+from recipes.models import Ingredient, RecipeIngredient, Tag
+
+INGREDIENTS_CSV = settings.BASE_DIR / 'data' / 'ingredients.csv'
+
+
+def sync(command, *args, **options):
+    stdout = StringIO()
+    call_command(command, *args, stdout=stdout, **options)
+    return stdout.getvalue()
+
+
+def read_csv():
+    with open(INGREDIENTS_CSV, encoding='utf-8') as file:
+        return list(csv.reader(file))
+
+
+@pytest.mark.parametrize('chunk_size', (1, 7, 4096))
+def test_iter_json_array(chunk_size):
+    items = [{'name': f'продукт, {number}', 'unit': '[г]'}
+             for number in range(50)]
+    file = StringIO(json.dumps(items, ensure_ascii=False, indent=1))
+    assert list(iter_json_array(file, chunk_size)) == items
+
+
+@pytest.mark.parametrize('content', ('{}', '[{"name": "соль"}'))
+def test_iter_json_array_invalid(content):
+    with pytest.raises(ValueError):
+        list(iter_json_array(StringIO(content)))
+
+
+@pytest.mark.parametrize('path', (
+    INGREDIENTS_CSV, settings.BASE_DIR / 'data' / 'ingredients.json'
+))
+def test_sync_is_idempotent(db, path):
+    sync('import_ingredients', path)
+    count = Ingredient.objects.count()
+    assert count == len(read_csv())
+    output = sync('import_ingredients', path)
+    assert Ingredient.objects.count() == count
+    assert 'добавлено 0, обновлено 0' in output
+
+
+def test_changed_unit_is_updated(tmp_path, recipes):
+    rows = read_csv()
+    used = RecipeIngredient.objects.select_related('ingredient').first()
+    ingredient = used.ingredient
+    rows[[name for name, _ in rows].index(ingredient.name)] = [
+        ingredient.name, 'кг'
+    ]
+    path = tmp_path / 'ingredients.csv'
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        csv.writer(file).writerows([('name', 'measurement_unit'), *rows])
+    output = sync('import_ingredients', path, dry_run=True)
+    assert 'обновлено 1' in output
+    ingredient.refresh_from_db()
+    assert ingredient.measurement_unit != 'кг'
+    sync('import_ingredients', path)
+    ingredient.refresh_from_db()
+    assert ingredient.measurement_unit == 'кг'
+    assert RecipeIngredient.objects.filter(pk=used.pk).exists()
+
+
+def test_delete_keeps_used_rows(tmp_path, recipes):
+    used = set(RecipeIngredient.objects.values_list(
+        'ingredient_id', flat=True
+    ))
+    path = tmp_path / 'ingredients.ndjson'
+    path.write_text(
+        json.dumps({'name': 'новый продукт', 'measurement_unit': 'г'}),
+        encoding='utf-8'
+    )
+    sync('import_ingredients', path)
+    assert Ingredient.objects.count() == len(read_csv()) + 1
+    sync('import_ingredients', path, delete=True)
+    assert set(Ingredient.objects.values_list('pk', flat=True)) == used | {
+        Ingredient.objects.get(name='новый продукт').pk
+    }
+
+
+def test_tags_sync(tmp_path, tags):
+    path = tmp_path / 'tags.json'
+    path.write_text(json.dumps([
+        {'name': 'Полдник', 'slug': 'lunch'},
+        {'name': 'Десерт', 'slug': 'dessert'},
+    ], ensure_ascii=False), encoding='utf-8')
+    sync('import_tags', path)
+    assert Tag.objects.get(slug='lunch').pk == tags[1].pk
+    assert set(Tag.objects.values_list('name', flat=True)) == {
+        'Завтрак', 'Полдник', 'Ужин', 'Десерт'
+    }
+
+
+def test_invalid_row_aborts_sync(tmp_path, db):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('соль,г\nсахар,\n', encoding='utf-8')
+    with pytest.raises(CommandError, match='Запись 2'):
+        sync('import_ingredients', path)
+    assert not Ingredient.objects.exists()
+
+
+@pytest.mark.parametrize('rows', (
+    [{'name': 'Завтрак', 'slug': 'morning'}],
+    [{'name': 'Десерт', 'slug': 'dessert'},
+     {'name': 'Десерт', 'slug': 'sweets'}],
+))
+def test_tag_name_conflict(tmp_path, tags, rows):
+    path = tmp_path / 'tags.json'
+    path.write_text(json.dumps(rows, ensure_ascii=False), encoding='utf-8')
+    with pytest.raises(CommandError, match='поля name повторяется'):
+        sync('import_tags', path)
+    assert Tag.objects.count() == len(tags)
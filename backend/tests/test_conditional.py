@@ -0,0 +1,70 @@
+from http import HTTPStatus
+
+import pytest
+
+from recipes.models import Ingredient, Recipe
+from tests.test_query_budget import own_recipe, recipe_payload
+
+
+def get_etag(client, url):
+    response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    return response['ETag']
+
+
+def is_not_modified(client, url, etag):
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    return response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+@pytest.mark.parametrize('client_name', ('anon_client', 'auth_client'))
+def test_recipe_detail_not_modified(request, dataset, client_name,
+                                    django_assert_max_num_queries):
+    client = request.getfixturevalue(client_name)
+    url = f'/api/recipes/{Recipe.objects.first().pk}/'
+    etag = get_etag(client, url)
+    with django_assert_max_num_queries(2):
+        assert is_not_modified(client, url, etag)
+    assert is_not_modified(client, url, f'W/{etag}')
+    assert not is_not_modified(client, url, '"stale"')
+
+
+def test_recipe_detail_etag_changes(auth_client, dataset, user):
+    recipe = own_recipe(user)
+    url = f'/api/recipes/{recipe.pk}/'
+    etag = get_etag(auth_client, url)
+    auth_client.post(f'{url}favorite/')
+    assert not is_not_modified(auth_client, url, etag)
+    etag = get_etag(auth_client, url)
+    auth_client.patch(url, {
+        **recipe_payload(3), 'name': 'Новое название'
+    }, format='json')
+    assert not is_not_modified(auth_client, url, etag)
+    etag = get_etag(auth_client, url)
+    user.first_name = 'Другое'
+    user.save()
+    assert not is_not_modified(auth_client, url, etag)
+    etag = get_etag(auth_client, url)
+    ingredient = Ingredient.objects.filter(recipes=recipe).first()
+    ingredient.name = 'Переименованный продукт'
+    ingredient.save()
+    assert not is_not_modified(auth_client, url, etag)
+
+
+def test_recipe_list_not_modified(auth_client, anon_client, dataset, user,
+                                  django_assert_max_num_queries,
+                                  django_capture_on_commit_callbacks):
+    url = '/api/recipes/?limit=6'
+    anon_etag = get_etag(anon_client, url)
+    etag = get_etag(auth_client, url)
+    assert etag != anon_etag
+    with django_assert_max_num_queries(0):
+        assert is_not_modified(anon_client, url, anon_etag)
+    with django_assert_max_num_queries(1):
+        assert is_not_modified(auth_client, url, etag)
+    assert not is_not_modified(auth_client, '/api/recipes/?limit=5', etag)
+    recipe = Recipe.objects.exclude(favorites__user=user).first()
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.post(f'/api/recipes/{recipe.pk}/favorite/')
+    assert not is_not_modified(auth_client, url, etag)
+    assert is_not_modified(anon_client, url, anon_etag)
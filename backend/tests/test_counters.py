@@ -0,0 +1,71 @@
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscriptions, User
+
+
+def counts(recipe):
+    recipe.refresh_from_db()
+    return recipe.favorites_count, recipe.shopping_cart_count
+
+
+def test_recipe_counters(auth_client, user, recipes):
+    recipe = recipes[1]
+    for url in ('favorite', 'shopping_cart'):
+        auth_client.post(f'/api/recipes/{recipe.pk}/{url}/')
+    assert counts(recipe) == (1, 1)
+    for url in ('favorite', 'shopping_cart'):
+        auth_client.delete(f'/api/recipes/{recipe.pk}/{url}/')
+    assert counts(recipe) == (0, 0)
+
+
+def test_user_counters(auth_client, user, users, recipes):
+    author = users[1]
+    recipes_count = Recipe.objects.filter(author=author).count()
+    auth_client.post(f'/api/users/{author.pk}/subscribe/')
+    Recipe.objects.create(
+        name='Ещё рецепт', author=author, text='Описание',
+        image='recipes_images/test.png', cooking_time=1
+    )
+    author.refresh_from_db()
+    assert author.followers_count == 1
+    assert author.recipes_count == recipes_count + 1
+    auth_client.delete(f'/api/users/{author.pk}/subscribe/')
+    Recipe.objects.filter(author=author).first().delete()
+    author.refresh_from_db()
+    assert (author.followers_count, author.recipes_count) == (
+        0, recipes_count
+    )
+
+
+def test_reconcile_counters(user, users, recipes):
+    recipe = recipes[0]
+    Favorite.objects.create(user=users[1], recipe=recipe)
+    Recipe.objects.filter(pk=recipe.pk).update(
+        favorites_count=10, shopping_cart_count=5
+    )
+    User.objects.filter(pk=user.pk).update(recipes_count=0)
+    Subscriptions.objects.bulk_create(
+        Subscriptions(user=follower, author=user) for follower in users[1:]
+    )
+    output = StringIO()
+    call_command('reconcile_counters', stdout=output)
+    assert 'recipes.Recipe.favorites_count: исправлено 1' in (
+        output.getvalue()
+    )
+    assert counts(recipe) == (
+        1, ShoppingCart.objects.filter(recipe=recipe).count()
+    )
+    user.refresh_from_db()
+    assert user.recipes_count == Recipe.objects.filter(author=user).count()
+    assert user.followers_count == len(users) - 1
+
+
+def test_subscriptions_read_counter(auth_client, dataset, users):
+    User.objects.filter(pk=users[1].pk).update(recipes_count=42)
+    response = auth_client.get('/api/users/subscriptions/', {'limit': 1})
+    assert response.status_code == HTTPStatus.OK
+    assert response.data['results'][0]['recipes_count'] == 42
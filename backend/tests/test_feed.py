@@ -0,0 +1,88 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from recipes.models import Recipe, TimelineEntry
+from tests.test_query_budget import recipe_payload
+from users.models import Subscriptions
+
+User = get_user_model()
+
+URL = '/api/recipes/feed/'
+
+
+def expected_feed(user):
+    return list(Recipe.objects.filter(
+        author__authors__user=user
+    ).order_by('-pub_date', '-id').values_list('pk', flat=True))
+
+
+def read_all(client, limit):
+    ids, url, params = [], URL, {'limit': limit}
+    while url:
+        response = client.get(url, params)
+        assert response.status_code == HTTPStatus.OK, response.data
+        ids.extend(recipe['id'] for recipe in response.data['results'])
+        url, params = response.data['next'], None
+    return ids
+
+
+@pytest.mark.parametrize('fanout_limit', (10000, 0))
+def test_feed_pages(auth_client, dataset, user, settings, fanout_limit,
+                    django_assert_max_num_queries):
+    settings.FEED_FANOUT_LIMIT = fanout_limit
+    call_command('fan_out_recipes', batch_size=7, stdout=StringIO())
+    assert TimelineEntry.objects.filter(user=user).exists() == bool(
+        fanout_limit
+    )
+    assert read_all(auth_client, 7) == expected_feed(user)
+    with django_assert_max_num_queries(6):
+        response = auth_client.get(URL, {'limit': 25})
+    assert len(response.data['results']) == 25
+
+
+def test_feed_follows_writes(auth_client, anon_client, dataset, user, users,
+                             django_capture_on_commit_callbacks):
+    call_command('fan_out_recipes', stdout=StringIO())
+    author = users[1]
+    author_client = anon_client
+    author_client.force_authenticate(author)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(
+            '/api/recipes/', recipe_payload(2), format='json'
+        )
+    pk = response.data['id']
+    assert Recipe.objects.get(pk=pk).in_timelines
+    assert auth_client.get(URL).data['results'][0]['id'] == pk
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.delete(f'/api/users/{author.pk}/subscribe/')
+    assert not TimelineEntry.objects.filter(user=user, author=author).exists()
+    assert pk not in read_all(auth_client, 100)
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.post(f'/api/users/{author.pk}/subscribe/')
+    assert TimelineEntry.objects.filter(user=user, author=author).count() == (
+        Recipe.objects.filter(author=author).count()
+    )
+    assert read_all(auth_client, 100) == expected_feed(user)
+
+
+def test_feed_invalid_params(auth_client, anon_client, dataset):
+    for params in ({'cursor': 'bad'}, {'limit': 0}):
+        response = auth_client.get(URL, params)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert anon_client.get(URL).status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_benchmark_feed(db):
+    stdout = StringIO()
+    call_command(
+        'benchmark_feed', users=40, authors=8, follows=3, recipes=4,
+        reads=10, stdout=stdout
+    )
+    assert 'Сборка при чтении' in stdout.getvalue()
+    assert 'Рассылка при записи' in stdout.getvalue()
+    assert not User.objects.exists()
+    assert not Subscriptions.objects.exists()
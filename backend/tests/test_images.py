@@ -0,0 +1,95 @@
+import base64
+from http import HTTPStatus
+from io import BytesIO, StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+
+from recipes.images import MAX_IMAGE_SIZE, normalize_image
+from recipes.models import Recipe
+from tests.test_query_budget import recipe_payload
+
+EXIF_ORIENTATION = 0x0112
+
+
+def make_image(size=(3000, 1000), image_format='JPEG', orientation=None):
+    image = Image.new('RGB', size, 'red')
+    exif = Image.Exif()
+    if orientation:
+        exif[EXIF_ORIENTATION] = orientation
+    buffer = BytesIO()
+    image.save(buffer, image_format, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+def data_uri(content, subtype='jpeg'):
+    return (
+        f'data:image/{subtype};base64,{base64.b64encode(content).decode()}'
+    )
+
+
+def open_image(name):
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    return image
+
+
+def test_normalize_image():
+    file = normalize_image(
+        ContentFile(make_image(orientation=6), name='photo.jpeg')
+    )
+    image = Image.open(file)
+    assert file.name == 'photo.jpg'
+    assert image.size == (MAX_IMAGE_SIZE[1] // 3, MAX_IMAGE_SIZE[1])
+    assert EXIF_ORIENTATION not in image.getexif()
+
+
+def test_recipe_image_variants(auth_client, recipes,
+                               django_capture_on_commit_callbacks):
+    payload = {**recipe_payload(), 'image': data_uri(make_image())}
+    with django_capture_on_commit_callbacks(execute=True):
+        response = auth_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == HTTPStatus.CREATED, response.data
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    assert recipe.image.width <= MAX_IMAGE_SIZE[0]
+    assert set(recipe.image_variants) == {
+        'source', 'thumbnail', 'thumbnail_webp', 'webp'
+    }
+    assert open_image(recipe.image_variants['thumbnail']).size == (480, 360)
+    assert open_image(recipe.image_variants['webp']).format == 'WEBP'
+    response = auth_client.get(f'/api/recipes/{recipe.pk}/')
+    assert response.data['image_variants']['thumbnail_webp'].startswith(
+        'http://testserver/media/recipes_images/variants/'
+    )
+
+
+def test_avatar_variants(auth_client, user,
+                         django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.put('/api/users/me/avatar/', {
+            'avatar': data_uri(make_image((200, 300), 'PNG'), 'png')
+        }, format='json')
+    user.refresh_from_db()
+    assert open_image(user.avatar_variants['thumbnail']).size == (96, 96)
+    response = auth_client.get(f'/api/users/{user.pk}/')
+    assert set(response.data['avatar_variants']) == {
+        'thumbnail', 'thumbnail_webp', 'webp'
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.delete('/api/users/me/avatar/')
+    user.refresh_from_db()
+    assert user.avatar_variants == {'source': ''}
+
+
+def test_backfill_command(recipes):
+    name = default_storage.save(
+        'recipes_images/backfill.jpg', ContentFile(make_image())
+    )
+    Recipe.objects.filter(pk=recipes[0].pk).update(image=name)
+    call_command('build_image_variants', stdout=StringIO())
+    recipe = Recipe.objects.get(pk=recipes[0].pk)
+    assert recipe.image_variants['source'] == name
+    assert default_storage.exists(recipe.image_variants['thumbnail'])
@@ -0,0 +1,121 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.management.commands.import_recipes import Command
+from recipes.models import Recipe, RecipeIngredient
+from recipes.search import search
+
+RECIPES_COUNT = 30
+
+
+@pytest.fixture
+def rows(users, tags, ingredients):
+    return [
+        {
+            'author': users[number % 3].username,
+            'name': f'Импортированный рецепт {number}',
+            'text': 'Описание',
+            'cooking_time': number + 1,
+            'image': 'recipes_images/imported.png',
+            'tags': [tag.slug for tag in tags[:number % 3 + 1]],
+            'ingredients': [
+                {
+                    'name': ingredient.name,
+                    'measurement_unit': ingredient.measurement_unit,
+                    'amount': 10,
+                }
+                for ingredient in ingredients[number:number + 5]
+            ],
+        }
+        for number in range(RECIPES_COUNT)
+    ]
+
+
+def write(tmp_path, rows):
+    path = tmp_path / 'recipes.ndjson'
+    path.write_text('\n'.join(
+        row if isinstance(row, str) else json.dumps(row, ensure_ascii=False)
+        for row in rows
+    ), encoding='utf-8')
+    return str(path)
+
+
+def import_recipes(path, batch_size=7):
+    stderr = StringIO()
+    call_command(
+        'import_recipes', path, batch_size=batch_size,
+        stdout=StringIO(), stderr=stderr
+    )
+    return stderr.getvalue()
+
+
+def test_import(tmp_path, rows, users):
+    import_recipes(write(tmp_path, rows))
+    assert Recipe.objects.count() == RECIPES_COUNT
+    assert RecipeIngredient.objects.count() == RECIPES_COUNT * 5
+    recipe = Recipe.objects.get(name='Импортированный рецепт 5')
+    assert recipe.author == users[2]
+    assert recipe.tags.count() == 3
+    users[0].refresh_from_db()
+    assert users[0].recipes_count == RECIPES_COUNT // 3
+
+
+def test_import_is_resumable(tmp_path, rows):
+    import_recipes(write(tmp_path, rows[:12]))
+    import_recipes(write(tmp_path, rows))
+    assert Recipe.objects.count() == RECIPES_COUNT
+    assert RecipeIngredient.objects.count() == RECIPES_COUNT * 5
+
+
+def test_invalid_rows_are_skipped(tmp_path, rows):
+    rows[3]['author'] = 'nobody'
+    rows[4]['tags'] = ['unknown']
+    rows[5]['ingredients'][0]['measurement_unit'] = 'unknown'
+    rows[6]['cooking_time'] = 0
+    errors = import_recipes(write(tmp_path, [*rows, '{broken']))
+    assert Recipe.objects.count() == RECIPES_COUNT - 4
+    assert len(errors.splitlines()) == 5
+
+
+def test_field_types_and_lengths(tmp_path, rows):
+    rows[0]['cooking_time'] = True
+    rows[1]['text'] = 'т' * 5001
+    rows[2]['ingredients'][0]['amount'] = False
+    rows[3]['cooking_time'] = 2 ** 40
+    rows[4]['image'] = 'recipes_images/' + 'и' * 100
+    errors = import_recipes(write(tmp_path, rows))
+    assert Recipe.objects.count() == RECIPES_COUNT - 5
+    assert len(errors.splitlines()) == 5
+
+
+def test_search_index_after_failed_batch(tmp_path, rows, monkeypatch):
+    import_chunk = Command.import_chunk
+    calls = []
+
+    def failing_import_chunk(self, chunk):
+        calls.append(chunk)
+        if len(calls) == 2:
+            raise RuntimeError('сбой')
+        return import_chunk(self, chunk)
+
+    monkeypatch.setattr(Command, 'import_chunk', failing_import_chunk)
+    with pytest.raises(RuntimeError):
+        import_recipes(write(tmp_path, rows))
+    assert search(Recipe.objects.all(), 'Импортированный').count() == 7
+
+
+def test_queries_do_not_depend_on_recipes(tmp_path, rows):
+    def count_queries(rows):
+        with CaptureQueriesContext(connection) as context:
+            import_recipes(write(tmp_path, rows), batch_size=RECIPES_COUNT)
+        return len(context.captured_queries)
+
+    Recipe.objects.all().delete()
+    small = count_queries(rows[:3])
+    Recipe.objects.all().delete()
+    assert count_queries(rows) == small
@@ -0,0 +1,79 @@
+from http import HTTPStatus
+
+import pytest
+
+from api.autocomplete import AUTOCOMPLETE_LIMIT, ingredient_index
+from recipes.models import Ingredient
+
+
+@pytest.fixture(autouse=True)
+def fresh_index():
+    ingredient_index.invalidate()
+    yield
+    ingredient_index.invalidate()
+
+
+@pytest.mark.parametrize('name', ('сыр', 'Мор', 'мука'))
+def test_prefix_matches_first(anon_client, ingredients, name):
+    response = anon_client.get('/api/ingredients/', {'name': name})
+    assert response.status_code == HTTPStatus.OK
+    names = [item['name'].lower() for item in response.data]
+    assert 0 < len(names) <= AUTOCOMPLETE_LIMIT
+    prefixed = [item.startswith(name.lower()) for item in names]
+    assert prefixed == sorted(prefixed, reverse=True)
+    assert all(name.lower() in item for item in names)
+
+
+def test_matches_database_search(anon_client, ingredients):
+    expected = set(Ingredient.objects.filter(
+        name__istartswith='сыр'
+    ).values_list('pk', flat=True))
+    response = anon_client.get(
+        '/api/ingredients/', {'name': 'сыр', 'limit': len(expected)}
+    )
+    assert {item['id'] for item in response.data} == expected
+
+
+def test_repeated_search_skips_database(anon_client, ingredients,
+                                        django_assert_num_queries):
+    anon_client.get('/api/ingredients/', {'name': 'а'})
+    with django_assert_num_queries(0):
+        response = anon_client.get(
+            '/api/ingredients/', {'name': 'сах', 'limit': 5}
+        )
+    assert len(response.data) <= 5
+
+
+def test_index_invalidated_on_change(
+    anon_client, ingredients, django_capture_on_commit_callbacks
+):
+    anon_client.get('/api/ingredients/', {'name': 'я'})
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.objects.create(name='ящерица', measurement_unit='шт')
+    response = anon_client.get('/api/ingredients/', {'name': 'ящер'})
+    assert [item['name'] for item in response.data] == ['ящерица']
+
+
+@pytest.mark.parametrize('index_max_size', (10 ** 6, 10))
+def test_list_without_name_is_limited(anon_client, ingredients, monkeypatch,
+                                      index_max_size):
+    monkeypatch.setattr('api.autocomplete.INDEX_MAX_SIZE', index_max_size)
+    response = anon_client.get('/api/ingredients/')
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.data) == AUTOCOMPLETE_LIMIT < len(ingredients)
+
+
+def test_database_fallback(anon_client, ingredients, monkeypatch):
+    monkeypatch.setattr('api.autocomplete.INDEX_MAX_SIZE', 10)
+    response = anon_client.get('/api/ingredients/', {'name': 'сыр'})
+    assert response.status_code == HTTPStatus.OK
+    assert response.data[0]['name'].startswith('сыр')
+    assert len(response.data) == AUTOCOMPLETE_LIMIT
+
+
+@pytest.mark.parametrize('limit', ('0', 'abc', '1000'))
+def test_invalid_limit(anon_client, ingredients, limit):
+    response = anon_client.get(
+        '/api/ingredients/', {'name': 'а', 'limit': limit}
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
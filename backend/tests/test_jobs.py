@@ -0,0 +1,80 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim, enqueue, queue_stats, run_job
+
+calls = []
+
+
+def record(value):
+    calls.append(value)
+
+
+def fail():
+    raise RuntimeError('Ошибка задачи')
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+@pytest.fixture
+def lazy(settings):
+    settings.JOBS_EAGER = False
+
+
+def test_eager_job_runs_on_commit(db, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        job = enqueue(record, 1)
+        assert calls == []
+    job.refresh_from_db()
+    assert calls == [1]
+    assert (job.status, job.attempts) == (Job.DONE, 1)
+
+
+def test_failed_job_is_retried_with_backoff(db, lazy):
+    job = enqueue(fail, max_attempts=2)
+    run_job(*claim(10))
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.PENDING, 1)
+    assert job.run_at > timezone.now()
+    assert 'Ошибка задачи' in job.last_error
+    assert claim(10) == []
+    Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+    run_job(*claim(10))
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.FAILED, 2)
+
+
+def test_stale_running_job_is_reclaimed(db, lazy):
+    job = enqueue(record, 1)
+    claim(10)
+    Job.objects.filter(pk=job.pk).update(
+        started_at=timezone.now() - timedelta(days=1)
+    )
+    assert [job.pk for job in claim(10)] == [job.pk]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_run_worker(lazy):
+    for value in range(10):
+        enqueue(record, value)
+    enqueue(fail, max_attempts=1)
+    call_command(
+        'run_worker', burst=True, concurrency=1,
+        poll_interval=0.01, stdout=StringIO()
+    )
+    assert sorted(calls) == list(range(10))
+    stats = queue_stats()
+    assert stats['counts'][Job.DONE] == 10
+    assert stats['counts'][Job.FAILED] == 1
+    assert stats['ready'] == 0
+    stdout = StringIO()
+    call_command('job_status', stdout=stdout)
+    assert 'Ошибка задачи' in stdout.getvalue()
@@ -0,0 +1,69 @@
+from http import HTTPStatus
+
+import pytest
+
+from api.paginators import MAX_PAGE_SIZE
+from api.user_flags import user_flags_cache
+from recipes.models import Recipe
+
+
+def walk(client, url, params, max_queries, django_assert_max_num_queries):
+    """Проходит все страницы курсорной пагинации и собирает id объектов."""
+    ids = []
+    response = None
+    while url:
+        with django_assert_max_num_queries(max_queries):
+            response = client.get(url, params)
+        assert response.status_code == HTTPStatus.OK
+        assert 'count' not in response.data
+        ids.extend(item['id'] for item in response.data['results'])
+        url, params = response.data['next'], None
+    return ids
+
+
+@pytest.mark.parametrize('limit', (1, 7, 60))
+def test_recipes_cursor_walk(auth_client, dataset,
+                             django_assert_max_num_queries, limit):
+    ids = walk(
+        auth_client, '/api/recipes/', {'cursor': '', 'limit': limit}, 5,
+        django_assert_max_num_queries
+    )
+    assert ids == list(
+        Recipe.objects.order_by('-pub_date', '-id').values_list(
+            'pk', flat=True
+        )
+    )
+
+
+def test_users_cursor_walk(auth_client, user, users,
+                           django_assert_max_num_queries):
+    user.is_staff = True
+    user.save()
+    user_flags_cache.get(user)
+    ids = walk(
+        auth_client, '/api/users/', {'cursor': '', 'limit': 5}, 2,
+        django_assert_max_num_queries
+    )
+    assert ids == [user.pk for user in users]
+
+
+def test_subscriptions_cursor_walk(auth_client, dataset, users,
+                                   django_assert_max_num_queries):
+    ids = walk(
+        auth_client, '/api/users/subscriptions/',
+        {'cursor': '', 'limit': 4, 'recipes_limit': 3}, 3,
+        django_assert_max_num_queries
+    )
+    assert ids == [user.pk for user in users[1:]]
+
+
+@pytest.mark.parametrize('params', ({}, {'cursor': ''}))
+def test_page_size_is_capped(anon_client, dataset, params):
+    Recipe.objects.bulk_create(
+        Recipe(name=f'Дополнительный рецепт {number}', text='Описание',
+               image='recipes_images/test.png', cooking_time=1)
+        for number in range(MAX_PAGE_SIZE)
+    )
+    response = anon_client.get('/api/recipes/', {'limit': 100000, **params})
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.data['results']) == MAX_PAGE_SIZE
@@ -0,0 +1,127 @@
+import random
+import time
+from http import HTTPStatus
+
+from api.pantry import PantryIndex, pantry_index
+from recipes.models import RecipeIngredient
+from tests.test_query_budget import recipe_payload
+
+URL = '/api/recipes/what_to_cook/'
+BENCHMARK_RECIPES = 100000
+BENCHMARK_INGREDIENTS = 2000
+MAX_MATCH_SECONDS = 0.1
+
+
+def expected_matches(include, exclude=()):
+    recipes = {}
+    for recipe_id, ingredient_id in RecipeIngredient.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    ):
+        recipes.setdefault(recipe_id, set()).add(ingredient_id)
+    matches = [
+        (recipe_id, len(ingredients & include), len(ingredients))
+        for recipe_id, ingredients in recipes.items()
+        if ingredients & include and not ingredients & exclude
+    ]
+    matches.sort(key=lambda match: (
+        -match[1] / match[2], -match[1], -match[0]
+    ))
+    return matches
+
+
+def test_what_to_cook_matches_brute_force(anon_client, recipes,
+                                          django_assert_max_num_queries):
+    rng = random.Random(1)
+    ingredient_ids = list(
+        RecipeIngredient.objects.values_list('ingredient_id', flat=True)
+    )
+    include = set(rng.sample(ingredient_ids, 12))
+    exclude = {rng.choice(ingredient_ids)} - include
+    expected = expected_matches(include, exclude)
+    params = {'ingredients': sorted(include), 'exclude': sorted(exclude)}
+    response = anon_client.get(URL, {**params, 'limit': 100})
+    assert response.status_code == HTTPStatus.OK, response.data
+    assert response.data['count'] == len(expected)
+    assert [
+        (recipe['id'], recipe['matched_ingredients_count'],
+         recipe['matched_ingredients_count']
+         + recipe['missing_ingredients_count'])
+        for recipe in response.data['results']
+    ] == expected[:100]
+    with django_assert_max_num_queries(4):
+        response = anon_client.get(URL, {**params, 'limit': 3, 'page': 2})
+    assert [recipe['id'] for recipe in response.data['results']] == [
+        recipe_id for recipe_id, _, _ in expected[3:6]
+    ]
+
+
+def test_what_to_cook_follows_recipe_changes(
+    auth_client, recipes, django_capture_on_commit_callbacks
+):
+    payload = recipe_payload(3)
+    include = [item['id'] for item in payload['ingredients']]
+    auth_client.get(URL, {'ingredients': include})
+    with django_capture_on_commit_callbacks(execute=True):
+        response = auth_client.post('/api/recipes/', payload, format='json')
+    pk = response.data['id']
+    response = auth_client.get(URL, {'ingredients': include})
+    assert response.data['results'][0]['id'] == pk
+    assert response.data['results'][0]['missing_ingredients_count'] == 0
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.patch(f'/api/recipes/{pk}/', {
+            **payload, 'ingredients': [{'id': include[0], 'amount': 1}]
+        }, format='json')
+    response = auth_client.get(URL, {'ingredients': include[1:]})
+    assert pk not in [recipe['id'] for recipe in response.data['results']]
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.delete(f'/api/recipes/{pk}/')
+    response = auth_client.get(URL, {'ingredients': include[:1]})
+    assert pk not in [recipe['id'] for recipe in response.data['results']]
+
+
+def test_what_to_cook_requires_ingredients(anon_client, db):
+    response = anon_client.get(URL)
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert 'ingredients' in response.data
+
+
+def test_match_latency(monkeypatch):
+    rng = random.Random(BENCHMARK_RECIPES)
+    index = PantryIndex()
+    index.load(
+        (recipe_id, ingredient_id)
+        for recipe_id in range(1, BENCHMARK_RECIPES + 1)
+        for ingredient_id in rng.sample(
+            range(BENCHMARK_INGREDIENTS), rng.randint(5, 20)
+        )
+    )
+    monkeypatch.setattr(index, '_sync', lambda: None)
+    include = rng.sample(range(BENCHMARK_INGREDIENTS), 30)
+    start = time.perf_counter()
+    matches = index.match(include, exclude=include[:1] + [1999])
+    page = matches[40:60]
+    count = len(matches)
+    elapsed = time.perf_counter() - start
+    assert len(page) == 20 and count > 20
+    assert elapsed <= MAX_MATCH_SECONDS, (
+        f'Подбор выполнялся {elapsed:.3f} c, бюджет {MAX_MATCH_SECONDS} c.'
+    )
+
+
+def test_recipe_delete_updates_index_incrementally(
+    auth_client, recipes, monkeypatch, django_capture_on_commit_callbacks
+):
+    recipe = recipes[0]
+    include = list(recipe.recipe_ingredients.values_list(
+        'ingredient_id', flat=True
+    ))
+    response = auth_client.get(URL, {'ingredients': include, 'limit': 100})
+    assert recipe.pk in [item['id'] for item in response.data['results']]
+    builds = []
+    monkeypatch.setattr(pantry_index, '_build', lambda: builds.append(1))
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.delete()
+    response = auth_client.get(URL, {'ingredients': include, 'limit': 100})
+    assert recipe.pk not in [item['id'] for item in response.data['results']]
+    assert response.data['count'] == len(expected_matches(set(include), set()))
+    assert not builds
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from recipes.models import PopularityEvent, Recipe
+from recipes.popularity import HALF_LIVES, log_add
+
+URL = '/api/recipes/'
+
+
+def decayed(events, field, now):
+    half_life = HALF_LIVES[field]
+    return sum(0.5 ** ((now - created) / half_life) for created in events)
+
+
+def test_log_add():
+    assert log_add(0, 3.0) == 3.0
+    assert log_add(3.0, 0) == 3.0
+    assert log_add(3.0, 3.0) == pytest.approx(4.0)
+    assert log_add(1.0, 5.0) == pytest.approx(log_add(5.0, 1.0))
+
+
+@pytest.mark.parametrize('ordering, field', (
+    ('popular', 'popular_score'),
+    ('trending', 'trending_score'),
+))
+def test_ordering(anon_client, dataset, ordering, field):
+    PopularityEvent.objects.all().delete()
+    now = timezone.now()
+    recipes = list(Recipe.objects.order_by('pk')[:12])
+    history = {
+        recipe.pk: [now - timedelta(hours=index * 20 + age * 7)
+                    for age in range(index % 5 + 1)]
+        for index, recipe in enumerate(recipes)
+    }
+    PopularityEvent.objects.bulk_create(
+        PopularityEvent(recipe_id=pk, created=created)
+        for pk, events in history.items() for created in events
+    )
+    stdout = StringIO()
+    call_command('update_popularity', stdout=stdout)
+    assert f'Обработано событий: {sum(map(len, history.values()))}' in (
+        stdout.getvalue()
+    )
+    assert not PopularityEvent.objects.exists()
+    expected = sorted(
+        history, key=lambda pk: -decayed(history[pk], field, now)
+    )
+    response = anon_client.get(URL, {'ordering': ordering, 'limit': 12})
+    assert response.status_code == HTTPStatus.OK
+    assert [recipe['id'] for recipe in response.data['results']] == expected
+    response = anon_client.get(URL, {'ordering': ordering, 'page': 3})
+    assert response.data['count'] == Recipe.objects.count()
+
+
+def test_trending_prefers_recent(anon_client, dataset):
+    PopularityEvent.objects.all().delete()
+    now = timezone.now()
+    old, new = Recipe.objects.order_by('pk')[:2]
+    PopularityEvent.objects.bulk_create(
+        [PopularityEvent(recipe=old, created=now - timedelta(days=7))] * 2
+        + [PopularityEvent(recipe=new, created=now)]
+    )
+    call_command('update_popularity', stdout=StringIO())
+    for ordering, first in (('popular', old), ('trending', new)):
+        response = anon_client.get(URL, {'ordering': ordering, 'limit': 2})
+        assert response.data['results'][0]['id'] == first.pk
+
+
+def test_new_events_update_list(anon_client, auth_client, dataset,
+                                django_capture_on_commit_callbacks):
+    PopularityEvent.objects.all().delete()
+    params = {'ordering': 'trending', 'limit': 1}
+    call_command('update_popularity', stdout=StringIO())
+    first = anon_client.get(URL, params)
+    recipe = Recipe.objects.exclude(pk=first.data['results'][0]['id']).last()
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.post(f'{URL}{recipe.pk}/favorite/')
+    assert PopularityEvent.objects.filter(recipe=recipe).count() == 1
+    assert anon_client.get(URL, params)['X-Cache'] == 'HIT'
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command('update_popularity', stdout=StringIO())
+    response = anon_client.get(URL, params)
+    assert response['X-Cache'] == 'MISS'
+    assert response['ETag'] != first['ETag']
+    assert response.data['results'][0]['id'] == recipe.pk
+    stdout = StringIO()
+    call_command('update_popularity', stdout=stdout)
+    assert 'Обработано событий: 0' in stdout.getvalue()
+
+
+def test_reset(dataset):
+    PopularityEvent.objects.create(recipe=Recipe.objects.first())
+    call_command('update_popularity', reset=True, stdout=StringIO())
+    assert not PopularityEvent.objects.exists()
+    for recipe in Recipe.objects.all():
+        count = recipe.favorites_count + recipe.shopping_cart_count
+        assert bool(recipe.popular_score) == bool(count)
+    ranked = Recipe.objects.order_by('-trending_score', '-pub_date', '-id')
+    counts = [
+        recipe.favorites_count + recipe.shopping_cart_count
+        for recipe in ranked
+    ]
+    assert counts == sorted(counts, reverse=True)
+
+
+@pytest.mark.parametrize('params', (
+    {'ordering': 'unknown'},
+    {'ordering': 'popular', 'cursor': ''},
+))
+def test_invalid_ordering(anon_client, dataset, params):
+    response = anon_client.get(URL, params)
+    assert response.status_code == HTTPStatus.BAD_REQUEST
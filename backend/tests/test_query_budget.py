@@ -0,0 +1,389 @@
+"""
+Бюджеты SQL-запросов и времени ответа для всех эндпоинтов API.
+
+Число запросов не должно зависеть от размера страницы, количества
+ингредиентов в рецептах и параметра recipes_limit: любой N+1 в
+сериализаторах сразу приводит к падению тестов.
+"""
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.shortlinks import encode
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag
+)
+from users.models import Subscriptions
+
+LIMITS = (1, 6, 25, 60)
+RECIPES_LIMITS = (1, 3, 10)
+MAX_SECONDS = 1.0
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAA'
+    'CVBMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNo'
+    'AAAAggCByxOyYQAAAABJRU5ErkJggg=='
+)
+
+
+@pytest.fixture
+def budget(django_assert_max_num_queries):
+    """Проверяет число SQL-запросов и время выполнения блока."""
+
+    @contextmanager
+    def check(max_queries, max_seconds=MAX_SECONDS):
+        start = time.perf_counter()
+        with django_assert_max_num_queries(max_queries):
+            yield
+        elapsed = time.perf_counter() - start
+        assert elapsed <= max_seconds, (
+            f'Запрос выполнялся {elapsed:.3f} c, бюджет {max_seconds} c.'
+        )
+
+    return check
+
+
+def foreign_recipe(user):
+    return Recipe.objects.exclude(author=user).first()
+
+
+def own_recipe(user):
+    return Recipe.objects.filter(author=user).first()
+
+
+def recipe_payload(count=15):
+    ingredients = Ingredient.objects.order_by('pk')[:count]
+    return {
+        'ingredients': [
+            {'id': ingredient.pk, 'amount': 10} for ingredient in ingredients
+        ],
+        'tags': list(Tag.objects.values_list('pk', flat=True)),
+        'image': IMAGE,
+        'name': 'Новый рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+    }
+
+
+@pytest.mark.parametrize('limit', LIMITS)
+def test_recipe_list_anonymous(anon_client, dataset, budget, limit):
+    with budget(5):
+        response = anon_client.get('/api/recipes/', {'limit': limit})
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.data['results']) == limit
+
+
+@pytest.mark.parametrize('limit', LIMITS)
+def test_recipe_list_authenticated(auth_client, dataset, budget, limit):
+    with budget(6):
+        response = auth_client.get('/api/recipes/', {'limit': limit})
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.data['results']) == limit
+
+
+@pytest.mark.parametrize('params', (
+    {'tags': ('breakfast', 'lunch')},
+    {'is_favorited': 1},
+    {'is_in_shopping_cart': 1},
+    {'is_favorited': 1, 'is_in_shopping_cart': 1, 'tags': 'dinner'},
+    {'ordering': 'trending', 'tags': 'dinner'},
+))
+def test_recipe_list_filters(auth_client, dataset, user, budget, params):
+    with budget(7):
+        response = auth_client.get('/api/recipes/', {'limit': 60, **params})
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_recipe_list_author_filter(auth_client, dataset, users, budget):
+    with budget(7):
+        response = auth_client.get(
+            '/api/recipes/', {'author': users[1].pk, 'limit': 60}
+        )
+    assert response.status_code == HTTPStatus.OK
+    assert response.data['count'] == Recipe.objects.filter(
+        author=users[1]
+    ).count()
+
+
+def test_recipe_detail(auth_client, dataset, user, budget):
+    recipe = foreign_recipe(user)
+    with budget(6):
+        response = auth_client.get(f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.data['ingredients']) >= 10
+
+
+def test_recipe_detail_anonymous(anon_client, dataset, budget):
+    recipe = Recipe.objects.first()
+    with budget(5):
+        response = anon_client.get(f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_recipe_get_link(anon_client, dataset, budget):
+    recipe = Recipe.objects.first()
+    with budget(1):
+        response = anon_client.get(f'/api/recipes/{recipe.pk}/get-link/')
+    assert response.status_code == HTTPStatus.OK
+    assert response.data['short-link'].endswith(f'/s/{encode(recipe.pk)}/')
+
+
+def test_short_link_redirect(anon_client, dataset, budget):
+    recipe = Recipe.objects.first()
+    with budget(1):
+        response = anon_client.get(f'/s/{encode(recipe.pk)}/')
+    assert response.status_code == HTTPStatus.FOUND
+    assert response['Location'] == f'/recipes/{recipe.pk}/'
+
+
+def test_recipe_create(auth_client, dataset, budget):
+    with budget(20):
+        response = auth_client.post(
+            '/api/recipes/', recipe_payload(), format='json'
+        )
+    assert response.status_code == HTTPStatus.CREATED, response.data
+
+
+def test_recipe_update(auth_client, dataset, user, budget):
+    recipe = own_recipe(user)
+    with budget(23):
+        response = auth_client.patch(
+            f'/api/recipes/{recipe.pk}/', recipe_payload(), format='json'
+        )
+    assert response.status_code == HTTPStatus.OK, response.data
+
+
+def count_queries(client, method, url, data):
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url, data, format='json')
+    assert response.status_code in (HTTPStatus.OK, HTTPStatus.CREATED), (
+        response.data
+    )
+    return len(context.captured_queries)
+
+
+def test_recipe_create_does_not_depend_on_ingredients(auth_client, dataset):
+    small = recipe_payload(1)
+    large = {**recipe_payload(50), 'name': 'Большой рецепт'}
+    assert count_queries(
+        auth_client, 'post', '/api/recipes/', small
+    ) == count_queries(auth_client, 'post', '/api/recipes/', large)
+
+
+def test_recipe_update_does_not_depend_on_ingredients(auth_client, dataset,
+                                                      user):
+    url = f'/api/recipes/{own_recipe(user).pk}/'
+    # Первые запросы с токеном загружают пользователя из базы.
+    count_queries(auth_client, 'patch', url, recipe_payload(1))
+    count_queries(auth_client, 'patch', url, recipe_payload(1))
+    small = count_queries(auth_client, 'patch', url, recipe_payload(2))
+    count_queries(auth_client, 'patch', url, recipe_payload(1))
+    large = count_queries(auth_client, 'patch', url, recipe_payload(50))
+    assert small == large
+
+
+def test_recipe_update_does_not_depend_on_carts(auth_client, dataset,
+                                                user, users):
+    recipe = own_recipe(user)
+    url = f'/api/recipes/{recipe.pk}/'
+    ShoppingCart.objects.filter(recipe=recipe).delete()
+    ShoppingCart.objects.create(user=users[1], recipe=recipe)
+    # Первые запросы с токеном загружают пользователя из базы.
+    count_queries(auth_client, 'patch', url, recipe_payload(1))
+    count_queries(auth_client, 'patch', url, recipe_payload(1))
+
+    def edit():
+        return [
+            count_queries(auth_client, 'patch', url, recipe_payload(count))
+            for count in (3, 1)
+        ]
+
+    one_cart = edit()
+    for follower in users[2:]:
+        ShoppingCart.objects.create(user=follower, recipe=recipe)
+    assert edit() == one_cart
+
+
+def test_recipe_delete(auth_client, dataset, user, budget):
+    recipe = own_recipe(user)
+    with budget(13):
+        response = auth_client.delete(f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == HTTPStatus.NO_CONTENT
+
+
+@pytest.mark.parametrize('url, model, post_queries, delete_queries', (
+    ('favorite', Favorite, 9, 5),
+    ('shopping_cart', ShoppingCart, 15, 12),
+))
+def test_recipe_favorite_and_cart(auth_client, dataset, user, budget,
+                                  url, model, post_queries, delete_queries):
+    recipe = own_recipe(user)
+    with budget(post_queries):
+        response = auth_client.post(f'/api/recipes/{recipe.pk}/{url}/')
+    assert response.status_code == HTTPStatus.CREATED
+    with budget(delete_queries):
+        response = auth_client.delete(f'/api/recipes/{recipe.pk}/{url}/')
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    assert not model.objects.filter(user=user, recipe=recipe).exists()
+
+
+def test_download_shopping_cart(auth_client, dataset, user, budget):
+    with budget(2):
+        response = auth_client.get('/api/recipes/download_shopping_cart/')
+        content = b''.join(response.streaming_content).decode()
+    assert response.status_code == HTTPStatus.OK
+    assert response['Content-Disposition'] == (
+        'attachment; filename="shopping_list.txt"'
+    )
+    assert content.startswith('Список покупок')
+    assert len(content.splitlines()) - 2 == RecipeIngredient.objects.filter(
+        recipe__shopping_cart__user=user
+    ).values('ingredient').distinct().count()
+
+
+def test_download_empty_shopping_cart(auth_client, user, budget):
+    with budget(2):
+        response = auth_client.get('/api/recipes/download_shopping_cart/')
+    assert response.status_code == HTTPStatus.NO_CONTENT
+
+
+def test_tags(anon_client, tags, budget):
+    with budget(1):
+        response = anon_client.get('/api/tags/')
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.data) == len(tags)
+    with budget(1):
+        response = anon_client.get(f'/api/tags/{tags[0].pk}/')
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.parametrize('name', ('а', 'мор', 'сыр'))
+def test_ingredient_search(anon_client, ingredients, budget, name):
+    with budget(1):
+        response = anon_client.get('/api/ingredients/', {'name': name})
+    assert response.status_code == HTTPStatus.OK
+    assert response.data
+
+
+def test_ingredient_detail(anon_client, ingredients, budget):
+    with budget(1):
+        response = anon_client.get(f'/api/ingredients/{ingredients[0].pk}/')
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.parametrize('limit', LIMITS)
+def test_user_list(auth_client, dataset, budget, limit):
+    with budget(3):
+        response = auth_client.get('/api/users/', {'limit': limit})
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_user_detail_and_me(auth_client, dataset, users, budget):
+    with budget(2):
+        response = auth_client.get(f'/api/users/{users[1].pk}/')
+    assert response.status_code == HTTPStatus.OK
+    assert response.data['is_subscribed'] is True
+    with budget(1):
+        response = auth_client.get('/api/users/me/')
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_user_create(anon_client, db, budget):
+    with budget(4):
+        response = anon_client.post('/api/users/', {
+            'email': 'new@foodgram.ru',
+            'username': 'new_user',
+            'first_name': 'Новый',
+            'last_name': 'Пользователь',
+            'password': 'Foodgram-pass-2',
+        })
+    assert response.status_code == HTTPStatus.CREATED, response.data
+
+
+def test_avatar(auth_client, user, budget):
+    with budget(3):
+        response = auth_client.put(
+            '/api/users/me/avatar/', {'avatar': IMAGE}, format='json'
+        )
+    assert response.status_code == HTTPStatus.OK
+    with budget(2):
+        response = auth_client.delete('/api/users/me/avatar/')
+    assert response.status_code == HTTPStatus.NO_CONTENT
+
+
+def test_set_password(auth_client, user, budget):
+    with budget(3):
+        response = auth_client.post('/api/users/set_password/', {
+            'current_password': 'Foodgram-pass-1',
+            'new_password': 'Foodgram-pass-3',
+        })
+    assert response.status_code == HTTPStatus.NO_CONTENT
+
+
+@pytest.mark.parametrize('recipes_limit', RECIPES_LIMITS)
+@pytest.mark.parametrize('limit', (1, 6, 11))
+def test_subscriptions(auth_client, dataset, budget, limit, recipes_limit):
+    with budget(4):
+        response = auth_client.get('/api/users/subscriptions/', {
+            'limit': limit, 'recipes_limit': recipes_limit
+        })
+    assert response.status_code == HTTPStatus.OK
+    assert len(response.data['results']) == limit
+    for author in response.data['results']:
+        assert len(author['recipes']) <= recipes_limit
+
+
+def test_subscribe(auth_client, dataset, user, users, budget):
+    author = users[1]
+    Subscriptions.objects.filter(user=user, author=author).delete()
+    with budget(10):
+        response = auth_client.post(f'/api/users/{author.pk}/subscribe/')
+    assert response.status_code == HTTPStatus.CREATED, response.data
+    with budget(6):
+        response = auth_client.delete(f'/api/users/{author.pk}/subscribe/')
+    assert response.status_code == HTTPStatus.NO_CONTENT
+
+
+def test_token_login_logout(anon_client, user, budget):
+    with budget(6):
+        response = anon_client.post('/api/auth/token/login/', {
+            'email': user.email, 'password': 'Foodgram-pass-1'
+        })
+    assert response.status_code == HTTPStatus.OK
+    anon_client.credentials(
+        HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}'
+    )
+    with budget(3):
+        response = anon_client.post('/api/auth/token/logout/')
+    assert response.status_code == HTTPStatus.NO_CONTENT
+
+
+@pytest.mark.parametrize('recipes_limit', ('abc', '-1'))
+def test_subscriptions_invalid_recipes_limit(auth_client, dataset,
+                                             recipes_limit):
+    response = auth_client.get(
+        '/api/users/subscriptions/', {'recipes_limit': recipes_limit}
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_subscriptions_recipes_are_latest(auth_client, dataset, users):
+    response = auth_client.get(
+        '/api/users/subscriptions/', {'limit': 1, 'recipes_limit': 2}
+    )
+    author = response.data['results'][0]
+    expected = list(Recipe.objects.filter(
+        author_id=author['id']
+    ).values_list('pk', flat=True)[:2])
+    assert [recipe['id'] for recipe in author['recipes']] == expected
+    assert author['recipes_count'] == Recipe.objects.filter(
+        author_id=author['id']
+    ).count()
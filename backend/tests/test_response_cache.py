@@ -0,0 +1,111 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+
+from api.response_cache import recipe_list_cache
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+URL = '/api/recipes/'
+
+
+@pytest.fixture
+def commit(django_capture_on_commit_callbacks):
+    """Выполняет колбэки on_commit, как при фиксации транзакции."""
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+def test_anonymous_hit(anon_client, dataset, django_assert_num_queries):
+    first = anon_client.get(URL, {'tags': ['lunch', 'breakfast'], 'limit': 6})
+    assert first['X-Cache'] == 'MISS'
+    with django_assert_num_queries(0):
+        second = anon_client.get(URL, {
+            'limit': 6, 'tags': ['breakfast', 'lunch', 'lunch'], 'utm': 'x'
+        })
+    assert second['X-Cache'] == 'HIT'
+    assert second.data == first.data
+
+
+def test_authenticated_not_cached(auth_client, dataset):
+    auth_client.get(URL)
+    response = auth_client.get(URL)
+    assert response.status_code == HTTPStatus.OK
+    assert 'X-Cache' not in response
+
+
+def test_different_filters_different_entries(anon_client, dataset, users):
+    anon_client.get(URL, {'author': users[1].pk})
+    response = anon_client.get(URL, {'author': users[2].pk})
+    assert response['X-Cache'] == 'MISS'
+    assert {item['author']['id'] for item in response.data['results']} == {
+        users[2].pk
+    }
+
+
+def test_invalid_filter_not_cached(anon_client, dataset):
+    anon_client.get(URL, {'tags': 'unknown'})
+    response = anon_client.get(URL, {'tags': 'unknown'})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.parametrize('change', (
+    lambda recipe: Recipe.objects.filter(pk=recipe.pk).first().save(),
+    lambda recipe: recipe.tags.clear(),
+    lambda recipe: recipe.recipe_ingredients.first().delete(),
+    lambda recipe: Tag.objects.first().save(),
+    lambda recipe: Ingredient.objects.first().save(),
+))
+def test_invalidated_on_recipe_change(anon_client, dataset, commit, change):
+    anon_client.get(URL)
+    with commit():
+        change(Recipe.objects.first())
+    assert anon_client.get(URL)['X-Cache'] == 'MISS'
+
+
+def test_author_profile_change(anon_client, dataset, users, commit):
+    author = User.objects.get(pk=users[1].pk)
+    anon_client.get(URL)
+    with commit():
+        author.last_login = author.date_joined
+        author.save()
+    assert anon_client.get(URL)['X-Cache'] == 'HIT'
+    with commit():
+        author.first_name = 'Новое имя'
+        author.save()
+    assert anon_client.get(URL)['X-Cache'] == 'MISS'
+
+
+def test_unrelated_user_change(anon_client, dataset, commit):
+    anon_client.get(URL)
+    with commit():
+        User.objects.create_user(
+            email='new@foodgram.ru', username='new', password='pass',
+            first_name='Новый', last_name='Пользователь'
+        )
+    assert anon_client.get(URL)['X-Cache'] == 'HIT'
+
+
+def test_stats(anon_client, dataset):
+    recipe_list_cache.stats.reset()
+    anon_client.get(URL)
+    anon_client.get(URL)
+    assert recipe_list_cache.stats.snapshot() == {
+        'hits': 1, 'misses': 1, 'hit_rate': 0.5
+    }
+    output = StringIO()
+    call_command('cache_stats', stdout=output)
+    assert 'api.recipe_list: попаданий 1, промахов 1' in output.getvalue()
+
+
+def test_stats_flush(anon_client, dataset):
+    stats = recipe_list_cache.stats
+    stats.reset()
+    anon_client.get(URL)
+    anon_client.get(URL)
+    assert not cache.get(stats.processes_key)
+    stats.flush()
+    assert stats.snapshot()['hits'] == 1
+    assert len(cache.get(stats.processes_key)) == 1
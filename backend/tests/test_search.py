@@ -0,0 +1,80 @@
+import json
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import Recipe
+from recipes.search import fts_query
+from tests.test_query_budget import recipe_payload
+
+
+def search_names(client, **params):
+    response = client.get('/api/recipes/', {'limit': 100, **params})
+    assert response.status_code == HTTPStatus.OK
+    return [recipe['name'] for recipe in response.data['results']]
+
+
+def test_fts_query_escapes_operators():
+    assert fts_query('суп AND "NEAR(') == '"суп"* "AND"* "NEAR"*'
+    assert fts_query('  -*  ') == ''
+
+
+def test_search_ranks_name_matches_first(auth_client, recipes, tags):
+    for name, text in (
+        ('Омлет', 'Яйца и томатный соус'),
+        ('Томатный суп', 'Суп из помидоров'),
+        ('Паста', 'Без соуса'),
+    ):
+        response = auth_client.post('/api/recipes/', {
+            **recipe_payload(2), 'name': name, 'text': text
+        }, format='json')
+        assert response.status_code == HTTPStatus.CREATED, response.data
+    assert search_names(auth_client, search='томатн') == [
+        'Томатный суп', 'Омлет'
+    ]
+    assert search_names(auth_client, search='СУП томатный') == [
+        'Томатный суп'
+    ]
+    assert search_names(auth_client, search='"(*') == []
+    assert search_names(
+        auth_client, search='томатный', tags=tags[0].slug
+    ) == ['Томатный суп', 'Омлет']
+
+
+def test_search_index_follows_changes(auth_client, recipes, user):
+    recipe = Recipe.objects.filter(author=user).first()
+    response = auth_client.patch(f'/api/recipes/{recipe.pk}/', {
+        **recipe_payload(2), 'name': 'Окрошка на квасе'
+    }, format='json')
+    assert response.status_code == HTTPStatus.OK, response.data
+    assert search_names(auth_client, search='окрошка') == ['Окрошка на квасе']
+    auth_client.delete(f'/api/recipes/{recipe.pk}/')
+    assert search_names(auth_client, search='окрошка') == []
+
+
+def test_search_after_import(anon_client, users, tags, ingredients, tmp_path):
+    path = tmp_path / 'recipes.ndjson'
+    path.write_text(json.dumps({
+        'author': users[0].username,
+        'name': 'Солянка',
+        'text': 'Сборная',
+        'cooking_time': 30,
+        'image': 'recipes_images/imported.png',
+        'tags': [tags[0].slug],
+        'ingredients': [{
+            'name': ingredients[0].name,
+            'measurement_unit': ingredients[0].measurement_unit,
+            'amount': 1,
+        }],
+    }, ensure_ascii=False), encoding='utf-8')
+    call_command('import_recipes', str(path), stdout=StringIO())
+    assert search_names(anon_client, search='солянка') == ['Солянка']
+
+
+def test_search_rejects_cursor(anon_client, recipes):
+    response = anon_client.get(
+        '/api/recipes/', {'search': 'суп', 'cursor': ''}
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert 'search' in response.data
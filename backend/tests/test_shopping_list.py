@@ -0,0 +1,111 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.contrib.admin import site
+from django.core.management import CommandError, call_command
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    ShoppingCartIngredient
+)
+from recipes.shopping_list import aggregate_shopping_lists
+
+
+def table():
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount in
+        ShoppingCartIngredient.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        )
+    }
+
+
+@pytest.fixture
+def cart(user, recipes):
+    for recipe in recipes[:5]:
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    return recipes[:5]
+
+
+def test_add_and_remove(auth_client, user, recipes):
+    recipe = recipes[1]
+    response = auth_client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+    assert response.status_code == HTTPStatus.CREATED
+    assert table() == aggregate_shopping_lists() != {}
+    response = auth_client.delete(
+        f'/api/recipes/{recipe.pk}/shopping_cart/'
+    )
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    assert table() == {}
+
+
+def test_overlapping_recipes(user, cart):
+    assert table() == aggregate_shopping_lists()
+    ShoppingCart.objects.filter(user=user, recipe=cart[0]).delete()
+    assert table() == aggregate_shopping_lists()
+
+
+def test_recipe_ingredients_update(auth_client, user, users, recipes):
+    recipe = Recipe.objects.filter(author=user).first()
+    ShoppingCart.objects.create(user=users[1], recipe=recipe)
+    ShoppingCart.objects.create(user=users[2], recipe=recipe)
+    kept = recipe.recipe_ingredients.first()
+    new = Ingredient.objects.exclude(recipes=recipe).first()
+    response = auth_client.patch(f'/api/recipes/{recipe.pk}/', {
+        'ingredients': [
+            {'id': kept.ingredient_id, 'amount': kept.amount + 7},
+            {'id': new.pk, 'amount': 3},
+        ],
+        'tags': [recipe.tags.first().pk],
+    }, format='json')
+    assert response.status_code == HTTPStatus.OK, response.data
+    assert table() == aggregate_shopping_lists()
+    assert ShoppingCartIngredient.objects.get(
+        user=users[1], ingredient=new
+    ).amount == 3
+
+
+def test_recipe_delete(user, cart):
+    cart[0].delete()
+    assert table() == aggregate_shopping_lists()
+
+
+def test_admin_bulk_delete(user, cart):
+    rows = [
+        *RecipeIngredient.objects.filter(recipe=cart[1])[:1],
+        *RecipeIngredient.objects.filter(recipe=cart[2]),
+    ]
+    site._registry[RecipeIngredient].delete_queryset(
+        None, RecipeIngredient.objects.filter(pk__in=[
+            row.pk for row in rows
+        ])
+    )
+    assert table() == aggregate_shopping_lists()
+
+
+def test_download_reads_table(auth_client, user, cart):
+    ShoppingCartIngredient.objects.filter(user=user).update(amount=1)
+    content = b''.join(auth_client.get(
+        '/api/recipes/download_shopping_cart/'
+    ).streaming_content).decode()
+    lines = content.splitlines()[2:]
+    assert len(lines) == ShoppingCartIngredient.objects.filter(
+        user=user
+    ).count()
+    assert all(line.endswith(' - 1') for line in lines)
+
+
+def test_command_check_and_rebuild(user, cart):
+    call_command('rebuild_shopping_lists', '--check', stdout=StringIO())
+    ShoppingCartIngredient.objects.filter(user=user).first().delete()
+    RecipeIngredient.objects.filter(recipe=cart[1]).update(amount=999)
+    with pytest.raises(CommandError):
+        call_command('rebuild_shopping_lists', '--check', stdout=StringIO())
+    call_command('rebuild_shopping_lists', stdout=StringIO())
+    assert table() == aggregate_shopping_lists()
+    call_command('rebuild_shopping_lists', '--check', stdout=StringIO())
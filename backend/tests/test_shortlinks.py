@@ -0,0 +1,64 @@
+from http import HTTPStatus
+
+import pytest
+
+from api.shortlinks import MAX_PK, decode, encode
+from recipes.models import Recipe
+
+
+@pytest.mark.parametrize('pk', (
+    1, 9, 10, 61, 62, 3843, 3844, 10 ** 9, MAX_PK
+))
+def test_encode_decode(pk):
+    code = encode(pk)
+    assert decode(code) == pk
+    assert len(code) <= len(str(pk))
+
+
+def test_digit_codes_are_legacy_ids():
+    assert encode(5) == '5'
+    assert decode('15') == 15
+    assert decode('a-b') is None
+
+
+def test_oversized_codes():
+    assert decode(encode(MAX_PK)[:-1] + 'Z') is None
+    assert decode(str(MAX_PK + 1)) is None
+    assert decode('z' * 20) is None
+
+
+def test_redirect_is_cached(anon_client, recipes,
+                            django_assert_num_queries):
+    recipe = recipes[0]
+    response = anon_client.get(f'/api/recipes/{recipe.pk}/get-link/')
+    path = response.data['short-link'].replace('http://testserver', '')
+    assert path == f'/s/{encode(recipe.pk)}/'
+    with django_assert_num_queries(0):
+        response = anon_client.get(path)
+    assert response.status_code == HTTPStatus.FOUND
+    assert response['Location'] == f'/recipes/{recipe.pk}/'
+
+
+def test_legacy_link_redirect(anon_client, recipes):
+    response = anon_client.get(f'/s/{recipes[0].pk}/')
+    assert response['Location'] == f'/recipes/{recipes[0].pk}/'
+
+
+@pytest.mark.parametrize('code', (
+    'zzzzzz', 'a-b', '999999', 'zzzzzzzzzzzzzzzzzzzz', 'zzzzzzzzzzz',
+    str(MAX_PK + 1), '9' * 40
+))
+def test_unknown_code(anon_client, recipes, code):
+    assert anon_client.get(f'/s/{code}/').status_code == HTTPStatus.NOT_FOUND
+
+
+def test_deleted_recipe_link(anon_client, recipes,
+                             django_capture_on_commit_callbacks):
+    recipe = recipes[0]
+    path = f'/s/{encode(recipe.pk)}/'
+    assert anon_client.get(path).status_code == HTTPStatus.FOUND
+    with django_capture_on_commit_callbacks(execute=True):
+        Recipe.objects.filter(pk=recipe.pk).delete()
+    assert anon_client.get(path).status_code == HTTPStatus.NOT_FOUND
+    response = anon_client.get(f'/api/recipes/{recipe.pk}/get-link/')
+    assert response.status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,110 @@
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import Recipe, RecipeIngredient, SimilarRecipe
+from recipes.similar import SIMILAR_COUNT, SimilarityIndex, load_ingredients
+from tests.test_query_budget import own_recipe
+
+
+def expected_similar(recipes):
+    """Похожие рецепты полным перебором пар."""
+    similar = {}
+    for recipe_id, ingredients in recipes.items():
+        scores = []
+        for other, other_ingredients in recipes.items():
+            common = len(ingredients & other_ingredients)
+            if other != recipe_id and common:
+                scores.append((
+                    common / len(ingredients | other_ingredients), other
+                ))
+        similar[recipe_id] = sorted(scores, reverse=True)[:SIMILAR_COUNT]
+    return similar
+
+
+def stored_similar():
+    similar = {}
+    for recipe_id, similar_id, score in SimilarRecipe.objects.order_by(
+        'recipe', '-score', '-similar_id'
+    ).values_list('recipe', 'similar', 'score'):
+        similar.setdefault(recipe_id, []).append((score, similar_id))
+    return similar
+
+
+def update(full=False):
+    stdout = StringIO()
+    call_command('update_similar_recipes', full=full, stdout=stdout)
+    return int(stdout.getvalue().split(':')[1])
+
+
+def test_index_neighbours():
+    index = SimilarityIndex({
+        1: frozenset((1, 2, 3)),
+        2: frozenset((1, 2, 3, 4)),
+        3: frozenset((1, 2)),
+        4: frozenset((5,)),
+        5: frozenset((1, 2, 3)),
+    })
+    assert index.neighbours(1) == [(1.0, 5), (0.75, 2), (2 / 3, 3)]
+    assert index.neighbours(1, limit=2) == [(1.0, 5), (0.75, 2)]
+    assert index.neighbours(4) == []
+
+
+def test_full_update(recipes):
+    assert update(full=True) == len(recipes)
+    assert stored_similar() == {
+        recipe_id: similar
+        for recipe_id, similar in expected_similar(load_ingredients()).items()
+        if similar
+    }
+    assert update() == 0
+
+
+def test_incremental_update(auth_client, dataset, user):
+    update(full=True)
+    recipe = own_recipe(user)
+    template = Recipe.objects.exclude(pk=recipe.pk).last()
+    ingredients = [
+        {'id': ingredient_id, 'amount': 5}
+        for ingredient_id in RecipeIngredient.objects.filter(
+            recipe=template
+        ).values_list('ingredient_id', flat=True)
+    ]
+    response = auth_client.patch(
+        f'/api/recipes/{recipe.pk}/',
+        {'ingredients': ingredients, 'tags': [1], 'name': recipe.name,
+         'text': recipe.text, 'cooking_time': 5},
+        format='json'
+    )
+    assert response.status_code == HTTPStatus.OK, response.data
+    assert 1 < update() < len(dataset)
+    assert stored_similar()[template.pk][0] == (1.0, recipe.pk)
+    assert stored_similar() == {
+        recipe_id: similar
+        for recipe_id, similar in expected_similar(load_ingredients()).items()
+        if similar
+    }
+
+
+def test_recipe_detail_similar(anon_client, recipes,
+                               django_capture_on_commit_callbacks):
+    recipe = recipes[0]
+    url = f'/api/recipes/{recipe.pk}/'
+    response = anon_client.get(url)
+    assert response.data['similar'] == []
+    update(full=True)
+    updated = anon_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert updated.status_code == HTTPStatus.OK
+    assert [similar['id'] for similar in updated.data['similar']] == [
+        similar_id for _, similar_id in stored_similar()[recipe.pk]
+    ]
+    assert set(updated.data['similar'][0]) == {
+        'id', 'name', 'image', 'image_variants', 'cooking_time'
+    }
+    similar = Recipe.objects.get(pk=updated.data['similar'][0]['id'])
+    similar.name = 'Новое название'
+    with django_capture_on_commit_callbacks(execute=True):
+        similar.save()
+    response = anon_client.get(url, HTTP_IF_NONE_MATCH=updated['ETag'])
+    assert response.data['similar'][0]['name'] == 'Новое название'
@@ -0,0 +1,90 @@
+import hashlib
+import os
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import call_command
+
+from recipes.models import Recipe
+from tests.test_images import data_uri, make_image
+from tests.test_query_budget import recipe_payload
+
+
+def test_content_addressed_names(db):
+    content = b'content'
+    digest = hashlib.sha256(content).hexdigest()
+    first = default_storage.save('recipes_images/temp.TXT', ContentFile(
+        content
+    ))
+    second = default_storage.save('recipes_images/other.txt', ContentFile(
+        content
+    ))
+    assert first == second == (
+        f'recipes_images/{digest[:2]}/{digest[2:4]}/{digest}.txt'
+    )
+    directory = os.path.dirname(default_storage.path(first))
+    assert os.listdir(directory) == [f'{digest}.txt']
+
+
+def test_identical_uploads_are_stored_once(auth_client, recipes):
+    image = data_uri(make_image((300, 200)))
+    names = set()
+    for name in ('Первый', 'Второй'):
+        response = auth_client.post('/api/recipes/', {
+            **recipe_payload(), 'name': name, 'image': image
+        }, format='json')
+        assert response.status_code == HTTPStatus.CREATED, response.data
+        names.add(Recipe.objects.get(pk=response.data['id']).image.name)
+    assert len(names) == 1
+    assert default_storage.is_content_name(names.pop())
+
+
+def flatten_images(recipes, settings):
+    """Переводит два рецепта на изображение со старым именем файла."""
+    flat_storage = FileSystemStorage(location=settings.MEDIA_ROOT)
+    old_name = flat_storage.save('recipes_images/flat.jpg', ContentFile(
+        make_image((20, 10))
+    ))
+    variant = flat_storage.save(
+        'recipes_images/variants/flat_webp.webp', ContentFile(b'webp')
+    )
+    Recipe.objects.filter(pk__in=[recipes[0].pk, recipes[1].pk]).update(
+        image=old_name,
+        image_variants={'source': old_name, 'webp': variant}
+    )
+    return flat_storage, old_name, variant
+
+
+def rehome_media():
+    call_command(
+        'rehome_media', batch_size=7, delete_originals=True,
+        stdout=StringIO(), stderr=StringIO()
+    )
+
+
+def test_rehome_media(recipes, settings):
+    flat_storage, old_name, variant = flatten_images(recipes, settings)
+    rehome_media()
+    first, second = Recipe.objects.filter(
+        pk__in=[recipes[0].pk, recipes[1].pk]
+    )
+    assert first.image.name == second.image.name != old_name
+    assert default_storage.is_content_name(first.image.name)
+    assert first.image_variants['source'] == first.image.name
+    assert default_storage.is_content_name(first.image_variants['webp'])
+    assert default_storage.exists(first.image.name)
+    assert not flat_storage.exists(old_name)
+    assert not flat_storage.exists(variant)
+
+
+def test_rehome_media_changes_etag(anon_client, recipes, settings):
+    flatten_images(recipes, settings)
+    url = f'/api/recipes/{recipes[0].pk}/'
+    etag = anon_client.get(url)['ETag']
+    rehome_media()
+    response = anon_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+    image = Recipe.objects.get(pk=recipes[0].pk).image.name
+    assert response.data['image'].endswith(image)
@@ -0,0 +1,96 @@
+from http import HTTPStatus
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.user_flags import UserFlagsCache, user_flags_cache
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscriptions
+
+
+def flags_by_id(response):
+    return {
+        recipe['id']: (
+            recipe['is_favorited'],
+            recipe['is_in_shopping_cart'],
+            recipe['author']['is_subscribed'],
+        )
+        for recipe in response.data['results']
+    }
+
+
+def expected_flags(user):
+    favorites = set(Favorite.objects.filter(
+        user=user
+    ).values_list('recipe', flat=True))
+    cart = set(ShoppingCart.objects.filter(
+        user=user
+    ).values_list('recipe', flat=True))
+    following = set(Subscriptions.objects.filter(
+        user=user
+    ).values_list('author', flat=True))
+    return {
+        recipe.pk: (
+            recipe.pk in favorites,
+            recipe.pk in cart,
+            recipe.author_id in following,
+        )
+        for recipe in Recipe.objects.all()
+    }
+
+
+def test_flags_loaded_once(auth_client, recipes, user):
+    Favorite.objects.create(user=user, recipe=recipes[1])
+    user_flags_cache.discard(user.pk)
+    params = {'limit': 60}
+    with CaptureQueriesContext(connection) as cold_queries:
+        cold = auth_client.get('/api/recipes/', params)
+    with CaptureQueriesContext(connection) as warm_queries:
+        warm = auth_client.get('/api/recipes/', params)
+    assert len(cold_queries) == len(warm_queries) + 3
+    tables = {
+        model._meta.db_table
+        for model in (Favorite, ShoppingCart, Subscriptions)
+    }
+    assert not any(
+        f'"{table}"' in query['sql']
+        for query in warm_queries.captured_queries for table in tables
+    )
+    assert flags_by_id(cold) == flags_by_id(warm) == expected_flags(user)
+
+
+def test_writes_invalidate_flags(auth_client, dataset, user, users,
+                                 django_capture_on_commit_callbacks):
+    recipe = Recipe.objects.exclude(
+        author=user
+    ).exclude(favorites__user=user).exclude(shopping_cart__user=user).first()
+    author = recipe.author
+    with django_capture_on_commit_callbacks(execute=True):
+        auth_client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        auth_client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        auth_client.delete(f'/api/users/{author.pk}/subscribe/')
+    response = auth_client.get(f'/api/recipes/{recipe.pk}/')
+    assert response.data['is_favorited']
+    assert response.data['is_in_shopping_cart']
+    assert not response.data['author']['is_subscribed']
+    response = auth_client.get('/api/recipes/', {'limit': 60})
+    assert flags_by_id(response) == expected_flags(user)
+    response = auth_client.get(f'/api/users/{author.pk}/')
+    assert response.status_code == HTTPStatus.OK
+    assert not response.data['is_subscribed']
+
+
+def test_cache_expires_and_evicts(dataset, user, users,
+                                  django_assert_num_queries):
+    cache = UserFlagsCache(max_size=1, ttl=0)
+    flags = cache.get(user)
+    assert list(flags.following) == sorted(flags.following)
+    assert flags.is_subscribed(users[1].pk)
+    assert not flags.is_subscribed(None)
+    with django_assert_num_queries(3):
+        cache.get(user)
+    cache = UserFlagsCache(max_size=1)
+    cache.get(user)
+    cache.get(users[1])
+    with django_assert_num_queries(3):
+        cache.get(user)
@@ -16,11 +16,14 @@ class UserAdmin(BaseUserAdmin):
         'username',
         'first_name',
         'last_name',
+        'recipes_count',
+        'followers_count',
         'avatar_tag'
     )
     search_fields = ('email', 'username')
     list_display_links = ('email',)
     ordering = ('date_joined',)
+    readonly_fields = ('recipes_count', 'followers_count')
     BaseUserAdmin.fieldsets += (
         ('Extra Fields', {'fields': ('avatar',)}),
     )
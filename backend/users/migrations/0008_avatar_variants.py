@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Варианты аватара'),
+        ),
+    ]
@@ -1,9 +1,35 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.contrib.auth.models import (
+    AbstractUser,
+    UserManager as DjangoUserManager
+)
 
 from .validators import validate_username
 
 
+class UserQuerySet(models.QuerySet):
+    """Набор запросов пользователей с флагами текущего пользователя."""
+
+    def with_is_subscribed(self, user):
+        """Аннотирует флаг подписки текущего пользователя на автора."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return self.annotate(
+            is_subscribed=Exists(
+                Subscriptions.objects.filter(
+                    user=user, author=OuterRef('pk')
+                )
+            )
+        )
+
+
+class UserManager(DjangoUserManager.from_queryset(UserQuerySet)):
+    """Менеджер пользователей с поддержкой UserQuerySet."""
+
+
 class User(AbstractUser):
     """Модель пользователя."""
 
@@ -31,9 +57,26 @@ class User(AbstractUser):
         blank=True,
         null=True
     )
+    avatar_variants = models.JSONField(
+        verbose_name='Варианты аватара',
+        default=dict,
+        editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name')
 
+    objects = UserManager()
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import increment
+from recipes.images import schedule_variants
+from .models import Subscriptions, User
+
+
+@receiver(post_save, sender=Subscriptions)
+def increment_followers_count(instance, created, **kwargs):
+    if created:
+        increment(
+            User.objects.filter(pk=instance.author_id), 'followers_count', 1
+        )
+
+
+@receiver(post_delete, sender=Subscriptions)
+def decrement_followers_count(instance, **kwargs):
+    increment(
+        User.objects.filter(pk=instance.author_id), 'followers_count', -1
+    )
+
+
+@receiver(post_save, sender=User)
+def process_avatar(instance, **kwargs):
+    schedule_variants(instance)